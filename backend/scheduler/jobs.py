@@ -0,0 +1,224 @@
+"""
+In-process job queue for scheduler runs.
+
+POST /api/scheduler/jobs/ (or /run/ with "async": true) returns a job id right
+away; a bounded thread pool runs the solve (CP-SAT releases the GIL while
+searching). Submissions with identical inputs while a job is still queued or
+running are coalesced onto that job.
+
+Every improving plan the optimizer finds while a job runs is published to the
+job's IncumbentChannel, which backs the job-status "incumbent" field and the
+server-sent-events stream at /api/scheduler/jobs/<id>/stream/.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .model import scheduler_optimization
+from . import services
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class IncumbentChannel:
+    """
+    Improving solutions of one run in arrival order, each tagged with a seq
+    number. Only the newest max_events are kept: a slow reader skips plans
+    that have already been superseded.
+    """
+
+    def __init__(self, max_events=20):
+        self.events = deque(maxlen=max_events)
+        self.count = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def publish(self, event):
+        with self.cond:
+            self.events.append(dict(event, seq=self.count))
+            self.count += 1
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def latest(self):
+        with self.cond:
+            return self.events[-1] if self.events else None
+
+    def wait(self, after, timeout=None):
+        """Block until an event with seq >= after exists or the channel closes; return (events, closed)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.closed or self.count > after, timeout)
+            return [e for e in self.events if e["seq"] >= after], self.closed
+
+
+class SchedulerJob:
+    def __init__(self, params, key):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.key = key
+        self.status = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        # ends multi-solve runs (decomposition, ...) between solves; job.solver stops the one in progress
+        self.stop_event = threading.Event()
+        self.future = None
+        self.solver = None
+        self.incumbents = IncumbentChannel()
+        self.lock = threading.Lock()
+
+    def to_dict(self, with_schedule=False):
+        """with_schedule=True adds the latest incumbent's per-train schedule."""
+        latest = self.incumbents.latest()
+        incumbent = None
+        if latest is not None:
+            incumbent = {k: latest[k] for k in ("seq", "source", "objective", "elapsed_s")}
+            incumbent["solutions"] = self.incumbents.count
+            if with_schedule:
+                incumbent["trains"] = latest["trains"]
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "incumbent": incumbent,
+        }
+
+
+class SchedulerJobQueue:
+    def __init__(self, max_workers=2, max_finished=50):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler-job")
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()   # job_id -> SchedulerJob, oldest first
+        self.active_by_key = {}     # input key -> job_id of the queued/running job
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def job_key(params):
+        """Identity of a run: its parameters plus the signature of the input CSVs."""
+        try:
+            data_sig = scheduler_optimization.dataset_signature(params["data_root"])
+        except FileNotFoundError:
+            data_sig = None
+        blob = json.dumps([params, data_sig], sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def submit(self, params):
+        """Return (job, created); an identical active job is reused instead of queued twice."""
+        key = self.job_key(params)
+        with self.lock:
+            existing = self.jobs.get(self.active_by_key.get(key))
+            if existing is not None and existing.status in ACTIVE_STATES:
+                return existing, False
+            job = SchedulerJob(params, key)
+            self.jobs[job.id] = job
+            self.active_by_key[key] = job.id
+            self._trim()
+        job.future = self.executor.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job.lock:
+            if job.status not in ACTIVE_STATES:
+                return job
+            job.cancel_requested = True
+            job.stop_event.set()
+            if job.status == QUEUED and job.future is not None and job.future.cancel():
+                self._finish(job, CANCELLED)
+                job.incumbents.close()
+            elif job.solver is not None:
+                job.solver.StopSearch()
+        return job
+
+    def _run(self, job):
+        with job.lock:
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+                job.incumbents.close()
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        def keep_solver(solver):
+            with job.lock:
+                job.solver = solver
+                if job.cancel_requested:
+                    solver.StopSearch()
+
+        try:
+            res = services.optimize_schedule(job.params, solver_hook=keep_solver,
+                                             on_incumbent=job.incumbents.publish, stop_event=job.stop_event)
+            # a cancelled run keeps its partial result for inspection but is neither saved nor cached
+            if not job.cancel_requested:
+                services.persist_schedule(res, job.params)
+            elif res.get("cache"):
+                scheduler_optimization.discard_result(res["cache"]["key"])
+        except Exception as e:
+            with job.lock:
+                job.error = str(e)
+                self._finish(job, FAILED)
+        else:
+            with job.lock:
+                job.result = res
+                self._finish(job, CANCELLED if job.cancel_requested else SUCCEEDED)
+        finally:
+            job.solver = None
+            job.incumbents.close()
+            close_old_connections()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        with self.lock:
+            if self.active_by_key.get(job.key) == job.id:
+                del self.active_by_key[job.key]
+
+    def _trim(self):
+        # keep every active job, drop the oldest finished ones beyond max_finished
+        finished = [jid for jid, j in self.jobs.items() if j.status not in ACTIVE_STATES]
+        for jid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[jid]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SchedulerJobQueue(
+                max_workers=getattr(settings, "SCHEDULER_JOB_WORKERS", 2),
+                max_finished=getattr(settings, "SCHEDULER_JOB_HISTORY", 50),
+            )
+        return _queue
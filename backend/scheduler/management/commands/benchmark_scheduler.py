@@ -0,0 +1,249 @@
+import json
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from scipy.spatial import cKDTree
+
+from scheduler.model import scheduler_optimization as so
+
+# phases faster than this in the baseline are too noisy to flag as slowdowns
+MIN_COMPARED_S = 0.1
+
+
+class Command(BaseCommand):
+    help = 'Time optimize() phases on synthetic networks scaled from the dataset, optionally against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-root', default=None,
+                            help='Dataset the synthetic networks are shaped after (default: BASE_DIR/datasets)')
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                            help='Network sizes as multiples of the dataset (stations, tracks and trains)')
+        parser.add_argument('--time-limit-s', type=float, default=10)
+        parser.add_argument('--solver-profile', default=None, choices=sorted(so.SOLVER_PROFILES))
+        parser.add_argument('--gap-limit', type=float, default=None,
+                            help='Passed to optimize(): stop once within this relative gap of the lower bound')
+        parser.add_argument('--decompose', default=None, choices=so.DECOMPOSE_MODES)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+        parser.add_argument('--keep-data', default=None,
+                            help='Write the synthetic datasets under this directory instead of a temp dir')
+        parser.add_argument('--baseline', default=None, help='JSON written by an earlier --output run to compare against')
+        parser.add_argument('--max-slowdown', type=float, default=1.5,
+                            help='Fail when a phase takes more than this times its baseline wall time')
+        parser.add_argument('--max-gap-pct', type=float, default=1.0,
+                            help='Fail when the objective is more than this %% worse than the baseline')
+        parser.add_argument('--output', default=None, help='Also write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        data_root = options['data_root'] or os.path.join(settings.BASE_DIR, 'datasets')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = {r['scale']: r for r in json.load(f)['runs']}
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        shape = dataset_shape(data_root)
+        runs = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for scale in options['scales']:
+                root = os.path.join(options['keep_data'] or tmp, f'synthetic_{scale}x')
+                sizes = write_synthetic_dataset(root, shape, scale, options['seed'])
+                self.stdout.write(f'{scale}x: {sizes["stations"]} stations, {sizes["tracks"]} tracks, '
+                                  f'{sizes["trains"]} trains')
+                # one process per scale so peak RSS is that scale's own
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    run = pool.submit(run_phases, root, options['time_limit_s'], options['solver_profile'],
+                                      options['gap_limit'], options['decompose']).result()
+                run.update({'scale': f'{scale}x', 'dataset': sizes})
+                runs.append(run)
+                self.write_run(run)
+
+        failures = []
+        if baseline is not None:
+            failures = self.compare(runs, baseline, options['max_slowdown'], options['max_gap_pct'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'runs': runs, 'time_limit_s': options['time_limit_s'],
+                           'solver_profile': options['solver_profile'], 'gap_limit': options['gap_limit'],
+                           'decompose': options['decompose'], 'seed': options['seed']}, f, indent=2)
+        if failures:
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def write_run(self, run):
+        self.stdout.write(f"  {'phase':<14}{'wall s':>9}")
+        for name, phase in run['phases'].items():
+            self.stdout.write(f"  {name:<14}{phase['wall_time_s']:>9.3f}")
+        self.stdout.write(f"  peak RSS {run['peak_rss_mb']:.1f} MB")
+        gap = '-' if run['solver_gap_pct'] is None else f"{run['solver_gap_pct']:.2f}%"
+        model = run['model']
+        size = f"{model['variables']} variables, {model['constraints']} constraints; " if model else ''
+        self.stdout.write(f"  {size}{run['status']} objective {run['objective']} "
+                          f"(lower bound {run['lower_bound']}, gap to solver bound {gap})")
+
+    def compare(self, runs, baseline, max_slowdown, max_gap_pct):
+        failures = []
+        for run in runs:
+            base = baseline.get(run['scale'])
+            if base is None:
+                self.stdout.write(f"{run['scale']}: not in the baseline")
+                continue
+            for name in run['phases']:
+                mine, theirs = run['phases'].get(name), base['phases'].get(name)
+                if mine is None or theirs is None or theirs['wall_time_s'] < MIN_COMPARED_S:
+                    continue
+                # a solve that ran into the time limit says nothing about speed
+                if name == 'solve' and base.get('status') != 'OPTIMAL':
+                    continue
+                ratio = mine['wall_time_s'] / theirs['wall_time_s']
+                self.stdout.write(f"{run['scale']} {name}: {ratio:.2f}x baseline time")
+                if ratio > max_slowdown:
+                    failures.append(f"{run['scale']} {name}: {mine['wall_time_s']:.3f}s vs "
+                                    f"{theirs['wall_time_s']:.3f}s in the baseline")
+            if run['objective'] is not None and base.get('objective'):
+                gap = 100.0 * (run['objective'] - base['objective']) / base['objective']
+                run['baseline_gap_pct'] = round(gap, 3)
+                self.stdout.write(f"{run['scale']} objective: {gap:+.2f}% vs baseline")
+                if gap > max_gap_pct:
+                    failures.append(f"{run['scale']} objective: {run['objective']} vs {base['objective']} "
+                                    f"in the baseline ({gap:+.2f}%)")
+            elif base.get('objective') is not None:
+                failures.append(f"{run['scale']}: no solution ({run['status']}), baseline found one")
+        return failures
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_phases(data_root, time_limit_s, profile=None, gap_limit=None, decompose=None):
+    """
+    optimize() on data_root with the result cache off: its per-phase wall
+    times (out["metrics"]["phases"]), model size and solver figures, and the
+    peak RSS of the process.
+    """
+    out = so.optimize(data_root, time_limit_s=time_limit_s, solver_profile=profile, gap_limit=gap_limit,
+                      decompose=decompose, use_cache=False, quiet=True)
+    metrics = out.get('metrics', {})
+    solver = metrics.get('solver', {})
+    return {
+        'phases': {name: {'wall_time_s': seconds} for name, seconds in metrics.get('phases', {}).items()},
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'model': metrics.get('model', {}),
+        'status': out['status'],
+        'objective': out['objective'],
+        'best_bound': solver.get('best_bound'),
+        'solver_gap_pct': solver.get('gap_pct'),
+        'lower_bound': (out.get('lower_bound') or {}).get('lower_bound'),
+    }
+
+
+def dataset_shape(data_root):
+    """Sizes and value pools of the real dataset that synthetic ones are sampled from."""
+    trains, stations, tracks, _ = so.load_data(data_root)
+    updates = pd.read_csv(so.dataset_paths(data_root)[3])
+    hops = trains['scheduled_route'].astype(str).str.count(',').to_numpy()
+    train_cols = [c for c in ('train_type', 'priority_level', 'coach_length', 'max_speed_kmph') if c in trains.columns]
+    track_cols = [c for c in ('distance_km', 'track_type', 'max_speed_kmph') if c in tracks.columns]
+    return {
+        'stations': len(stations),
+        'tracks': len(tracks),
+        'trains': len(trains),
+        'hops': hops[hops > 0] if (hops > 0).any() else np.array([1]),
+        'train_rows': trains[train_cols].reset_index(drop=True),
+        'track_rows': tracks[track_cols].reset_index(drop=True),
+        'delays': pd.to_numeric(updates.get('delay_minutes', pd.Series([0])), errors='coerce').dropna().astype(int).to_numpy(),
+    }
+
+
+def write_synthetic_dataset(root, shape, scale, seed=0):
+    """
+    Write stations/tracks/trains/train_delay_data CSVs at `scale` times the
+    shape's sizes. Stations are random points linked to near neighbors (a
+    spanning tree plus extra short edges, so it stays connected); trains walk
+    the network for a route length drawn from the real routes; track and train
+    attributes and delays are resampled from the real rows.
+    """
+    rng = np.random.default_rng(seed + scale)
+    n_stations, n_tracks, n_trains = shape['stations'] * scale, shape['tracks'] * scale, shape['trains'] * scale
+    os.makedirs(root, exist_ok=True)
+
+    points = rng.random((n_stations, 2)) * np.sqrt(scale)
+    station_ids = np.array([f'STN{i:06d}' for i in range(n_stations)])
+    pd.DataFrame({
+        'id': station_ids,
+        'station_code': [f'S{i:06d}' for i in range(n_stations)],
+        'station_name': [f'Synthetic {i}' for i in range(n_stations)],
+        'latitude': 20 + points[:, 0],
+        'longitude': 75 + points[:, 1],
+        'platforms': rng.integers(1, 6, n_stations),
+    }).to_csv(os.path.join(root, 'stations.csv'), index=False)
+
+    # tree: each station links to one of its nearest already-placed stations
+    kdtree = cKDTree(points)
+    k = min(8, n_stations)
+    _, near = kdtree.query(points, k=k)
+    near = near.reshape(n_stations, k)
+    edges = set()
+    for i in range(1, n_stations):
+        earlier = [j for j in near[i, 1:] if j < i]
+        j = int(rng.choice(earlier)) if earlier else int(rng.integers(0, i))
+        edges.add((min(i, j), max(i, j)))
+    candidates = [(min(i, int(j)), max(i, int(j))) for i in range(n_stations) for j in near[i, 1:4] if int(j) != i]
+    for e in rng.permutation(len(candidates)):
+        if len(edges) >= n_tracks:
+            break
+        edges.add(candidates[e])
+    edges = sorted(edges)
+
+    track_rows = shape['track_rows'].iloc[rng.integers(0, len(shape['track_rows']), len(edges))].reset_index(drop=True)
+    track_rows = track_rows.rename(columns={'max_speed_kmph': 'speed_limit'})
+    tracks = pd.DataFrame({
+        'track_id': [f'TRK{i:06d}' for i in range(len(edges))],
+        'source_station_id': station_ids[[a for a, _ in edges]],
+        'destination_station_id': station_ids[[b for _, b in edges]],
+    })
+    tracks = pd.concat([tracks, track_rows], axis=1)
+    tracks['status'] = 'operational'
+    tracks.to_csv(os.path.join(root, 'tracks.csv'), index=False)
+
+    neighbors = [[] for _ in range(n_stations)]
+    for a, b in edges:
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    routes = []
+    for hops in rng.choice(shape['hops'], n_trains):
+        route = [int(rng.integers(0, n_stations))]
+        for _ in range(int(hops)):
+            options = [s for s in neighbors[route[-1]] if s not in route[-2:]] or neighbors[route[-1]]
+            route.append(int(rng.choice(options)))
+        routes.append(','.join(station_ids[route]))
+
+    train_ids = [f'TRN{i:06d}' for i in range(n_trains)]
+    trains = pd.DataFrame({'train_id': train_ids, 'train_number': np.arange(10000, 10000 + n_trains)})
+    trains['train_name'] = [f'Synthetic train {i}' for i in range(n_trains)]
+    sampled = shape['train_rows'].iloc[rng.integers(0, len(shape['train_rows']), n_trains)].reset_index(drop=True)
+    trains = pd.concat([trains, sampled], axis=1)
+    trains['scheduled_route'] = routes
+    trains.to_csv(os.path.join(root, 'trains.csv'), index=False)
+
+    # delay reports for a quarter of the trains
+    delayed = rng.choice(n_trains, n_trains // 4, replace=False)
+    departures = pd.Timestamp('2025-09-26') + pd.to_timedelta(rng.integers(0, 24 * 60, len(delayed)), unit='min')
+    pd.DataFrame({
+        'train_id': np.asarray(train_ids)[delayed],
+        'actual_departure_time': departures.strftime('%Y-%m-%d %H:%M:%S'),
+        'delay_minutes': rng.choice(shape['delays'], len(delayed)) if len(shape['delays']) else 0,
+        'track_status': 'free',
+        'weather_impact': 'clear',
+    }).to_csv(os.path.join(root, 'train_delay_data.csv'), index=False)
+
+    return {'stations': n_stations, 'tracks': len(edges), 'trains': n_trains}
@@ -0,0 +1,108 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.model import scheduler_optimization as so
+
+
+class Command(BaseCommand):
+    help = ('Rank CP-SAT solver profiles by objective and solve time on scheduler instances '
+            '(replay_instance ranks them on captured instances instead)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-root', default=None, help='Dataset directory (default: BASE_DIR/datasets)')
+        parser.add_argument('--limit-trains', type=int, nargs='+', default=[20, 60],
+                            help='Instance sizes (first N trains of the dataset)')
+        parser.add_argument('--profiles', nargs='+', default=list(so.SOLVER_PROFILES))
+        parser.add_argument('--time-limit-s', type=float, default=10)
+        parser.add_argument('--seeds', type=int, default=1, help='Runs per profile, with random_seed 0..N-1')
+        parser.add_argument('--output', default=None, help='Also write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        data_root = options['data_root'] or os.path.join(settings.BASE_DIR, 'datasets')
+        profiles = options['profiles']
+        try:
+            for name in profiles:
+                so.resolve_solver_profile(name)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # instances are named after the dataset content, so results of different versions never rank together
+        fingerprint = so.dataset_fingerprint(data_root)
+        runs = []
+        for limit in options['limit_trains']:
+            instance = f'{os.path.basename(os.path.normpath(data_root))}@{fingerprint[:12]}:{limit}'
+            table, horizon, incumbent, windows = self.build_instance(data_root, limit)
+            self.stdout.write(f'{instance}: {table.n_trains} trains in the model, {len(table)} segments')
+            for seed in range(options['seeds']):
+                for name in profiles:
+                    model, _ = so.build_model(table, horizon, hint_starts=incumbent, windows=windows)
+                    started = time.monotonic()
+                    solver, status = so.solve_model(model, options['time_limit_s'],
+                                                    profile={'profile': name, 'random_seed': seed})
+                    feasible = status in (so.cp_model.OPTIMAL, so.cp_model.FEASIBLE)
+                    runs.append({
+                        'instance': instance,
+                        'profile': name,
+                        'seed': seed,
+                        'status': solver.StatusName(status),
+                        'objective': solver.ObjectiveValue() if feasible else None,
+                        'best_bound': solver.BestObjectiveBound() if feasible else None,
+                        'wall_time_s': round(time.monotonic() - started, 3),
+                    })
+
+        if so.dataset_fingerprint(data_root) != fingerprint:
+            raise CommandError(f'{data_root} changed during the benchmark; the results mix dataset versions')
+        ranking = self.rank(runs, profiles)
+        self.stdout.write(f"{'profile':<16}{'mean rank':>10}{'mean gap %':>12}{'optimal':>9}{'mean time s':>13}")
+        for row in ranking:
+            gap = '-' if row['mean_gap_pct'] is None else f"{row['mean_gap_pct']:.2f}"
+            self.stdout.write(f"{row['profile']:<16}{row['mean_rank']:>10.2f}{gap:>12}"
+                              f"{row['optimal']:>9}{row['mean_wall_time_s']:>13.2f}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'dataset': {'data_root': os.path.abspath(data_root), 'fingerprint': fingerprint},
+                           'runs': runs, 'ranking': ranking}, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Best profile: {ranking[0]["profile"]}'))
+
+    def build_instance(self, data_root, limit):
+        """Model inputs as optimize() builds them: presolved table, horizon, list-schedule hint, time windows."""
+        trains, _, tracks, updates = so.load_data(data_root)
+        trains = trains.head(limit).reset_index(drop=True)
+        table = so.build_segment_table(trains, so.build_track_index(tracks), updates)
+        free, _, _ = so.presolve_conflict_free(table)
+        table = table.subset(~free)
+        incumbent = so.list_schedule(table)
+        windows, horizon, _ = so.model_windows(table, so.compute_horizon(table), incumbent)
+        return table, horizon, incumbent, windows
+
+    @staticmethod
+    def rank(runs, profiles):
+        """Rank profiles within each (instance, seed) by objective then time; average over all of them."""
+        ranks = {name: [] for name in profiles}
+        gaps = {name: [] for name in profiles}
+        groups = {}
+        for run in runs:
+            groups.setdefault((run['instance'], run['seed']), []).append(run)
+        for group in groups.values():
+            ordered = sorted(group, key=lambda r: (r['objective'] is None, r['objective'] or 0, r['wall_time_s']))
+            best = ordered[0]['objective']
+            for position, run in enumerate(ordered, start=1):
+                ranks[run['profile']].append(position)
+                if run['objective'] is not None and best:
+                    gaps[run['profile']].append(100.0 * (run['objective'] - best) / best)
+
+        ranking = []
+        for name in profiles:
+            mine = [r for r in runs if r['profile'] == name]
+            ranking.append({
+                'profile': name,
+                'mean_rank': sum(ranks[name]) / len(ranks[name]),
+                'mean_gap_pct': sum(gaps[name]) / len(gaps[name]) if gaps[name] else None,
+                'optimal': sum(r['status'] == 'OPTIMAL' for r in mine),
+                'mean_wall_time_s': sum(r['wall_time_s'] for r in mine) / len(mine),
+            })
+        return sorted(ranking, key=lambda r: (r['mean_rank'], r['mean_wall_time_s']))
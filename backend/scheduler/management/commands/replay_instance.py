@@ -0,0 +1,88 @@
+import json
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.model import scheduler_optimization as so
+
+from .benchmark_solver_profiles import Command as BenchmarkCommand
+
+
+class Command(BaseCommand):
+    help = 'Re-solve captured CP-SAT instances (optimize(capture_path=...)) under one or more solver profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('instances', nargs='+', help=f'Instance files (*{so.INSTANCE_SUFFIX})')
+        parser.add_argument('--profiles', nargs='+', default=['default'])
+        parser.add_argument('--time-limit-s', type=float, default=None,
+                            help='Per solve (default: the time limit of the captured run)')
+        parser.add_argument('--seeds', type=int, default=1, help='Runs per profile, with random_seed 0..N-1')
+        parser.add_argument('--rerun', action='store_true',
+                            help='Also run the whole optimize() pipeline on the captured inputs and settings')
+        parser.add_argument('--output', default=None, help='Also write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        profiles = options['profiles']
+        try:
+            for name in profiles:
+                so.resolve_solver_profile(name)
+            instances = [(path, so.load_instance(path)) for path in options['instances']]
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        runs, reruns = [], []
+        for path, instance in instances:
+            settings = instance['settings']
+            captured = instance['result'].get('solver', {})
+            model_size = instance['result'].get('model', {})
+            self.stdout.write(f"{path}: captured {instance['captured_at']}, "
+                              f"{model_size.get('variables')} variables, {model_size.get('constraints')} constraints; "
+                              f"{captured.get('status')} objective {captured.get('model_objective')} "
+                              f"bound {captured.get('model_bound')} in {captured.get('wall_time_s')}s")
+            time_limit_s = options['time_limit_s'] or settings.get('time_limit_s') or 20
+            for seed in range(options['seeds']):
+                for name in profiles:
+                    model = so.instance_model(instance)
+                    started = time.monotonic()
+                    solver, status = so.solve_model(model, time_limit_s, profile={'profile': name, 'random_seed': seed})
+                    feasible = status in (so.cp_model.OPTIMAL, so.cp_model.FEASIBLE)
+                    runs.append({
+                        'instance': path,
+                        'profile': name,
+                        'seed': seed,
+                        'status': solver.StatusName(status),
+                        'objective': solver.ObjectiveValue() if feasible else None,
+                        'best_bound': solver.BestObjectiveBound() if feasible else None,
+                        'wall_time_s': round(time.monotonic() - started, 3),
+                    })
+                    self.stdout.write(f"  {name} seed {seed}: {runs[-1]['status']} objective {runs[-1]['objective']} "
+                                      f"bound {runs[-1]['best_bound']} in {runs[-1]['wall_time_s']}s")
+            if options['rerun']:
+                try:
+                    reruns.append(self.rerun(path, instance))
+                except ValueError as e:
+                    raise CommandError(f'{path}: {e}')
+
+        ranking = BenchmarkCommand.rank(runs, profiles)
+        if len(profiles) > 1:
+            self.stdout.write(f"{'profile':<16}{'mean rank':>10}{'mean gap %':>12}{'optimal':>9}{'mean time s':>13}")
+            for row in ranking:
+                gap = '-' if row['mean_gap_pct'] is None else f"{row['mean_gap_pct']:.2f}"
+                self.stdout.write(f"{row['profile']:<16}{row['mean_rank']:>10.2f}{gap:>12}"
+                                  f"{row['optimal']:>9}{row['mean_wall_time_s']:>13.2f}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'runs': runs, 'ranking': ranking, 'reruns': reruns}, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Replayed {len(instances)} instance(s)'))
+
+    def rerun(self, path, instance):
+        """optimize() on the captured CSVs; returns its status, objective and phase metrics."""
+        settings = dict(instance['settings'])
+        with tempfile.TemporaryDirectory() as data_root:
+            so.write_instance_inputs(instance, data_root)
+            out = so.optimize(data_root, use_cache=False, quiet=True, **settings)
+        metrics = out.get('metrics', {})
+        phases = ', '.join(f'{k} {v:.3f}s' for k, v in metrics.get('phases', {}).items())
+        self.stdout.write(f"  rerun: {out['status']} objective {out['objective']} ({phases})")
+        return {'instance': path, 'status': out['status'], 'objective': out['objective'], 'metrics': metrics}
@@ -0,0 +1,107 @@
+"""
+Process-local aggregates of optimizer runs, served at /api/scheduler/metrics/.
+
+Every run's phase wall times (res["metrics"]["phases"], plus db_persist and
+csv_export once it is saved) go into one histogram per phase; runs are counted
+by solver status and cache hits, and the objective-to-bound gap of CP-SAT
+solves is a histogram of its own. Numbers are per process and reset on restart.
+"""
+import bisect
+import threading
+
+PHASE_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+GAP_BUCKETS_PCT = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """Counts per upper bound (cumulative on export), plus sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot: above every bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative, total = [], 0
+        for le, n in zip(self.buckets + ("+Inf",), self.counts):
+            total += n
+            cumulative.append({"le": le, "count": total})
+        return {"buckets": cumulative, "sum": round(self.sum, 4), "count": self.count}
+
+
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.gap_pct = Histogram(GAP_BUCKETS_PCT)
+        self.runs_by_status = {}
+        self.cache_hits = 0
+
+    def record_run(self, res):
+        """Add an optimize() result: its phases, status, cache hit and solver gap."""
+        metrics = res.get("metrics") or {}
+        gap = (metrics.get("solver") or {}).get("gap_pct")
+        with self.lock:
+            status = res.get("status") or "UNKNOWN"
+            self.runs_by_status[status] = self.runs_by_status.get(status, 0) + 1
+            if (res.get("cache") or {}).get("hit"):
+                self.cache_hits += 1
+            if gap is not None:
+                self.gap_pct.observe(gap)
+            self._observe_phases(metrics.get("phases") or {})
+
+    def record_phases(self, phases):
+        with self.lock:
+            self._observe_phases(phases)
+
+    def _observe_phases(self, phases):
+        for name, seconds in phases.items():
+            if name not in self.phases:
+                self.phases[name] = Histogram(PHASE_BUCKETS_S)
+            self.phases[name].observe(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "runs": sum(self.runs_by_status.values()),
+                "runs_by_status": dict(self.runs_by_status),
+                "cache_hits": self.cache_hits,
+                "phase_seconds": {name: h.to_dict() for name, h in sorted(self.phases.items())},
+                "gap_pct": self.gap_pct.to_dict(),
+            }
+
+
+registry = RunMetrics()
+
+
+def prometheus_text(snapshot):
+    """Prometheus text exposition of a RunMetrics.snapshot()."""
+    lines = [
+        "# TYPE scheduler_runs_total counter",
+        *[f'scheduler_runs_total{{status="{s}"}} {n}' for s, n in sorted(snapshot["runs_by_status"].items())],
+        "# TYPE scheduler_cache_hits_total counter",
+        f"scheduler_cache_hits_total {snapshot['cache_hits']}",
+        "# TYPE scheduler_phase_seconds histogram",
+    ]
+    for name, hist in snapshot["phase_seconds"].items():
+        lines += _histogram_lines("scheduler_phase_seconds", hist, f'phase="{name}",')
+    lines.append("# TYPE scheduler_gap_percent histogram")
+    lines += _histogram_lines("scheduler_gap_percent", snapshot["gap_pct"], "")
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(metric, hist, labels):
+    lines = [f'{metric}_bucket{{{labels}le="{b["le"]}"}} {b["count"]}' for b in hist["buckets"]]
+    plain = "{" + labels.rstrip(",") + "}" if labels else ""
+    lines.append(f"{metric}_sum{plain} {hist['sum']}")
+    lines.append(f"{metric}_count{plain} {hist['count']}")
+    return lines
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(max_length=20)),
+                ('objective', models.FloatField(blank=True, null=True)),
+                ('horizon', models.IntegerField(blank=True, null=True)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('segment_count', models.IntegerField(default=0)),
+                ('is_current', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_current', True)), fields=('is_current',), name='single_current_schedule_run')],
+            },
+        ),
+        migrations.AddField(
+            model_name='scheduleresult',
+            name='run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='scheduler.schedulerun'),
+        ),
+    ]
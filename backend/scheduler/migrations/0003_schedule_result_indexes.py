@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0002_schedule_runs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduleresult',
+            index=models.Index(fields=['run', 'start_min'], name='sched_run_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleresult',
+            index=models.Index(fields=['run', 'train_id', 'start_min'], name='sched_run_train_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleresult',
+            index=models.Index(fields=['run', 'track_id', 'start_min'], name='sched_run_track_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleresult',
+            index=models.Index(fields=['run', 'from_station', 'start_min'], name='sched_run_from_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleresult',
+            index=models.Index(fields=['run', 'to_station', 'start_min'], name='sched_run_to_idx'),
+        ),
+    ]
@@ -12,16 +12,29 @@ Robust Real-Time AI Scheduling & Optimization (final)
 """
 from __future__ import annotations
 import argparse
+import bisect
+import copy
+import gzip
+import hashlib
 import json
 import math
+import multiprocessing
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait
 from typing import Dict, Tuple, List
 from dateutil import parser as dtparser
 from datetime import timedelta
 
+import numpy as np
 import pandas as pd
 from ortools.sat.python import cp_model
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
 
 
 # ----------------------------
@@ -54,22 +67,67 @@ def choose_column(df: pd.DataFrame, candidates: List[str], default=None):
 # ----------------------------
 # Data loader (permissive)
 # ----------------------------
-def load_data(data_root: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, Dict]:
-    # expected filenames
+# Parsed snapshots keyed by the (path, mtime, size) signature of the four CSVs.
+# Re-running the scheduler on unchanged files skips read_csv + normalization.
+_DATASET_CACHE: Dict[tuple, tuple] = {}
+_DATASET_CACHE_LOCK = threading.Lock()
+_DATASET_CACHE_MAX = 4
+
+
+def dataset_paths(data_root: str) -> List[str]:
     trains_path = os.path.join(data_root, "trains.csv")
     stations_path = os.path.join(data_root, "stations.csv")
     tracks_path = os.path.join(data_root, "tracks.csv")
     updates_path = os.path.join(data_root, "train_delay_data.csv")
-    if not os.path.exists(updates_path):
-        # allow plural or different name
-        alt = os.path.join(data_root, "train_delay_data.csv")
-        if os.path.exists(alt):
-            updates_path = alt
 
     for p in [trains_path, stations_path, tracks_path, updates_path]:
         if not os.path.exists(p):
             raise FileNotFoundError(f"Missing file: {p} (place your CSVs in {data_root})")
+    return [trains_path, stations_path, tracks_path, updates_path]
+
+
+def dataset_signature(data_root: str) -> tuple:
+    """(abs path, mtime_ns, size) for each input CSV; changes whenever a file is rewritten."""
+    sig = []
+    for p in dataset_paths(data_root):
+        st = os.stat(p)
+        sig.append((os.path.abspath(p), st.st_mtime_ns, st.st_size))
+    return tuple(sig)
 
+
+def clear_data_cache():
+    with _DATASET_CACHE_LOCK:
+        _DATASET_CACHE.clear()
+
+
+def load_data(data_root: str, use_cache: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    Load and normalize trains/stations/tracks/updates.
+    The parsed snapshot is cached in memory per file signature; callers get copies
+    of the frames so they can add columns freely.
+    """
+    sig = dataset_signature(data_root)
+    snap = None
+    if use_cache:
+        with _DATASET_CACHE_LOCK:
+            snap = _DATASET_CACHE.get(sig)
+    if snap is None:
+        snap = _parse_datasets(*[p for p, _, _ in sig])
+        if use_cache:
+            with _DATASET_CACHE_LOCK:
+                # drop snapshots of older versions of the same files, then the oldest entry if still full
+                paths = tuple(p for p, _, _ in sig)
+                for old in [k for k in _DATASET_CACHE if tuple(p for p, _, _ in k) == paths]:
+                    del _DATASET_CACHE[old]
+                if len(_DATASET_CACHE) >= _DATASET_CACHE_MAX:
+                    _DATASET_CACHE.pop(next(iter(_DATASET_CACHE)))
+                _DATASET_CACHE[sig] = snap
+
+    trains, stations, tracks, latest_update_by_train = snap
+    return trains.copy(), stations.copy(), tracks.copy(), dict(latest_update_by_train)
+
+
+def _parse_datasets(trains_path: str, stations_path: str, tracks_path: str, updates_path: str):
     trains = pd.read_csv(trains_path)
     stations = pd.read_csv(stations_path)
     tracks = pd.read_csv(tracks_path)
@@ -176,12 +234,15 @@ def load_data(data_root: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame,
 
     latest_update_by_train = {}
     if "train_id" in updates.columns:
-        for _, r in updates.iterrows():
-            latest_update_by_train[r["train_id"]] = {
-                "delay_minutes": int(r.get("delay_minutes", 0) or 0),
-                "track_status": r.get("track_status", "free"),
-                "weather_impact": r.get("weather_impact", "clear"),
-            }
+        # column-wise build of {train_id: {...}}; rows are already unique per train
+        n = len(updates)
+        delays = updates["delay_minutes"].to_numpy(dtype="int64").tolist()
+        statuses = updates["track_status"].tolist() if "track_status" in updates.columns else ["free"] * n
+        weathers = updates["weather_impact"].tolist() if "weather_impact" in updates.columns else ["clear"] * n
+        latest_update_by_train = {
+            tid: {"delay_minutes": d, "track_status": st, "weather_impact": w}
+            for tid, d, st, w in zip(updates["train_id"].tolist(), delays, statuses, weathers)
+        }
 
     return trains, stations, tracks, latest_update_by_train
 
@@ -189,17 +250,167 @@ def load_data(data_root: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame,
 # ----------------------------
 # Convert route -> segments
 # ----------------------------
-def build_track_index(tracks_df: pd.DataFrame) -> Dict[Tuple[str, str], dict]:
-    idx = {}
-    for _, r in tracks_df.iterrows():
-        a = str(r["from_station_id"]).strip()
-        b = str(r["to_station_id"]).strip()
-        row = r.to_dict()
-        idx[(a, b)] = row
-        idx[(b, a)] = row
+class TrackIndex:
+    """
+    Compact, array-backed view of tracks.csv.
+    - stations are interned to int ids (station_ids[i] <-> station_pos[name])
+    - per-track attributes live in NumPy arrays indexed by track row
+    - undirected (a, b) pairs are hashed to a single int64 key (a * n + b) and
+      resolved with a sorted-key search, so whole routes resolve in one gather.
+    """
+
+    def __init__(self, tracks_df: pd.DataFrame):
+        src = tracks_df["from_station_id"].astype(str).str.strip().to_numpy()
+        dst = tracks_df["to_station_id"].astype(str).str.strip().to_numpy()
+        codes, uniques = pd.factorize(np.concatenate([src, dst]))
+        self.station_ids: List[str] = [str(u) for u in uniques]
+        self.station_pos: Dict[str, int] = {s: i for i, s in enumerate(self.station_ids)}
+        n_tracks = len(tracks_df)
+        self.n_stations = len(self.station_ids)
+        self.from_idx = codes[:n_tracks].astype(np.int32)
+        self.to_idx = codes[n_tracks:].astype(np.int32)
+
+        self.track_id = tracks_df["track_id"].astype(str).to_numpy()
+        self.distance_km = tracks_df["distance_km"].to_numpy(dtype=np.float64)
+        self.max_speed_kmph = tracks_df["max_speed_kmph"].to_numpy(dtype=np.float64)
+        self.capacity = tracks_df["capacity"].to_numpy(dtype=np.int32)
+        self.status = tracks_df["status"].astype(str).to_numpy()
+
+        # Both directions map to the same row; on duplicate pairs the later row wins.
+        rows = np.arange(n_tracks, dtype=np.int64)
+        keys = np.concatenate([self._key(self.from_idx, self.to_idx), self._key(self.to_idx, self.from_idx)])
+        rows = np.concatenate([rows, rows])
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        self.pair_keys = keys[last]
+        self.pair_rows = rows[last]
+        self._paths = None
+
+    def __len__(self):
+        return len(self.track_id)
+
+    def _key(self, a, b):
+        return np.asarray(a, dtype=np.int64) * self.n_stations + np.asarray(b, dtype=np.int64)
+
+    def intern(self, stations) -> np.ndarray:
+        """Station names -> int ids (-1 for stations not on any track)."""
+        return np.fromiter((self.station_pos.get(s, -1) for s in stations), dtype=np.int64, count=len(stations))
+
+    def lookup_pairs(self, a_idx: np.ndarray, b_idx: np.ndarray) -> np.ndarray:
+        """Track row for each (a, b) station-id pair, -1 where no direct track exists."""
+        a_idx = np.asarray(a_idx, dtype=np.int64)
+        b_idx = np.asarray(b_idx, dtype=np.int64)
+        out = np.full(len(a_idx), -1, dtype=np.int64)
+        if len(self.pair_keys) == 0 or len(a_idx) == 0:
+            return out
+        valid = (a_idx >= 0) & (b_idx >= 0)
+        keys = self._key(a_idx, b_idx)
+        pos = np.searchsorted(self.pair_keys, keys)
+        pos = np.minimum(pos, len(self.pair_keys) - 1)
+        hit = valid & (self.pair_keys[pos] == keys)
+        out[hit] = self.pair_rows[pos[hit]]
+        return out
+
+    @property
+    def paths(self) -> "ShortestPathIndex":
+        """Shortest-path index over this track graph, built on first use."""
+        if self._paths is None:
+            self._paths = ShortestPathIndex(self)
+        return self._paths
+
+    def route_rows(self, route: List[str]) -> np.ndarray:
+        """Track rows for each consecutive hop of a route (-1 for hops with no direct track)."""
+        if len(route) < 2:
+            return np.empty(0, dtype=np.int64)
+        ids = self.intern(route)
+        return self.lookup_pairs(ids[:-1], ids[1:])
+
+
+class ShortestPathIndex:
+    """
+    Shortest paths (by distance_km) over the track graph.
+    The graph is a CSR adjacency built from the TrackIndex pair table, so every
+    hop of a returned path is the same track row a direct lookup would pick.
+    Single-source distances/predecessors are computed on the first lookup from
+    a station and kept; path lookups are memoized.
+    """
+
+    def __init__(self, track_idx: TrackIndex):
+        self.track_idx = track_idx
+        n = track_idx.n_stations
+        a = self.pair_a = track_idx.pair_keys // max(n, 1)
+        b = self.pair_b = track_idx.pair_keys % max(n, 1)
+        # zero-length tracks would vanish from a sparse matrix; keep them traversable
+        w = np.maximum(track_idx.distance_km[track_idx.pair_rows], 1e-6)
+        self.adjacency = csr_matrix((w, (a, b)), shape=(n, n))
+        self._sources: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._paths: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def _from(self, a: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(dist, pred) rows of the shortest-path tree rooted at station a."""
+        hit = self._sources.get(a)
+        if hit is None:
+            hit = self._sources[a] = dijkstra(self.adjacency, directed=True, indices=a, return_predecessors=True)
+        return hit
+
+    def _path(self, a: int, b: int) -> Tuple[np.ndarray, List[str]]:
+        key = (a, b)
+        hit = self._paths.get(key)
+        if hit is None:
+            hit = (np.empty(0, dtype=np.int64), [])
+            if a >= 0 and b >= 0 and a != b:
+                dist, pred = self._from(a)
+                if np.isfinite(dist[b]):
+                    nodes = [b]
+                    while nodes[-1] != a:
+                        nodes.append(int(pred[nodes[-1]]))
+                    nodes.reverse()
+                    rows = self.track_idx.lookup_pairs(np.array(nodes[:-1]), np.array(nodes[1:]))
+                    hit = (rows, [self.track_idx.station_ids[v] for v in nodes])
+            self._paths[key] = hit
+        return hit
+
+    def path_rows(self, a: int, b: int) -> np.ndarray:
+        """Track rows along the shortest a -> b path (empty if unreachable or a == b)."""
+        return self._path(a, b)[0]
+
+    def path_stations(self, a: int, b: int) -> List[str]:
+        """Station names along the shortest a -> b path, endpoints included."""
+        return self._path(a, b)[1]
+
+
+# TrackIndex objects (and their lazily built path index) keyed by a content hash
+# of the track columns they depend on; any edit to tracks.csv yields a new key.
+_TRACK_INDEX_CACHE: Dict[str, TrackIndex] = {}
+_TRACK_INDEX_CACHE_LOCK = threading.Lock()
+_TRACK_INDEX_CACHE_MAX = 4
+_TRACK_INDEX_COLUMNS = ["track_id", "from_station_id", "to_station_id", "distance_km", "max_speed_kmph", "capacity", "status"]
+
+
+def track_table_fingerprint(tracks_df: pd.DataFrame) -> str:
+    hashed = pd.util.hash_pandas_object(tracks_df[_TRACK_INDEX_COLUMNS].astype(str), index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()
+
+
+def build_track_index(tracks_df: pd.DataFrame) -> TrackIndex:
+    key = track_table_fingerprint(tracks_df)
+    with _TRACK_INDEX_CACHE_LOCK:
+        idx = _TRACK_INDEX_CACHE.get(key)
+    if idx is None:
+        idx = TrackIndex(tracks_df)
+        with _TRACK_INDEX_CACHE_LOCK:
+            if len(_TRACK_INDEX_CACHE) >= _TRACK_INDEX_CACHE_MAX:
+                _TRACK_INDEX_CACHE.pop(next(iter(_TRACK_INDEX_CACHE)))
+            _TRACK_INDEX_CACHE[key] = idx
     return idx
 
 
+def parse_route(route_value) -> List[str]:
+    return [s.strip() for s in str(route_value).split(",") if s.strip()]
+
+
 def weather_multiplier(weather: str) -> float:
     if not isinstance(weather, str):
         return 1.0
@@ -239,35 +450,187 @@ def segment_minutes(distance_km, track_vmax, train_vmax, weather="clear", tstatu
     return max(1, int(math.ceil(base + 2)))
 
 
-def route_to_segments(train_row: pd.Series, track_idx: Dict, latest_update_by_train: Dict):
-    tid = train_row["train_id"]
-    route = [s.strip() for s in str(train_row["scheduled_route"]).split(",") if s.strip()]
-    vmax = float(train_row.get("max_speed_kmph", 100.0) or 100.0)
-    upd = latest_update_by_train.get(tid, {"delay_minutes": 0, "track_status": "free", "weather_impact": "clear"})
-    weather = upd.get("weather_impact", "clear")
-    tstatus = upd.get("track_status", "free")
-    segs = []
-    for a, b in zip(route, route[1:]):
-        tr = track_idx.get((a, b))
-        if tr is None:
-            # no direct track — skip segment (you may want to handle differently)
-            continue
-        dur = segment_minutes(
-            distance_km=tr.get("distance_km", 1.0),
-            track_vmax=tr.get("max_speed_kmph", 100.0),
-            train_vmax=vmax,
-            weather=weather,
-            tstatus=tstatus,
+class SegmentTable:
+    """
+    Struct-of-arrays view of every (train, segment) pair in one run.
+    Segments of train i occupy rows offsets[i]:offsets[i + 1], in route order.
+    """
+
+    def __init__(self, train_ids, priority, release, offsets, track_row, track_id,
+                 from_station, to_station, duration, capacity, expanded_hops=0, unreachable_hops=0,
+                 unknown_stops=0):
+        self.train_ids: List[str] = list(train_ids)
+        self.priority = np.asarray(priority, dtype=np.int64)
+        self.release = np.asarray(release, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.track_row = np.asarray(track_row, dtype=np.int64)
+        self.track_id = np.asarray(track_id, dtype=object)
+        self.from_station = np.asarray(from_station, dtype=object)
+        self.to_station = np.asarray(to_station, dtype=object)
+        self.duration = np.asarray(duration, dtype=np.int64)
+        self.capacity = np.asarray(capacity, dtype=np.int64)
+        self.expanded_hops = int(expanded_hops)
+        self.unreachable_hops = int(unreachable_hops)
+        self.unknown_stops = int(unknown_stops)
+
+    @property
+    def n_trains(self) -> int:
+        return len(self.train_ids)
+
+    def __len__(self):
+        return len(self.duration)
+
+    def train_slice(self, i: int) -> slice:
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def train_of_row(self) -> np.ndarray:
+        """Train position for every segment row."""
+        return np.repeat(np.arange(self.n_trains), np.diff(self.offsets))
+
+    def row_mask(self, train_mask: np.ndarray) -> np.ndarray:
+        """Expand a per-train mask to a per-segment-row mask."""
+        return np.repeat(np.asarray(train_mask, dtype=bool), np.diff(self.offsets))
+
+    def subset(self, train_mask: np.ndarray) -> "SegmentTable":
+        """New table holding only the selected trains (order preserved)."""
+        train_mask = np.asarray(train_mask, dtype=bool)
+        rows = self.row_mask(train_mask)
+        counts = np.diff(self.offsets)[train_mask]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return SegmentTable(
+            train_ids=[t for t, m in zip(self.train_ids, train_mask) if m],
+            priority=self.priority[train_mask],
+            release=self.release[train_mask],
+            offsets=offsets,
+            track_row=self.track_row[rows],
+            track_id=self.track_id[rows],
+            from_station=self.from_station[rows],
+            to_station=self.to_station[rows],
+            duration=self.duration[rows],
+            capacity=self.capacity[rows],
         )
-        segs.append({
-            "track_id": tr.get("track_id"),
-            "from": a,
-            "to": b,
-            "duration": int(dur),
-            "capacity": int(tr.get("capacity", 1)),
-        })
-    release_delay = int(latest_update_by_train.get(tid, {}).get("delay_minutes", 0) or 0)
-    return segs, release_delay
+
+    def segments_for(self, i: int) -> List[dict]:
+        """Segments of train i in the legacy list-of-dicts shape."""
+        sl = self.train_slice(i)
+        return [
+            {"track_id": t, "from": a, "to": b, "duration": int(d), "capacity": int(c)}
+            for t, a, b, d, c in zip(self.track_id[sl], self.from_station[sl], self.to_station[sl],
+                                     self.duration[sl], self.capacity[sl])
+        ]
+
+
+def _categorical_multipliers(values, fn) -> np.ndarray:
+    """Apply a string -> multiplier function once per distinct value, then gather."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    table = np.array([fn(u) for u in uniques] + [fn(None)], dtype=np.float64)
+    return table[codes]  # sentinel -1 picks the trailing fn(None) entry
+
+
+def segment_minutes_batch(distance_km, track_vmax, train_vmax, weather_mult, status_mult) -> np.ndarray:
+    """Vectorized segment_minutes over aligned arrays."""
+    vmax = np.maximum(5.0, np.minimum(track_vmax, train_vmax))
+    base = (distance_km / vmax) * 60.0
+    base = base * weather_mult
+    base = base * status_mult
+    return np.maximum(1, np.ceil(base + 2)).astype(np.int64)
+
+
+def build_segment_table(trains: pd.DataFrame, track_idx: TrackIndex, latest_update_by_train: Dict) -> SegmentTable:
+    """Expand every train's route and compute all segment durations in one batch."""
+    n = len(trains)
+    train_ids = trains["train_id"].tolist()
+
+    # per-train attributes
+    upd = [latest_update_by_train.get(t) for t in train_ids]
+    release = np.array([int(u.get("delay_minutes", 0) or 0) if u else 0 for u in upd], dtype=np.int64)
+    weather = [u.get("weather_impact", "clear") if u else "clear" for u in upd]
+    tstatus = [u.get("track_status", "free") if u else "free" for u in upd]
+    w_mult = _categorical_multipliers(weather, weather_multiplier)
+    s_mult = _categorical_multipliers(tstatus, status_multiplier)
+    vmax = pd.to_numeric(trains["max_speed_kmph"], errors="coerce").fillna(100.0).to_numpy(dtype=np.float64)
+    vmax = np.where(vmax == 0, 100.0, vmax)
+    priority = trains["priority_level"].to_numpy(dtype=np.int64) if "priority_level" in trains.columns else np.full(n, 3)
+
+    # flatten routes: one row per station visit, tagged with its train position
+    stops = trains["scheduled_route"].astype(str).str.split(",").explode()
+    stops = stops.str.strip()
+    stops = stops[stops.notna() & (stops != "")]
+    stop_train = trains.index.get_indexer(stops.index)
+    stop_names = stops.to_numpy(dtype=object)
+    stop_ids = track_idx.intern(stop_names)
+    # stations on no track are skipped, so their known neighbours are bridged below
+    known = stop_ids >= 0
+    unknown = int((~known).sum())
+    stop_train, stop_names, stop_ids = stop_train[known], stop_names[known], stop_ids[known]
+
+    # hops are consecutive known stops of the same train
+    same = stop_train[1:] == stop_train[:-1]
+    hop_train = stop_train[:-1][same]
+    hop_from = stop_names[:-1][same]
+    hop_to = stop_names[1:][same]
+    hop_a, hop_b = stop_ids[:-1][same], stop_ids[1:][same]
+    rows = track_idx.lookup_pairs(hop_a, hop_b)
+
+    # hops with no direct track are expanded along the shortest path; hops between
+    # disconnected stations are dropped
+    missing = np.flatnonzero(rows < 0)
+    expanded = unreachable = 0
+    if len(missing):
+        counts = (rows >= 0).astype(np.int64)
+        detours = {}
+        for j in missing:
+            a, b = int(hop_a[j]), int(hop_b[j])
+            prows = track_idx.paths.path_rows(a, b)
+            if len(prows):
+                detours[j] = (prows, track_idx.paths.path_stations(a, b))
+                counts[j] = len(prows)
+                expanded += 1
+            else:
+                unreachable += 1
+        starts = np.cumsum(counts) - counts
+        total = int(counts.sum())
+        direct = rows >= 0
+        new_rows = np.empty(total, dtype=np.int64)
+        new_from = np.empty(total, dtype=object)
+        new_to = np.empty(total, dtype=object)
+        new_rows[starts[direct]] = rows[direct]
+        new_from[starts[direct]] = hop_from[direct]
+        new_to[starts[direct]] = hop_to[direct]
+        for j, (prows, stops) in detours.items():
+            sl = slice(starts[j], starts[j] + len(prows))
+            new_rows[sl] = prows
+            new_from[sl] = stops[:-1]
+            new_to[sl] = stops[1:]
+        hop_train = np.repeat(hop_train, counts)
+        rows, hop_from, hop_to = new_rows, new_from, new_to
+
+    duration = segment_minutes_batch(
+        track_idx.distance_km[rows],
+        track_idx.max_speed_kmph[rows],
+        vmax[hop_train],
+        w_mult[hop_train],
+        s_mult[hop_train],
+    )
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(hop_train, minlength=n), out=offsets[1:])
+
+    return SegmentTable(
+        train_ids=train_ids,
+        priority=priority,
+        release=release,
+        offsets=offsets,
+        track_row=rows,
+        track_id=track_idx.track_id[rows].astype(object),
+        from_station=hop_from,
+        to_station=hop_to,
+        duration=duration,
+        capacity=track_idx.capacity[rows],
+        expanded_hops=expanded,
+        unreachable_hops=unreachable,
+        unknown_stops=unknown,
+    )
 
 
 # ----------------------------
@@ -318,130 +681,1886 @@ def explain_schedule(out, trains, tracks, updates):
 # ----------------------------
 # CP-SAT model + solve
 # ----------------------------
-def optimize(data_root: str, now_ts=None, limit_trains=None, time_limit_s: int = 20):
-    trains, stations, tracks, updates = load_data(data_root)
-    if limit_trains:
-        trains = trains.head(int(limit_trains)).copy()
-
-    track_idx = build_track_index(tracks)
-
-    # compute segments per train
-    trains["segments"] = None
-    trains["segments_release"] = None
-    for i, r in trains.iterrows():
-        segs, rel = route_to_segments(r, track_idx, updates)
-        trains.at[i, "segments"] = segs
-        trains.at[i, "segments_release"] = rel
-
-    # horizon
-    horizon = 0
-    for segs in trains["segments"]:
-        if segs:
-            horizon += sum(s["duration"] for s in segs)
-    horizon = int(horizon * 1.5) + 200
+def compute_horizon(table: SegmentTable) -> int:
+    horizon = int(int(table.duration.sum()) * 1.5) + 200
     if horizon < 300:
         horizon = 300
+    return horizon
 
-    model = cp_model.CpModel()
 
-    train_intervals = {}   # (tid,k) -> (s_var,e_var,dur, interval)
-    track_buckets = {}     # track_id -> { intervals: [IntervalVar], demands: [int], capacity: int }
+def priority_weights(priority: np.ndarray) -> np.ndarray:
+    return 2 ** np.maximum(0, 4 - np.asarray(priority, dtype=np.int64))
 
-    for _, tr in trains.iterrows():
-        tid = tr["train_id"]
-        segs = tr["segments"] or []
-        release = int(tr.get("segments_release", 0) or 0)
+
+def weighted_objective(table: SegmentTable, starts: np.ndarray, train_mask=None) -> float:
+    """Sum over trains (those in train_mask, if given) of priority weight x end of the last segment."""
+    has_segs = np.diff(table.offsets) > 0
+    if train_mask is not None:
+        has_segs &= np.asarray(train_mask, dtype=bool)
+    last_rows = table.offsets[1:][has_segs] - 1
+    ends = starts[last_rows] + table.duration[last_rows]
+    return float((priority_weights(table.priority[has_segs]) * ends).sum())
+
+
+def interchangeable_trains(table: SegmentTable, fixed_starts=None, active=None) -> List[np.ndarray]:
+    """
+    Groups (>= 2 trains, ascending positions) of free trains that are
+    interchangeable: same release, priority, track sequence and durations.
+    Swapping the plans of two such trains changes neither feasibility nor the
+    objective, so the solver may order them. Trains with any fixed row or
+    outside `active` are left out.
+    """
+    free = np.diff(table.offsets) > 0
+    if active is not None:
+        free &= np.asarray(active, dtype=bool)
+    if fixed_starts is not None:
+        fixed_rows = np.bincount(table.train_of_row(), weights=fixed_starts >= 0, minlength=table.n_trains)
+        free &= fixed_rows == 0
+    groups = {}
+    for i in np.flatnonzero(free).tolist():
+        sl = table.train_slice(i)
+        key = (int(table.release[i]), int(table.priority[i]),
+               table.track_row[sl].tobytes(), table.duration[sl].tobytes())
+        groups.setdefault(key, []).append(i)
+    return [np.array(g, dtype=np.int64) for g in groups.values() if len(g) > 1]
+
+
+def build_model(table: SegmentTable, horizon: int, fixed_starts=None, hint_starts=None, active=None,
+                windows=None, stats: dict = None, symmetry_breaking: bool = True):
+    """
+    CP-SAT model over the segment table; returns (model, seg_vars) with
+    seg_vars[row] = (start, end, interval) or None for rows left out.
+    - fixed_starts: per-row start (-1 = free); fixed rows get a constant domain.
+    - hint_starts: per-row start (-1 = none) passed to AddHint.
+    - active: per-train mask. Inactive trains must be fully fixed; they only
+      contribute their intervals on tracks an active train uses, and no objective.
+    - windows: (est, lct) per row from interval_windows(); start/end domains are
+      tightened to them and each track's resource constraint is split into
+      clusters of intervals whose windows can overlap.
+    - stats: optional dict filled with resource-constraint and symmetry counts.
+    - symmetry_breaking: order the first start of interchangeable trains
+      (interchangeable_trains()) by position; hints are permuted to match.
+    """
+    model = cp_model.CpModel()
+    symmetric = interchangeable_trains(table, fixed_starts, active) if symmetry_breaking else []
+
+    seg_vars = [None] * len(table)   # row -> (s_var, e_var, interval)
+    track_buckets = {}     # track_id -> { rows: [int], intervals: [IntervalVar], capacity: int }
+
+    durations = table.duration.tolist()
+    capacities = table.capacity.tolist()
+    track_ids = table.track_id.tolist()
+    fixed = fixed_starts.tolist() if fixed_starts is not None else None
+    hints = hint_starts.tolist() if hint_starts is not None else None
+    if hints is not None and symmetric:
+        hints = _ordered_hints(table, hints, symmetric)
+    if windows is not None:
+        est, lct = windows[0].copy(), windows[1].copy()
+        if fixed_starts is not None:
+            is_fixed = fixed_starts >= 0
+            est[is_fixed] = fixed_starts[is_fixed]
+            lct[is_fixed] = fixed_starts[is_fixed] + table.duration[is_fixed]
+        est_list, lct_list = est.tolist(), lct.tolist()
+    if active is None:
+        active = np.ones(table.n_trains, dtype=bool)
+        touched = None
+    else:
+        touched = set(table.track_id[np.repeat(active, np.diff(table.offsets))].tolist())
+
+    for i, tid in enumerate(table.train_ids):
+        sl = table.train_slice(i)
+        release = int(table.release[i])
+        is_active = bool(active[i])
 
         prev_end = None
-        for k, s in enumerate(segs):
-            s_var = model.NewIntVar(0, horizon, f"s_{tid}_{k}")
-            e_var = model.NewIntVar(0, horizon, f"e_{tid}_{k}")
-            dur_val = int(s["duration"])
-            model.Add(e_var == s_var + dur_val)
-            iv = model.NewIntervalVar(s_var, dur_val, e_var, f"iv_{tid}_{k}")
-            train_intervals[(tid, k)] = (s_var, e_var, dur_val, iv)
-
-            if k == 0:
-                model.Add(s_var >= release)
-            if prev_end is not None:
-                model.Add(s_var >= prev_end)
-            prev_end = e_var
-
-            trkid = s["track_id"]
+        for k, row in enumerate(range(sl.start, sl.stop)):
+            trkid = track_ids[row]
+            if not is_active and trkid not in touched:
+                continue
+            dur_val = durations[row]
+            if fixed is not None and fixed[row] >= 0:
+                s_var = model.NewConstant(fixed[row])
+                e_var = model.NewConstant(fixed[row] + dur_val)
+                iv = model.NewFixedSizeIntervalVar(fixed[row], dur_val, f"iv_{tid}_{k}")
+            else:
+                if windows is not None:
+                    s_lo, e_hi = est_list[row], lct_list[row]
+                else:
+                    s_lo, e_hi = 0, horizon
+                s_var = model.NewIntVar(s_lo, e_hi - dur_val, f"s_{tid}_{k}")
+                e_var = model.NewIntVar(s_lo + dur_val, e_hi, f"e_{tid}_{k}")
+                model.Add(e_var == s_var + dur_val)
+                iv = model.NewIntervalVar(s_var, dur_val, e_var, f"iv_{tid}_{k}")
+                if hints is not None and hints[row] >= 0:
+                    model.AddHint(s_var, hints[row])
+                    model.AddHint(e_var, hints[row] + dur_val)
+            seg_vars[row] = (s_var, e_var, iv)
+
+            if is_active:
+                if k == 0:
+                    model.Add(s_var >= release)
+                if prev_end is not None:
+                    model.Add(s_var >= prev_end)
+                prev_end = e_var
+
             if trkid not in track_buckets:
-                track_buckets[trkid] = {"intervals": [], "demands": [], "capacity": int(s.get("capacity", 1))}
+                track_buckets[trkid] = {"rows": [], "intervals": [], "capacity": capacities[row]}
+            track_buckets[trkid]["rows"].append(row)
             track_buckets[trkid]["intervals"].append(iv)
-            track_buckets[trkid]["demands"].append(1)
-            track_buckets[trkid]["capacity"] = min(track_buckets[trkid]["capacity"], int(s.get("capacity", 1)))
+            track_buckets[trkid]["capacity"] = min(track_buckets[trkid]["capacity"], capacities[row])
 
     # resource constraints: use AddNoOverlap for cap==1 or AddCumulative(intervals, demands, cap)
+    n_constraints = n_split_tracks = 0
     for trkid, bucket in track_buckets.items():
-        ivs = bucket["intervals"]
-        demands = bucket["demands"]
         cap = int(bucket.get("capacity", 1))
-        if len(ivs) == 0:
-            continue
-        if cap <= 1:
-            model.AddNoOverlap(ivs)
+        if windows is not None:
+            groups = sweep_clusters(est[bucket["rows"]], lct[bucket["rows"]])
+            n_split_tracks += len(groups) > 1
         else:
-            # IMPORTANT: correct signature used here: intervals, demands, capacity
-            model.AddCumulative(ivs, demands, cap)
+            groups = [np.arange(len(bucket["rows"]))]
+        for group in groups:
+            ivs = [bucket["intervals"][j] for j in group.tolist()]
+            if len(ivs) <= max(cap, 1):
+                # never more intervals than slots here: the constraint cannot bind
+                continue
+            n_constraints += 1
+            if cap <= 1:
+                model.AddNoOverlap(ivs)
+            else:
+                # IMPORTANT: correct signature used here: intervals, demands, capacity
+                model.AddCumulative(ivs, [1] * len(ivs), cap)
+    # interchangeable trains leave in position order
+    for group in symmetric:
+        firsts = [seg_vars[int(table.offsets[i])][0] for i in group.tolist()]
+        for a, b in zip(firsts, firsts[1:]):
+            model.Add(a <= b)
+
+    if stats is not None:
+        stats["resource_constraints"] = n_constraints
+        stats["split_tracks"] = n_split_tracks
+        stats["symmetric_trains"] = int(sum(len(g) for g in symmetric))
+        stats["symmetry_constraints"] = int(sum(len(g) - 1 for g in symmetric))
 
     # Objective: minimize weighted last-end
     obj_terms = []
-    for _, tr in trains.iterrows():
-        tid = tr["train_id"]
-        segs = tr["segments"] or []
-        if not segs:
+    weights = priority_weights(table.priority).tolist()
+    for i in range(table.n_trains):
+        sl = table.train_slice(i)
+        if sl.stop == sl.start or not active[i]:
             continue
-        last_key = (tid, len(segs) - 1)
-        if last_key in train_intervals:
-            last_end = train_intervals[last_key][1]
-            pr = int(tr.get("priority_level", 3))
-            w = 2 ** max(0, 4 - pr)
-            obj_terms.append(w * last_end)
+        last_end = seg_vars[sl.stop - 1][1]
+        obj_terms.append(weights[i] * last_end)
 
     if obj_terms:
         model.Minimize(sum(obj_terms))
 
+    return model, seg_vars
+
+
+def _ordered_hints(table: SegmentTable, hints: list, groups: List[np.ndarray]) -> list:
+    """Hints with the plans inside each interchangeable group swapped so first starts ascend by position."""
+    hints = list(hints)
+    for group in groups:
+        group = group.tolist()
+        blocks = [hints[table.train_slice(i)] for i in group]
+        if any(block[0] < 0 for block in blocks):
+            continue
+        blocks.sort(key=lambda block: block[0])
+        for i, block in zip(group, blocks):
+            hints[table.train_slice(i)] = block
+    return hints
+
+
+# ----------------------------
+# Time windows per interval
+# ----------------------------
+def _earliest_gap(unit_starts: list, unit_ends: list, t: int, dur: int) -> int:
+    """Earliest c >= t with [c, c + dur) clear of one capacity unit's sorted, disjoint bookings."""
+    j = bisect.bisect_right(unit_ends, t)
+    while j < len(unit_starts) and unit_starts[j] < t + dur:
+        t = max(t, unit_ends[j])
+        j += 1
+    return t
+
+
+def _book(track_units: list, t: int, dur: int, exact: bool = False) -> int:
+    """Book [c, c + dur) on the unit of a track that frees up first; exact=True pins c = t."""
+    best_c, best_unit = None, track_units[0]
+    for unit in track_units:
+        c = _earliest_gap(unit[0], unit[1], t, dur)
+        if best_c is None or c < best_c:
+            best_c, best_unit = c, unit
+        if c == t:
+            break
+    c = t if exact else best_c
+    pos = bisect.bisect_left(best_unit[0], c)
+    best_unit[0].insert(pos, c)
+    best_unit[1].insert(pos, c + dur)
+    return c
+
+
+def list_schedule(table: SegmentTable, fixed_starts=None, order=None) -> np.ndarray:
+    """
+    Priority list scheduler: a feasible plan in milliseconds, without CP-SAT.
+    Trains are dispatched in `order` (default: priority_level, then release
+    time); each segment starts at the earliest time after its predecessor at
+    which one unit of its track's capacity is idle for the whole segment,
+    reusing gaps left by trains dispatched before it. Rows with
+    fixed_starts >= 0 are booked first and never moved.
+    """
+    starts = [-1] * len(table) if fixed_starts is None else np.asarray(fixed_starts, dtype=np.int64).tolist()
+    track_ids = table.track_id.tolist()
+    durations = table.duration.tolist()
+
+    # one timeline per unit of capacity; a track's capacity is its smallest over rows, as in build_model
+    capacity = {}
+    for trkid, cap in zip(track_ids, table.capacity.tolist()):
+        capacity[trkid] = min(capacity.get(trkid, cap), cap)
+    units = {trkid: [([], []) for _ in range(max(1, cap))] for trkid, cap in capacity.items()}
+
+    # in start order a unit idle at a fixed row's start stays idle for all of it
+    # (every booking so far starts no later), so capacity-feasible fixed rows always fit
+    fixed_rows = sorted((s, row) for row, s in enumerate(starts) if s >= 0)
+    for s, row in fixed_rows:
+        _book(units[track_ids[row]], s, durations[row], exact=True)
+
+    if order is None:
+        order = np.lexsort((table.release, table.priority))
+    for i in order:
+        sl = table.train_slice(int(i))
+        t = int(table.release[i])
+        for row in range(sl.start, sl.stop):
+            if starts[row] < 0:
+                starts[row] = _book(units[track_ids[row]], t, durations[row])
+            t = starts[row] + durations[row]
+    return np.asarray(starts, dtype=np.int64)
+
+
+def schedule_violations(table: SegmentTable, starts) -> dict:
+    """
+    Rows of a plan that break a constraint of build_model(): not scheduled,
+    starting before their train's release, overlapping the previous segment of
+    their train, or starting while their track is already at capacity.
+    A plan is feasible when every count is 0.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = starts + table.duration
+    has_segs = np.diff(table.offsets) > 0
+    first_rows = table.offsets[:-1][has_segs]
+    later = np.ones(len(table), dtype=bool)
+    later[first_rows] = False
+    prev_ends = np.concatenate([[0], ends[:-1]])
+
+    # sweep per track: ends sort before starts at the same minute; loads restart at 0 per track
+    tracks, track_col = np.unique(table.track_id.astype(str), return_inverse=True)
+    cap = np.full(len(tracks), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(cap, track_col, table.capacity)
+    times = np.concatenate([starts, ends])
+    deltas = np.concatenate([np.ones(len(table), dtype=np.int64), -np.ones(len(table), dtype=np.int64)])
+    cols = np.concatenate([track_col, track_col])
+    order = np.lexsort((deltas, times, cols))
+    load = np.cumsum(deltas[order])
+    over = (deltas[order] > 0) & (load > np.maximum(cap, 1)[cols[order]])
+    return {
+        "unscheduled": int((starts < 0).sum()),
+        "before_release": int((starts[first_rows] < table.release[has_segs]).sum()),
+        "overlapping_predecessor": int((later & (starts < prev_ends)).sum()),
+        "over_capacity": int(over.sum()),
+    }
+
+
+def is_feasible(table: SegmentTable, starts) -> bool:
+    return starts is not None and not any(schedule_violations(table, starts).values())
+
+
+def interval_windows(table: SegmentTable, horizon: int, upper_bound: float = None):
+    """
+    Earliest start / latest end per segment row.
+    est: release + route time before the segment.
+    lct: the horizon, or tighter given an objective upper bound UB (the latest
+    end a train can have in any solution no worse than UB), minus route time after it.
+    Returns (est, lct, horizon); the horizon is raised only if a train cannot
+    finish inside it even without conflicts.
+    """
+    train_of_row = table.train_of_row()
+    cum_dur = np.concatenate([[0], np.cumsum(table.duration)])
+    head = cum_dur[:-1] - cum_dur[table.offsets[:-1]][train_of_row]
+    tail = cum_dur[table.offsets[1:]][train_of_row] - cum_dur[1:]
+    est = table.release[train_of_row] + head
+
+    route_time = np.diff(cum_dur[table.offsets])
+    horizon = max(int(horizon), int((table.release + route_time).max(initial=0)))
+    latest_end = np.full(table.n_trains, horizon, dtype=np.int64)
+    if upper_bound is not None:
+        # w_i * end_i <= UB - sum_{j != i} w_j * LB_j, with LB_j = release_j + route time
+        has_segs = route_time > 0
+        w = priority_weights(table.priority)
+        lb_end = table.release + route_time
+        slack = float(upper_bound) - float((w * lb_end)[has_segs].sum())
+        bound = np.floor(lb_end + np.maximum(slack, 0) / w).astype(np.int64)
+        latest_end = np.minimum(latest_end, np.maximum(bound, lb_end))
+    lct = latest_end[train_of_row] - tail
+    return est, lct, horizon
+
+
+def model_windows(table: SegmentTable, horizon: int, incumbent=None):
+    """
+    interval_windows() for a model build. A feasible incumbent (list_schedule()
+    plan, respecting any fixed rows) supplies the objective upper bound;
+    without one only the horizon is used.
+    Returns ((est, lct), horizon, report).
+    """
+    upper_bound = None
+    if incumbent is not None and len(table):
+        upper_bound = weighted_objective(table, incumbent)
+        # the incumbent must stay inside the domains it bounds
+        horizon = max(int(horizon), int((incumbent + table.duration).max()))
+    est, lct, horizon = interval_windows(table, horizon, upper_bound)
+    free_span = (lct - table.duration - est) if len(table) else np.zeros(0)
+    report = {
+        "upper_bound": upper_bound,
+        "mean_start_window_min": round(float(free_span.mean()), 1) if len(free_span) else 0.0,
+        "horizon": int(horizon),
+    }
+    return (est, lct), horizon, report
+
+
+def objective_lower_bound(table: SegmentTable, active=None) -> dict:
+    """
+    Cheap lower bound on the weighted objective of the `active` trains (all by default).
+    - critical path: a train ends no earlier than release + route time.
+    - track load: the trains passing a track once must share its capacity c.
+      Relaxing their earliest starts to the track's earliest one, their
+      weighted track completions are at least the single-machine WSPT value / c
+      + (c - 1) / 2c * sum(w * p) (Eastman-Even-Isaacs); adding each train's
+      route time after the track bounds their weighted ends.
+    Tracks are taken greedily by excess over the critical paths, skipping any
+    that shares a train with one already taken, so the excesses add up.
+    """
+    active = np.ones(table.n_trains, dtype=bool) if active is None else np.asarray(active, dtype=bool)
+    train_of_row = table.train_of_row()
+    cum_dur = np.concatenate([[0], np.cumsum(table.duration)])
+    head = cum_dur[:-1] - cum_dur[table.offsets[:-1]][train_of_row]
+    tail = cum_dur[table.offsets[1:]][train_of_row] - cum_dur[1:]
+    route_time = np.diff(cum_dur[table.offsets])
+    counted = active & (route_time > 0)
+    w = priority_weights(table.priority).astype(np.float64)
+    critical = (table.release + route_time).astype(np.float64)
+    critical_path = float((w * critical)[counted].sum())
+
+    # rows of counted trains that use their track once, grouped by track
+    rows = np.flatnonzero(counted[train_of_row])
+    once = ~pd.DataFrame({"track": table.track_row[rows], "train": train_of_row[rows]}).duplicated(keep=False).to_numpy()
+    rows = rows[once]
+    rows = rows[np.argsort(table.track_row[rows], kind="stable")]
+    est = table.release[train_of_row] + head
+
+    excesses = []
+    for group in np.split(rows, np.flatnonzero(np.diff(table.track_row[rows])) + 1):
+        if len(group) < 2:
+            continue
+        cap = max(1, int(table.capacity[group].min()))
+        if len(group) <= cap:
+            continue
+        trains = train_of_row[group]
+        wg, p = w[trains], table.duration[group].astype(np.float64)
+        order = np.argsort(p / wg, kind="stable")
+        wspt = float((wg[order] * np.cumsum(p[order])).sum())
+        load_bound = (float(est[group].min()) * wg.sum() + wspt / cap + (cap - 1) / (2 * cap) * float((wg * p).sum())
+                      + float((wg * tail[group]).sum()))
+        excess = load_bound - float((wg * critical[trains]).sum())
+        if excess > 0:
+            excesses.append((excess, trains))
+
+    excesses.sort(key=lambda e: -e[0])
+    taken = np.zeros(table.n_trains, dtype=bool)
+    track_load = 0.0
+    n_tracks = 0
+    for excess, trains in excesses:
+        if taken[trains].any():
+            continue
+        taken[trains] = True
+        track_load += excess
+        n_tracks += 1
+    return {
+        "critical_path": critical_path,
+        "track_load": round(float(track_load), 3),
+        "bound_tracks": n_tracks,
+        # objectives are integral
+        "lower_bound": float(math.ceil(critical_path + track_load - 1e-6)),
+    }
+
+
+def lower_bound_report(bound: dict, objective, objective_offset: float = 0.0, gap_limit=None,
+                       stopped_early: bool = False) -> dict:
+    """objective_lower_bound() in full-objective terms (plus the share the model left out), with the gap to objective."""
+    lower_bound = bound["lower_bound"] + objective_offset
+    return {
+        "critical_path": bound["critical_path"] + objective_offset,
+        "track_load": bound["track_load"],
+        "bound_tracks": bound["bound_tracks"],
+        "lower_bound": lower_bound,
+        "gap_pct": round(100.0 * (objective - lower_bound) / objective, 3) if objective else None,
+        "gap_limit": gap_limit,
+        "stopped_early": stopped_early,
+    }
+
+
+def sweep_clusters(est: np.ndarray, lct: np.ndarray) -> List[np.ndarray]:
+    """Split intervals into groups whose [est, lct) windows chain-overlap (sweep over est)."""
+    order = np.argsort(est, kind="stable")
+    groups, current, reach = [], [], None
+    for j in order.tolist():
+        if current and est[j] >= reach:
+            groups.append(np.array(current))
+            current, reach = [], None
+        current.append(j)
+        reach = lct[j] if reach is None else max(reach, lct[j])
+    if current:
+        groups.append(np.array(current))
+    return groups
+
+
+# ----------------------------
+# Solver profiles + solve
+# ----------------------------
+SOLVER_PARAM_KEYS = ("num_workers", "relative_gap_limit", "search_branching", "linearization_level", "random_seed")
+SEARCH_BRANCHINGS = ("AUTOMATIC_SEARCH", "FIXED_SEARCH", "PORTFOLIO_SEARCH", "LP_SEARCH", "PSEUDO_COST_SEARCH",
+                     "PORTFOLIO_WITH_QUICK_RESTART_SEARCH", "HINT_SEARCH", "PARTIAL_FIXED_SEARCH", "RANDOMIZED_SEARCH")
+
+# named CP-SAT settings; keys left out keep the solver's own defaults
+SOLVER_PROFILES = {
+    "default": {"num_workers": 8},
+    "fast": {"num_workers": 8, "relative_gap_limit": 0.02, "linearization_level": 0},
+    "lp": {"num_workers": 8, "linearization_level": 2},
+    "single": {"num_workers": 1},
+    "fixed": {"num_workers": 1, "search_branching": "FIXED_SEARCH"},
+    "quick_restart": {"num_workers": 1, "search_branching": "PORTFOLIO_WITH_QUICK_RESTART_SEARCH"},
+}
+
+
+def resolve_solver_profile(profile=None) -> dict:
+    """
+    Resolve a profile into CP-SAT settings: None -> "default", a name from
+    SOLVER_PROFILES, or a dict of SOLVER_PARAM_KEYS overriding the profile
+    named by its optional "profile" key (e.g. {"profile": "fast", "random_seed": 3}).
+    """
+    if profile is None:
+        profile = "default"
+    if isinstance(profile, str):
+        if profile not in SOLVER_PROFILES:
+            raise ValueError(f"unknown solver profile {profile!r} (choose from {', '.join(SOLVER_PROFILES)})")
+        return dict(SOLVER_PROFILES[profile])
+    if not isinstance(profile, dict):
+        raise ValueError("a solver profile is a profile name or a dict of solver parameters")
+    unknown = set(profile) - set(SOLVER_PARAM_KEYS) - {"profile"}
+    if unknown:
+        raise ValueError(f"unknown solver parameters: {', '.join(sorted(unknown))}")
+    settings = resolve_solver_profile(profile.get("profile"))
+    settings.update({k: v for k, v in profile.items() if k != "profile" and v is not None})
+    if settings.get("search_branching", "AUTOMATIC_SEARCH") not in SEARCH_BRANCHINGS:
+        raise ValueError(f"unknown search_branching {settings['search_branching']!r}")
+    return settings
+
+
+def profile_label(profile) -> str:
+    return profile if isinstance(profile, str) else json.dumps(profile, sort_keys=True)
+
+
+def apply_solver_profile(solver: cp_model.CpSolver, settings: dict):
+    params = solver.parameters
+    params.num_search_workers = int(settings.get("num_workers", 8))
+    if settings.get("relative_gap_limit") is not None:
+        params.relative_gap_limit = float(settings["relative_gap_limit"])
+    if settings.get("search_branching") is not None:
+        params.search_branching = getattr(cp_model, settings["search_branching"])
+    if settings.get("linearization_level") is not None:
+        params.linearization_level = int(settings["linearization_level"])
+    if settings.get("random_seed") is not None:
+        params.random_seed = int(settings["random_seed"])
+
+
+def solve_model(model: cp_model.CpModel, time_limit_s, solver_hook=None, num_workers: int = None,
+                solution_callback=None, profile=None):
+    """Solve under a solver profile (see resolve_solver_profile); num_workers, if given, overrides the profile's."""
     solver = cp_model.CpSolver()
+    apply_solver_profile(solver, resolve_solver_profile(profile))
     solver.parameters.max_time_in_seconds = float(time_limit_s)
-    solver.parameters.num_search_workers = 8
-    status = solver.Solve(model)
+    if num_workers is not None:
+        solver.parameters.num_search_workers = int(num_workers)
+    if solver_hook is not None:
+        solver_hook(solver)
+    status = solver.Solve(model, solution_callback)
+    return solver, status
+
+
+def stop_requested(stop_event) -> bool:
+    """True once stop_event (a threading/multiprocessing Event, or None) is set."""
+    return stop_event is not None and stop_event.is_set()
+
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Passes the per-row starts of every improving CP-SAT solution to on_starts(starts).
+    With gap_limit, stops the search once (objective - lower_bound) /
+    (objective + objective_offset) <= gap_limit; objective_offset is the part of
+    the full objective the model leaves out (presolved or fixed trains).
+    """
 
+    def __init__(self, seg_vars, on_starts=None, fallback=None, lower_bound=None, gap_limit=None,
+                 objective_offset=0.0):
+        super().__init__()
+        self.seg_vars = seg_vars
+        self.on_starts = on_starts
+        self.fallback = fallback
+        self.lower_bound = lower_bound
+        self.gap_limit = gap_limit
+        self.objective_offset = objective_offset
+        self.stopped = False
+
+    def on_solution_callback(self):
+        if self.on_starts is not None:
+            self.on_starts(solution_starts(self, self.seg_vars, fallback=self.fallback))
+        if self.gap_limit is not None and self.lower_bound is not None:
+            objective = self.ObjectiveValue()
+            total = objective + self.objective_offset
+            if total <= 0 or (objective - self.lower_bound) / total <= self.gap_limit:
+                self.stopped = True
+                self.StopSearch()
+
+
+def solution_starts(solver: cp_model.CpSolver, seg_vars, fallback=None) -> np.ndarray:
+    """Per-row start values (from a solver or a solution callback); rows without a variable take fallback[row] (or -1)."""
+    starts = np.full(len(seg_vars), -1, dtype=np.int64) if fallback is None else np.array(fallback, dtype=np.int64)
+    for row, v in enumerate(seg_vars):
+        if v is not None:
+            starts[row] = solver.Value(v[0])
+    return starts
+
+
+def schedule_output(table: SegmentTable, starts, status_name: str, objective, horizon: int) -> dict:
     out = {
-        "status": solver.StatusName(status),
-        "objective": solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+        "status": status_name,
+        "objective": objective,
         "horizon": horizon,
+        "route_completion": {
+            "expanded_hops": table.expanded_hops,
+            "unreachable_hops": table.unreachable_hops,
+            "unknown_stops": table.unknown_stops,
+        },
         "trains": {},
     }
 
-    for _, tr in trains.iterrows():
-        tid = tr["train_id"]
-        segs = tr["segments"] or []
+    durations = table.duration.tolist()
+    track_ids = table.track_id.tolist()
+    start_list = starts.tolist() if starts is not None else None
+    for i, tid in enumerate(table.train_ids):
+        sl = table.train_slice(i)
         sched = []
-        for k, s in enumerate(segs):
-            key = (tid, k)
-            if key in train_intervals and (status in (cp_model.OPTIMAL, cp_model.FEASIBLE)):
-                start = solver.Value(train_intervals[key][0])
-                end = solver.Value(train_intervals[key][1])
+        if start_list is not None:
+            for k, row in enumerate(range(sl.start, sl.stop)):
                 sched.append({
                     "segment_index": k,
-                    "track_id": s["track_id"],
-                    "from": s["from"],
-                    "to": s["to"],
-                    "start_min": int(start),
-                    "end_min": int(end),
-                    "duration_min": int(s["duration"]),
+                    "track_id": track_ids[row],
+                    "from": table.from_station[row],
+                    "to": table.to_station[row],
+                    "start_min": start_list[row],
+                    "end_min": start_list[row] + durations[row],
+                    "duration_min": durations[row],
                 })
         out["trains"][tid] = {
-            "priority": int(tr.get("priority_level", 3)),
-            "release_delay_min": int(tr.get("segments_release", 0) or 0),
+            "priority": int(table.priority[i]),
+            "release_delay_min": int(table.release[i]),
             "schedule": sched,
         }
+    return out
+
+
+# ----------------------------
+# Presolve: conflict-free trains
+# ----------------------------
+def presolve_conflict_free(table: SegmentTable):
+    """
+    Find trains that never contend for a track: every track they use carries no
+    more intervals than its capacity. Such trains run unhindered, so their
+    optimal schedule is analytic (start at release, segments back to back) and
+    they can be left out of the CP-SAT model without changing the optimum.
+    Returns (free train mask, starts with the free trains' rows filled, report).
+    """
+    tracks, track_col = np.unique(table.track_id.astype(str), return_inverse=True)
+    load = np.bincount(track_col, minlength=len(tracks))
+    cap = np.full(len(tracks), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(cap, track_col, table.capacity)
+    redundant_track = load <= np.maximum(cap, 1)
+
+    train_of_row = table.train_of_row()
+    contended_rows = np.bincount(train_of_row, weights=~redundant_track[track_col], minlength=table.n_trains)
+    free = (contended_rows == 0) & (np.diff(table.offsets) > 0)
+
+    # back-to-back from release: start = release + route time before the segment
+    cum_dur = np.concatenate([[0], np.cumsum(table.duration)])
+    analytic = table.release[train_of_row] + cum_dur[:-1] - cum_dur[table.offsets[:-1]][train_of_row]
+    starts = np.where(table.row_mask(free), analytic, -1)
+
+    free_rows = int(table.row_mask(free).sum())
+    report = {
+        "conflict_free_trains": int(free.sum()),
+        "model_trains": int((~free & (np.diff(table.offsets) > 0)).sum()),
+        "removed_variables": 2 * free_rows,
+        "removed_intervals": free_rows,
+        # per segment: duration link + interval + release/precedence; plus one per redundant track
+        "removed_constraints": 3 * free_rows + int(redundant_track.sum()),
+        "redundant_track_constraints": int(redundant_track.sum()),
+    }
+    return free, starts, report
+
+
+# ----------------------------
+# Incremental re-optimization
+# ----------------------------
+# Last solved schedule per (data_root, limit_trains), used as the warm start for
+# incremental runs after delay updates. Keys come from API callers, so only the
+# most recently used _LAST_SOLUTIONS_MAX are kept.
+_LAST_SOLUTIONS: "OrderedDict[tuple, dict]" = OrderedDict()
+_LAST_SOLUTIONS_LOCK = threading.Lock()
+_LAST_SOLUTIONS_MAX = 8
+
+
+def solution_key(data_root: str, limit_trains=None) -> tuple:
+    return (os.path.abspath(str(data_root)), int(limit_trains) if limit_trains else None)
+
+
+def remember_solution(key: tuple, table: SegmentTable, starts: np.ndarray) -> dict:
+    """Store starts as the last solution for key; returns the stored entry (see restore_solution)."""
+    solution = {
+        "train_ids": list(table.train_ids),
+        "offsets": table.offsets.copy(),
+        "track_row": table.track_row.copy(),
+        "duration": table.duration.copy(),
+        "release": table.release.copy(),
+        "starts": starts.copy(),
+    }
+    restore_solution(key, solution)
+    return solution
+
+
+def restore_solution(key: tuple, solution: dict):
+    """Make a solution returned by remember_solution() the last one for key again (e.g. on a result cache hit)."""
+    with _LAST_SOLUTIONS_LOCK:
+        _LAST_SOLUTIONS[key] = copy.deepcopy(solution)
+        _LAST_SOLUTIONS.move_to_end(key)
+        while len(_LAST_SOLUTIONS) > _LAST_SOLUTIONS_MAX:
+            _LAST_SOLUTIONS.popitem(last=False)
+
+
+def last_solution(key: tuple):
+    with _LAST_SOLUTIONS_LOCK:
+        prev = _LAST_SOLUTIONS.get(key)
+        if prev is not None:
+            _LAST_SOLUTIONS.move_to_end(key)
+        return prev
+
+
+def train_track_incidence(table: SegmentTable) -> csr_matrix:
+    """Sparse trains x tracks matrix (1 where the train runs on the track)."""
+    tracks, track_col = np.unique(table.track_id.astype(str), return_inverse=True)
+    data = np.ones(len(table), dtype=np.int8)
+    m = csr_matrix((data, (table.train_of_row(), track_col)), shape=(table.n_trains, len(tracks)))
+    m.data[:] = 1
+    return m
+
+
+def affected_trains(table: SegmentTable, changed: np.ndarray, depth: int = 1) -> np.ndarray:
+    """Mask of trains within `depth` track-sharing hops of the changed trains."""
+    inc = train_track_incidence(table)
+    zone = changed.copy()
+    frontier = changed.copy()
+    for _ in range(max(0, int(depth))):
+        if not frontier.any():
+            break
+        tracks_hit = inc.T @ frontier.astype(np.int8)
+        reach = (inc @ (tracks_hit > 0).astype(np.int8)) > 0
+        frontier = reach & ~zone
+        zone |= reach
+    return zone
+
+
+def plan_incremental(table: SegmentTable, prev: dict, depth: int = 1):
+    """
+    Compare the new segment table with the previous solve.
+    Returns (fixed_starts, hint_starts, active, report) or None when the previous
+    solution does not line up with the current trains/segments.
+    """
+    if prev is None:
+        return None
+    if (prev["train_ids"] != table.train_ids
+            or not np.array_equal(prev["offsets"], table.offsets)
+            or not np.array_equal(prev["track_row"], table.track_row)):
+        return None
+
+    seg_changed = prev["duration"] != table.duration
+    changed = (prev["release"] != table.release) | (np.bincount(
+        table.train_of_row(), weights=seg_changed, minlength=table.n_trains) > 0)
+    active = affected_trains(table, changed, depth)
+
+    active_rows = np.repeat(active, np.diff(table.offsets))
+    fixed_starts = np.where(active_rows, -1, prev["starts"])
+    report = {
+        "changed_trains": [t for t, c in zip(table.train_ids, changed) if c],
+        "affected_trains": int(active.sum()),
+        "fixed_trains": int((~active).sum()),
+        "affected_depth": int(depth),
+    }
+    return fixed_starts, prev["starts"], active, report
+
+
+# ----------------------------
+# Decomposition (conflict components / divisions)
+# ----------------------------
+def conflict_components(table: SegmentTable, train_mask=None) -> np.ndarray:
+    """Connected-component label per train of the track-sharing graph (-1 outside train_mask)."""
+    inc = train_track_incidence(table)
+    if train_mask is not None:
+        inc = inc.multiply(np.asarray(train_mask, dtype=np.int8)[:, None]).tocsr()
+    _, labels = connected_components(inc @ inc.T, directed=False)
+    if train_mask is not None:
+        labels = np.where(train_mask, labels, -1)
+    return labels
+
+
+def track_divisions(track_idx: TrackIndex, stations_df: pd.DataFrame) -> np.ndarray:
+    """Division of each track row, taken from its source station ('unknown' if missing)."""
+    if "division" not in stations_df.columns or "id" not in stations_df.columns:
+        return np.full(len(track_idx), "unknown", dtype=object)
+    div_of = stations_df.set_index(stations_df["id"].astype(str).str.strip())["division"].astype(str)
+    src = pd.Series([track_idx.station_ids[i] for i in track_idx.from_idx], dtype=object)
+    return src.map(div_of).fillna("unknown").to_numpy(dtype=object)
+
+
+def _solve_subproblem(job, solver_hook=None, stop_event=None):
+    """
+    Build and solve one partition, return (status name, starts). The
+    list-schedule plan stands in when the search is skipped (stop_event set or
+    no time left) or ends without a solution, provided it is feasible; only
+    then does it also hint the search and bound the time windows.
+    """
+    table, horizon, fixed_starts, active, deadline, share, profile = job
+    incumbent = list_schedule(table, fixed_starts)
+    if not is_feasible(table, incumbent):
+        incumbent = None
+    time_limit_s = (deadline - time.time()) * share
+    if stop_requested(stop_event) or time_limit_s <= 0:
+        return ("FEASIBLE", incumbent) if incumbent is not None else ("UNKNOWN", None)
+    windows, horizon, _ = model_windows(table, horizon, incumbent)
+    model, seg_vars = build_model(table, horizon, fixed_starts, incumbent, active, windows=windows)
+    solver, status = solve_model(model, time_limit_s, solver_hook, profile=profile)
+    if status == cp_model.UNKNOWN and incumbent is not None:
+        return "FEASIBLE", incumbent
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return solver.StatusName(status), None
+    return solver.StatusName(status), solution_starts(solver, seg_vars, fallback=fixed_starts)
+
+
+def _merge_status(statuses: List[str]) -> str:
+    for bad in ("MODEL_INVALID", "INFEASIBLE", "UNKNOWN"):
+        if bad in statuses:
+            return bad
+    return "OPTIMAL" if all(st == "OPTIMAL" for st in statuses) else "FEASIBLE"
+
+
+# Set in pool workers (see run_solves): one multiprocessing.Event per pool.
+_POOL_STOP = None
+
+
+def _init_pool_worker(stop_event):
+    global _POOL_STOP
+    _POOL_STOP = stop_event
 
+
+def _stop_when_set(solver, stop_event, done, poll_s=0.1):
+    while not done.is_set():
+        if stop_event.wait(poll_s):
+            solver.StopSearch()
+            return
+
+
+def _pool_task(worker, job):
+    """Run worker(job) in a pool process; its solver stops once the pool's stop event is set."""
+    done = threading.Event()
+
+    def solver_hook(solver):
+        threading.Thread(target=_stop_when_set, args=(solver, _POOL_STOP, done), daemon=True).start()
+
+    try:
+        return worker(job, solver_hook, _POOL_STOP)
+    finally:
+        done.set()
+
+
+def run_solves(worker, jobs: list, procs: int, solver_hook=None, stop_event=None) -> list:
+    """
+    [worker(job, solver_hook, stop_event) for job in jobs], in this process when
+    procs == 1, else in a pool of procs processes (worker must be picklable).
+    Pool workers cannot share solver_hook; instead their solves stop, and later
+    jobs see a set stop event, once stop_event is set.
+    """
+    if procs <= 1:
+        return [worker(job, solver_hook, stop_event) for job in jobs]
+    ctx = multiprocessing.get_context()
+    pool_stop = ctx.Event()
+    with ProcessPoolExecutor(max_workers=procs, mp_context=ctx, initializer=_init_pool_worker,
+                             initargs=(pool_stop,)) as pool:
+        futures = [pool.submit(_pool_task, worker, job) for job in jobs]
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=None if stop_event is None else 0.1)
+            if stop_requested(stop_event):
+                pool_stop.set()
+        return [f.result() for f in futures]
+
+
+def with_fixed_neighbors(table: SegmentTable, group: np.ndarray, fixed_mask: np.ndarray,
+                          train_of_row: np.ndarray = None) -> np.ndarray:
+    """group plus the fixed trains sharing a track with it (they join its sub-model as constant intervals)."""
+    train_of_row = table.train_of_row() if train_of_row is None else train_of_row
+    on_group_tracks = np.isin(table.track_id, table.track_id[table.row_mask(group)])
+    near = fixed_mask & (np.bincount(train_of_row, weights=on_group_tracks, minlength=table.n_trains) > 0)
+    return group | near
+
+
+def solve_partitions(table: SegmentTable, horizon: int, groups: List[np.ndarray], deadline: float,
+                     starts: np.ndarray, fixed_mask=None, max_processes=None, profile=None, solver_hook=None,
+                     stop_event=None):
+    """
+    Solve each train group of `table` in its own process and write the results into `starts`.
+    Trains in fixed_mask keep starts[] and join a group's model as fixed intervals
+    wherever they share a track with it. Groups are dealt round-robin to
+    max_processes lanes; a solve gets the time left until deadline (time.time())
+    in proportion to its segments among those still queued in its lane, and
+    the profile's workers are split between the processes. Returns the
+    per-group status names.
+    """
+    if not groups:
+        return []
+    fixed_mask = np.zeros(table.n_trains, dtype=bool) if fixed_mask is None else fixed_mask
+    train_of_row = table.train_of_row()
+    procs = max(1, min(len(groups), max_processes or os.cpu_count() or 1))
+    sizes = np.array([table.row_mask(group).sum() for group in groups], dtype=np.float64) + 1
+    # segments of this group and the ones after it in the same lane
+    lane_left = sizes.copy()
+    for k in range(len(groups) - procs - 1, -1, -1):
+        lane_left[k] += lane_left[k + procs]
+    settings = resolve_solver_profile(profile)
+    settings["num_workers"] = max(1, int(settings.get("num_workers", 8)) // procs)
+    jobs, row_maps = [], []
+    for k, group in enumerate(groups):
+        members = with_fixed_neighbors(table, group, fixed_mask, train_of_row)
+        sub = table.subset(members)
+        sub_active = group[members]
+        sub_rows = table.row_mask(members)
+        sub_fixed = np.where(sub.row_mask(sub_active), -1, starts[sub_rows])
+        jobs.append((sub, horizon, sub_fixed, sub_active, deadline, sizes[k] / lane_left[k], settings))
+        row_maps.append(np.flatnonzero(sub_rows))
+
+    statuses = []
+    results = run_solves(_solve_subproblem, jobs, procs, solver_hook, stop_event)
+    for (status_name, sub_starts), rows in zip(results, row_maps):
+        statuses.append(status_name)
+        if sub_starts is not None:
+            starts[rows] = sub_starts
+    return statuses
+
+
+DECOMPOSE_MODES = ("components", "division")
+
+
+def solve_decomposed(table: SegmentTable, horizon: int, time_limit_s, mode: str = "components",
+                     track_idx: TrackIndex = None, stations_df: pd.DataFrame = None, max_processes=None,
+                     profile=None, solver_hook=None, stop_event=None):
+    """
+    Partitioned solve within time_limit_s overall; returns (status name, starts or None, report).
+    - "components": trains in different connected components of the track-sharing
+      graph never interact, so each component is an exact, independent sub-model.
+    - "division": tracks belong to the division of their source station. Trains
+      that cross divisions are scheduled first (per conflict component), then each
+      division schedules its internal trains around those fixed boundary intervals.
+    Once stop_event is set, partitions not solved yet keep their list-schedule plan.
+    The list-schedule plan of the whole table is returned instead when the
+    stitched plan is missing, infeasible or worse (report["kept_list_schedule"]).
+    """
+    if mode not in DECOMPOSE_MODES:
+        raise ValueError(f"unknown decompose mode {mode!r} (choose from {', '.join(DECOMPOSE_MODES)})")
+    deadline = time.time() + float(time_limit_s)
+    options = {"max_processes": max_processes, "profile": profile, "solver_hook": solver_hook,
+               "stop_event": stop_event}
+    starts = np.full(len(table), -1, dtype=np.int64)
+    has_segs = np.diff(table.offsets) > 0
+    report = {"mode": mode}
+
+    if mode == "division":
+        div_of_row = track_divisions(track_idx, stations_df)[table.track_row]
+        train_of_row = table.train_of_row()
+        first_div = np.full(table.n_trains, None, dtype=object)
+        first_div[train_of_row[::-1]] = div_of_row[::-1]
+        crossing = np.bincount(train_of_row, weights=div_of_row != first_div[train_of_row],
+                               minlength=table.n_trains) > 0
+        boundary = crossing & has_segs
+
+        labels = conflict_components(table, boundary)
+        stage1 = [labels == c for c in np.unique(labels[labels >= 0])]
+        st1 = solve_partitions(table, horizon, stage1, deadline - time_limit_s / 2.0, starts, **options)
+
+        internal = has_segs & ~boundary
+        divisions = sorted(set(first_div[internal].tolist()))
+        stage2 = [internal & (first_div == d) for d in divisions]
+        st2 = solve_partitions(table, horizon, stage2, deadline, starts, fixed_mask=boundary, **options)
+        statuses = st1 + st2
+        report.update({
+            "boundary_trains": int(boundary.sum()),
+            "boundary_partitions": len(stage1),
+            "divisions": divisions,
+        })
+    else:
+        labels = conflict_components(table, has_segs)
+        groups = [labels == c for c in np.unique(labels[labels >= 0])]
+        statuses = solve_partitions(table, horizon, groups, deadline, starts, **options)
+        report["components"] = len(groups)
+
+    report["partitions"] = len(statuses)
+    report["partition_status"] = statuses
+    report["stopped"] = stop_requested(stop_event)
+    status_name = _merge_status(statuses) if statuses else "OPTIMAL"
+    # boundary trains fixed first (or a partition that ran out of time) can leave
+    # the stitched plan behind a single list schedule of everything
+    plan = list_schedule(table)
+    stitched_ok = status_name in ("OPTIMAL", "FEASIBLE") and is_feasible(table, starts)
+    plan_objective = weighted_objective(table, plan)
+    report["kept_list_schedule"] = not stitched_ok or weighted_objective(table, starts) > plan_objective
+    if report["kept_list_schedule"]:
+        report["stitched_status"] = status_name
+        return "FEASIBLE", plan, report
+    return status_name, starts, report
+
+
+# ----------------------------
+# Solver portfolio
+# ----------------------------
+def _solve_portfolio_member(job, solver_hook=None, stop_event=None):
+    """run_solves() worker: build the model and solve it under one profile."""
+    table, horizon, fixed_starts, hint_starts, active, windows, time_limit_s, profile, symmetry_breaking = job
+    if stop_requested(stop_event):
+        return "UNKNOWN", None, None, 0.0
+    model, seg_vars = build_model(table, horizon, fixed_starts, hint_starts, active, windows=windows,
+                                  symmetry_breaking=symmetry_breaking)
+    solver, status = solve_model(model, time_limit_s, solver_hook, profile=profile)
+    starts = objective = None
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        starts = solution_starts(solver, seg_vars, fallback=fixed_starts)
+        objective = solver.ObjectiveValue()
+    return solver.StatusName(status), objective, starts, solver.WallTime()
+
+
+def solve_portfolio(table: SegmentTable, horizon: int, time_limit_s, profiles: list, fixed_starts=None,
+                    hint_starts=None, active=None, windows=None, max_processes=None, symmetry_breaking=True,
+                    solver_hook=None, stop_event=None):
+    """
+    Solve the same model once per solver profile, in parallel processes, and
+    keep the best result (a proven optimum, else the lowest objective).
+    Setting stop_event stops every member's search (solver_hook only reaches
+    members solved in this process, i.e. with max_processes=1).
+    Returns (status name, starts or None, report).
+    """
+    procs = max(1, min(len(profiles), max_processes or len(profiles)))
+    jobs = [(table, horizon, fixed_starts, hint_starts, active, windows, time_limit_s, profile, symmetry_breaking)
+            for profile in profiles]
+    results = run_solves(_solve_portfolio_member, jobs, procs, solver_hook, stop_event)
+
+    best = None
+    for k, (status_name, objective, starts, _) in enumerate(results):
+        if starts is None:
+            continue
+        key = (status_name != "OPTIMAL", objective)
+        if best is None or key < best[0]:
+            best = (key, k)
+    report = {
+        "members": [
+            {"profile": profile_label(profile), "status": status_name, "objective": objective,
+             "wall_time_s": round(wall, 3)}
+            for profile, (status_name, objective, _, wall) in zip(profiles, results)
+        ],
+        "best": None if best is None else profile_label(profiles[best[1]]),
+    }
+    if best is None:
+        return _merge_status([r[0] for r in results]), None, report
+    status_name, _, starts, _ = results[best[1]]
+    return status_name, starts, report
+
+
+# ----------------------------
+# Rolling-horizon scheduling
+# ----------------------------
+def _window_table(table: SegmentTable, window_rows: np.ndarray, carry_rows: np.ndarray, starts: np.ndarray,
+                  train_ready: np.ndarray):
+    """
+    Table of one rolling window for build_model(): every train with free rows
+    in the window keeps just those rows and is released at train_ready, and each
+    committed row still running after t0 becomes a fixed one-row train.
+    Returns (table, fixed_starts, active, source row of each window-table row).
+    """
+    train_of_row = table.train_of_row()
+    window_trains, counts = np.unique(train_of_row[window_rows], return_counts=True)
+    carry_trains = train_of_row[carry_rows]
+    trains = np.concatenate([window_trains, carry_trains])
+    rows = np.concatenate([window_rows, carry_rows])
+    offsets = np.zeros(len(trains) + 1, dtype=np.int64)
+    np.cumsum(np.concatenate([counts, np.ones(len(carry_rows), dtype=np.int64)]), out=offsets[1:])
+    sub = SegmentTable(
+        train_ids=[table.train_ids[i] for i in trains.tolist()],
+        priority=table.priority[trains],
+        release=np.concatenate([train_ready[window_trains], starts[carry_rows]]),
+        offsets=offsets,
+        track_row=table.track_row[rows],
+        track_id=table.track_id[rows],
+        from_station=table.from_station[rows],
+        to_station=table.to_station[rows],
+        duration=table.duration[rows],
+        capacity=table.capacity[rows],
+    )
+    fixed_starts = np.concatenate([np.full(len(window_rows), -1, dtype=np.int64), starts[carry_rows]])
+    active = np.arange(len(trains)) < len(window_trains)
+    return sub, fixed_starts, active, rows
+
+
+def solve_rolling_horizon(table: SegmentTable, horizon: int, time_limit_s, window_min: int = 120,
+                          commit_min: int = 60, window_time_s=None, solver_hook=None, profile=None,
+                          symmetry_breaking: bool = True, stop_event=None):
+    """
+    Schedule in fixed-length windows: solve the segments that can start inside
+    [t0, t0 + window_min), commit those starting before t0 + commit_min, then
+    slide t0 forward by commit_min. Committed segments that are still running
+    carry over into the next window as fixed intervals.
+    A full plan consistent with the committed segments is kept throughout,
+    starting from list_schedule(). Each window is a build_model() model hinted
+    and bounded by that plan; its commits are kept only if list-scheduling the
+    rest around them gives a feasible plan (schedule_violations()) that is not
+    worse, else the plan's own segments are committed. Once time_limit_s is used up or stop_event is set,
+    the plan is returned as is, so the result is never worse than list_schedule().
+    Returns (status name, starts, report).
+    """
+    deadline = time.monotonic() + float(time_limit_s)
+    window_min = max(1, int(window_min))
+    commit_min = max(1, min(int(commit_min), window_min))
+    n_rows = len(table)
+    plan = list_schedule(table)
+    plan_objective = weighted_objective(table, plan)
+    starts = np.full(n_rows, -1, dtype=np.int64)
+    committed = np.zeros(n_rows, dtype=bool)
+    train_of_row = table.train_of_row()
+    seg_counts = np.diff(table.offsets)
+    # exclusive prefix sums of durations -> cumulative route time inside a train
+    cum_dur = np.concatenate([[0], np.cumsum(table.duration)])
+
+    if window_time_s is None:
+        # spread the overall budget over the windows a serial-free plan would need
+        est_makespan = int((table.release + np.add.reduceat(table.duration, table.offsets[:-1])
+                            * (seg_counts > 0)).max(initial=0)) if n_rows else 0
+        window_time_s = max(0.5, float(time_limit_s) / max(1, math.ceil(est_makespan / commit_min)))
+
+    t0 = 0
+    windows, statuses, max_rows, kept, infeasible = 0, [], 0, 0, 0
+    while not committed.all():
+        if stop_requested(stop_event) or deadline - time.monotonic() <= 0:
+            break
+        done = np.bincount(train_of_row, weights=committed, minlength=table.n_trains).astype(np.int64)
+        last_end = np.full(table.n_trains, 0, dtype=np.int64)
+        has_done = done > 0
+        last_rows = table.offsets[:-1][has_done] + done[has_done] - 1
+        last_end[has_done] = starts[last_rows] + table.duration[last_rows]
+        train_ready = np.maximum(np.maximum(table.release, last_end), t0)
+
+        # earliest start of every uncommitted row assuming no conflicts
+        first_open = table.offsets[:-1] + done
+        est = train_ready[train_of_row] + cum_dur[:-1] - cum_dur[np.minimum(first_open, n_rows)[train_of_row]]
+        open_rows = ~committed
+        window_end = t0 + window_min
+        in_window = open_rows & (est < window_end)
+        if not in_window.any():
+            # idle gap: jump to the next moment a segment can start
+            t0 = int(est[open_rows].min())
+            continue
+
+        window_rows = np.flatnonzero(in_window)
+        carry_rows = np.flatnonzero(committed & (starts + table.duration > t0))
+        sub, sub_fixed, sub_active, _ = _window_table(table, window_rows, carry_rows, starts, train_ready)
+        incumbent = np.concatenate([plan[window_rows], sub_fixed[len(window_rows):]])
+        bounds, sub_horizon, _ = model_windows(sub, horizon, incumbent)
+        model, seg_vars = build_model(sub, sub_horizon, sub_fixed, incumbent, sub_active, windows=bounds,
+                                      symmetry_breaking=symmetry_breaking)
+        budget = min(float(window_time_s), deadline - time.monotonic())
+        solver, status = solve_model(model, budget, solver_hook, profile=profile)
+        statuses.append(solver.StatusName(status))
+        windows += 1
+        max_rows = max(max_rows, len(window_rows))
+        win_starts = incumbent
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            win_starts = solution_starts(solver, seg_vars, fallback=sub_fixed)
+        win_starts = win_starts[:len(window_rows)]
+
+        last_window = not (open_rows & ~in_window).any()
+        commit = np.ones(len(window_rows), dtype=bool) if last_window else win_starts < t0 + commit_min
+        candidate = np.where(committed, starts, -1)
+        candidate[window_rows[commit]] = win_starts[commit]
+        candidate = list_schedule(table, candidate)
+        candidate_objective = weighted_objective(table, candidate)
+        feasible = is_feasible(table, candidate)
+        if feasible and candidate_objective <= plan_objective:
+            plan, plan_objective = candidate, candidate_objective
+            kept += 1
+        else:
+            # the window's plan breaks a constraint or costs more later on: commit the current plan's segments instead
+            infeasible += not feasible
+            plan_rows = plan[window_rows]
+            commit = np.ones(len(window_rows), dtype=bool) if last_window else plan_rows < t0 + commit_min
+        starts[window_rows[commit]] = plan[window_rows[commit]]
+        committed[window_rows[commit]] = True
+        t0 += commit_min
+
+    report = {
+        "window_min": window_min,
+        "commit_min": commit_min,
+        "window_time_s": round(float(window_time_s), 3),
+        "windows": windows,
+        "max_window_segments": max_rows,
+        "window_status": {st: statuses.count(st) for st in sorted(set(statuses))},
+        "windows_kept": kept,
+        "windows_infeasible": infeasible,
+        "uncommitted_segments": int((~committed).sum()),
+    }
+    # windows are solved greedily in time order, so the stitched plan is feasible but not proven optimal
+    return "FEASIBLE", plan, report
+
+
+# ----------------------------
+# Large-neighborhood search
+# ----------------------------
+LNS_NEIGHBORHOODS = ("corridor", "time_window", "delay")
+
+
+def _grow_neighborhood(inc: csr_matrix, seed: np.ndarray, size: int, rng) -> np.ndarray:
+    """Extend a train mask by track-sharing neighbors (random picks at the last ring) up to `size`."""
+    zone = seed.copy()
+    if zone.sum() > size:
+        zone[:] = False
+        zone[rng.choice(np.flatnonzero(seed), size, replace=False)] = True
+    while zone.sum() < size:
+        tracks_hit = inc.T @ zone.astype(np.int8)
+        ring = np.flatnonzero(((inc @ (tracks_hit > 0).astype(np.int8)) > 0) & ~zone)
+        if not len(ring):
+            break
+        need = size - int(zone.sum())
+        zone[ring if len(ring) <= need else rng.choice(ring, need, replace=False)] = True
+    return zone
+
+
+def lns_neighborhood(kind: str, table: SegmentTable, starts: np.ndarray, delay: np.ndarray, size: int,
+                      inc: csr_matrix, rng) -> np.ndarray:
+    """
+    Mask of trains to relax:
+    - corridor: trains on a random track, then their track-sharing neighbors;
+    - time_window: the trains running closest in time to a random segment start;
+    - delay: one of the most-delayed trains and its track-sharing neighbors.
+    """
+    has_segs = np.diff(table.offsets) > 0
+    if kind == "corridor":
+        col = inc.indices[rng.integers(len(inc.indices))]
+        seed = (inc[:, col].toarray().ravel() > 0)
+        return _grow_neighborhood(inc, seed, size, rng)
+    if kind == "time_window":
+        t = int(starts[rng.integers(len(table))])
+        ends = starts + table.duration
+        row_dist = np.maximum(0, np.maximum(starts - t, t - ends))
+        dist = np.full(table.n_trains, np.iinfo(np.int64).max, dtype=np.int64)
+        dist[has_segs] = np.minimum.reduceat(row_dist, table.offsets[:-1][has_segs])
+        zone = np.zeros(table.n_trains, dtype=bool)
+        zone[np.lexsort((rng.random(table.n_trains), dist))[:size]] = True
+        return zone & has_segs
+    # delay: pick among the five most-delayed trains so repeated calls vary
+    top = np.argsort(-delay, kind="stable")[:5]
+    top = top[delay[top] > 0]
+    seed = np.zeros(table.n_trains, dtype=bool)
+    seed[rng.choice(top) if len(top) else rng.integers(table.n_trains)] = True
+    return _grow_neighborhood(inc, seed, size, rng)
+
+
+def solve_lns(table: SegmentTable, horizon: int, time_limit_s, starts=None, sub_time_s: float = 1.0,
+              neighborhood_size: int = 30, seed: int = 0, solver_hook=None, on_improve=None, profile=None,
+              stop_event=None):
+    """
+    Large-neighborhood search: start from a feasible plan (list_schedule() by
+    default), then repeatedly relax a neighborhood of trains (cycling through
+    LNS_NEIGHBORHOODS), fix everyone else, and re-solve the small sub-model
+    for sub_time_s from the current plan as hint. Improvements are kept.
+    The neighborhood grows after sub-models solved to optimality and shrinks
+    after ones that ran out of time. on_improve(starts) is called with every
+    improved plan. Setting stop_event ends the search before the next
+    neighborhood (solver_hook stops the sub-solve in progress).
+    Returns (status name, starts, report).
+    """
+    deadline = time.monotonic() + float(time_limit_s)
+    rng = np.random.default_rng(seed)
+    starts = list_schedule(table) if starts is None else np.array(starts, dtype=np.int64)
+    best = initial = weighted_objective(table, starts)
+    train_of_row = table.train_of_row()
+    inc = train_track_incidence(table)
+    w = priority_weights(table.priority)
+    has_segs = np.diff(table.offsets) > 0
+    last_rows = table.offsets[1:][has_segs] - 1
+    cum_dur = np.concatenate([[0], np.cumsum(table.duration)])
+    lb_end = table.release + np.diff(cum_dur[table.offsets])
+
+    size = max(1, min(int(neighborhood_size), table.n_trains))
+    tried = {kind: 0 for kind in LNS_NEIGHBORHOODS}
+    improved = {kind: 0 for kind in LNS_NEIGHBORHOODS}
+    status_name, iterations = "FEASIBLE", 0
+    while table.n_trains and deadline - time.monotonic() > 0.05:
+        if stop_requested(stop_event):
+            break
+        ends = np.zeros(table.n_trains, dtype=np.int64)
+        ends[has_segs] = starts[last_rows] + table.duration[last_rows]
+        delay = np.where(has_segs, w * (ends - lb_end), 0)
+        if not delay.any():
+            # every train finishes at its conflict-free lower bound
+            status_name = "OPTIMAL"
+            break
+
+        kind = LNS_NEIGHBORHOODS[iterations % len(LNS_NEIGHBORHOODS)]
+        iterations += 1
+        active = lns_neighborhood(kind, table, starts, delay, size, inc, rng)
+        members = with_fixed_neighbors(table, active, ~active, train_of_row)
+        sub = table.subset(members)
+        sub_rows = table.row_mask(members)
+        sub_active = active[members]
+        sub_starts = starts[sub_rows]
+        sub_fixed = np.where(sub.row_mask(sub_active), -1, sub_starts)
+        windows, sub_horizon, _ = model_windows(sub, horizon, sub_starts)
+        model, seg_vars = build_model(sub, sub_horizon, sub_fixed, sub_starts, sub_active, windows=windows)
+        budget = min(float(sub_time_s), deadline - time.monotonic())
+        solver, status = solve_model(model, budget, solver_hook, profile=profile)
+        tried[kind] += 1
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            candidate = starts.copy()
+            candidate[sub_rows] = solution_starts(solver, seg_vars, fallback=sub_fixed)
+            objective = weighted_objective(table, candidate)
+            if objective < best:
+                starts, best = candidate, objective
+                improved[kind] += 1
+                if on_improve is not None:
+                    on_improve(starts)
+            if status == cp_model.OPTIMAL and active.all():
+                status_name = "OPTIMAL"
+                break
+        if status == cp_model.OPTIMAL:
+            size = min(table.n_trains, int(size * 1.25) + 1)
+        else:
+            size = max(2, int(size * 0.8))
+
+    report = {
+        "initial_objective": initial,
+        "iterations": iterations,
+        "final_neighborhood_size": size,
+        "sub_time_s": float(sub_time_s),
+        "neighborhoods": {kind: {"tried": tried[kind], "improved": improved[kind]} for kind in LNS_NEIGHBORHOODS},
+        "stopped": stop_requested(stop_event),
+    }
+    return status_name, starts, report
+
+
+# ----------------------------
+# Result cache
+# ----------------------------
+# Solved outputs (before names/timestamps are added) keyed by a hash of the
+# normalized inputs and the solver settings; LRU with an entry and byte cap.
+# Each entry keeps the remember_solution() entry of its solve, so a hit still
+# warm-starts the next incremental run.
+_DATASET_FINGERPRINTS: Dict[tuple, str] = {}
+_RESULT_CACHE: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (data_root, fingerprint, out, size, solution)
+_RESULT_CACHE_LOCK = threading.Lock()
+_RESULT_CACHE_MAX_ENTRIES = 32
+_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def dataset_fingerprint(data_root: str) -> str:
+    """Content hash of the normalized trains/stations/tracks/updates (computed once per file signature)."""
+    sig = dataset_signature(data_root)
+    with _DATASET_CACHE_LOCK:
+        fp = _DATASET_FINGERPRINTS.get(sig)
+    if fp is None:
+        fp = frames_fingerprint(*load_data(data_root))
+        with _DATASET_CACHE_LOCK:
+            if len(_DATASET_FINGERPRINTS) >= _DATASET_CACHE_MAX:
+                _DATASET_FINGERPRINTS.pop(next(iter(_DATASET_FINGERPRINTS)))
+            _DATASET_FINGERPRINTS[sig] = fp
+    return fp
+
+
+def frames_fingerprint(trains: pd.DataFrame, stations: pd.DataFrame, tracks: pd.DataFrame, updates: Dict) -> str:
+    """dataset_fingerprint() of frames already returned by load_data()."""
+    h = hashlib.sha256()
+    for df in (trains, stations, tracks):
+        h.update(",".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    h.update(json.dumps(updates, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def result_cache_key(data_root: str, limit_trains, settings: dict) -> str:
+    blob = json.dumps([dataset_fingerprint(data_root), limit_trains, settings], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def cached_result(key: str):
+    """(copy of the stored output, its solution) for key (marked most recently used), or (None, None)."""
+    with _RESULT_CACHE_LOCK:
+        entry = _RESULT_CACHE.get(key)
+        if entry is None:
+            return None, None
+        _RESULT_CACHE.move_to_end(key)
+        return copy.deepcopy(entry[2]), entry[4]
+
+
+def store_result(key: str, data_root: str, out: dict, solution: dict = None):
+    """Cache a solved output; drops results of older versions of the same dataset and evicts LRU entries."""
+    if out.get("status") not in ("OPTIMAL", "FEASIBLE"):
+        return
+    root = os.path.abspath(data_root)
+    fp = dataset_fingerprint(data_root)
+    size = len(json.dumps(out, default=str))
+    if size > _RESULT_CACHE_MAX_BYTES:
+        return
+    with _RESULT_CACHE_LOCK:
+        for k in [k for k, e in _RESULT_CACHE.items() if e[0] == root and e[1] != fp]:
+            del _RESULT_CACHE[k]
+        _RESULT_CACHE[key] = (root, fp, copy.deepcopy(out), size, copy.deepcopy(solution))
+        _RESULT_CACHE.move_to_end(key)
+        total = sum(e[3] for e in _RESULT_CACHE.values())
+        while len(_RESULT_CACHE) > _RESULT_CACHE_MAX_ENTRIES or total > _RESULT_CACHE_MAX_BYTES:
+            _, evicted = _RESULT_CACHE.popitem(last=False)
+            total -= evicted[3]
+
+
+def discard_result(key: str):
+    with _RESULT_CACHE_LOCK:
+        _RESULT_CACHE.pop(key, None)
+
+
+def clear_result_cache():
+    with _RESULT_CACHE_LOCK:
+        _RESULT_CACHE.clear()
+
+
+# ----------------------------
+# Instance capture / replay
+# ----------------------------
+INSTANCE_FORMAT = 1
+INSTANCE_SUFFIX = ".cpsat.json.gz"
+
+
+def read_instance_inputs(data_root: str) -> dict:
+    """The four input CSVs as text, by file name; read alongside load_data() so a capture holds what was solved."""
+    inputs = {}
+    for p in dataset_paths(data_root):
+        with open(p, encoding="utf-8") as f:
+            inputs[os.path.basename(p)] = f.read()
+    return inputs
+
+
+def capture_instance(path: str, model: cp_model.CpModel, data_root: str, inputs: dict, fingerprint: str,
+                     settings: dict, result: dict = None):
+    """
+    Write a CP-SAT instance file: gzip'd JSON with the model in protobuf text
+    format (hint included), the input CSVs read at load time (see
+    read_instance_inputs) with the frames_fingerprint() of the frames the model
+    was built from, the optimize() settings and the captured solve's metrics.
+    load_instance() reads it back for offline replays.
+    """
+    instance = {
+        "format": INSTANCE_FORMAT,
+        "captured_at": pd.Timestamp.now().isoformat(),
+        "data_root": os.path.abspath(data_root),
+        "fingerprint": fingerprint,
+        "settings": settings,
+        "inputs": inputs,
+        "model": str(model.Proto()),
+        "result": result or {},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # write then rename so a half-written file never looks like an instance
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(instance, f, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_instance(path: str) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        instance = json.load(f)
+    if instance.get("format") != INSTANCE_FORMAT:
+        raise ValueError(f"{path}: unsupported instance format {instance.get('format')!r}")
+    if not instance.get("fingerprint"):
+        raise ValueError(f"{path}: no input fingerprint, re-capture the instance")
+    return instance
+
+
+def instance_model(instance: dict) -> cp_model.CpModel:
+    """A fresh CpModel from a loaded instance (one per solve: solving does not consume it, but hints may be edited)."""
+    model = cp_model.CpModel()
+    if not model.Proto().parse_text_format(instance["model"]):
+        raise ValueError("instance model is not a valid CpModelProto")
+    return model
+
+
+def write_instance_inputs(instance: dict, directory: str) -> str:
+    """
+    Write the captured CSVs under directory so optimize() can re-run the whole
+    pipeline on them. Raises ValueError when they do not load into the frames
+    the captured model was built from (the files changed while it was loading).
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, text in instance["inputs"].items():
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(text)
+    if dataset_fingerprint(directory) != instance["fingerprint"]:
+        raise ValueError("captured inputs do not match the dataset the instance model was built from")
+    return directory
+
+
+# ----------------------------
+# Run metrics
+# ----------------------------
+class PhaseTimer:
+    """Wall time per named phase of one run; a phase entered twice adds up."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def report(self) -> dict:
+        return {name: round(seconds, 4) for name, seconds in self.phases.items()}
+
+
+def solver_metrics(solver: cp_model.CpSolver, status) -> dict:
+    """Status and search counters of a CP-SAT solve; objective/bound are the model's own."""
+    metrics = {
+        "status": solver.StatusName(status),
+        "wall_time_s": round(solver.WallTime(), 3),
+        "branches": int(solver.NumBranches()),
+        "conflicts": int(solver.NumConflicts()),
+    }
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        metrics["model_objective"] = solver.ObjectiveValue()
+        metrics["model_bound"] = solver.BestObjectiveBound()
+    return metrics
+
+
+def model_metrics(model: cp_model.CpModel, table: SegmentTable, stats: dict = None) -> dict:
+    proto = model.Proto()
+    metrics = {
+        "trains": int(table.n_trains),
+        "segments": len(table),
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+    }
+    metrics.update(stats or {})
+    return metrics
+
+
+# ----------------------------
+# Optimizer entry point
+# ----------------------------
+SOLVE_MODES = ("cpsat", "heuristic", "lns")
+
+
+def optimize(data_root: str, now_ts=None, limit_trains=None, time_limit_s: int = 20, solver_hook=None,
+             incremental: bool = False, affected_depth: int = 1, decompose: str = None,
+             rolling_window_min: int = None, rolling_commit_min: int = None, presolve: bool = True,
+             time_windows: bool = True, mode: str = "cpsat", on_incumbent=None, solver_profile=None,
+             portfolio=None, use_cache: bool = True, quiet: bool = False, capture_path: str = None,
+             capture_min_solve_s: float = 0.0, symmetry_breaking: bool = True, gap_limit: float = None,
+             stop_event=None):
+    """
+    Build and solve the CP-SAT schedule for the dataset under data_root.
+    solver_hook, if given, is called with the CpSolver right before Solve() so
+    callers (e.g. the job queue) can keep a handle to stop the search early.
+    stop_event (a threading.Event), once set, also ends runs made of several
+    solves (decomposed partitions, rolling windows, LNS, portfolio members) with
+    the best plan so far.
+    incremental=True reuses the last solution for the same data_root/limit_trains:
+    trains outside the track-sharing zone of changed trains keep their start
+    times, and the affected ones are re-solved from the previous plan as a hint.
+    decompose="components" | "division" solves independent partitions in a
+    process pool and stitches them (see solve_decomposed); it takes precedence
+    over incremental.
+    rolling_window_min schedules in sliding windows of that many minutes,
+    committing rolling_commit_min (default half the window) per step, so each
+    model stays small regardless of how many trains run in the day (see
+    solve_rolling_horizon; presolved trains stay out of the windows).
+    presolve=True schedules trains that never contend for a track at their
+    release time and leaves them out of the model (see presolve_conflict_free).
+    time_windows=True bounds every interval by its earliest start / latest end
+    and splits track constraints into overlapping clusters (see interval_windows).
+    mode="heuristic" returns the list_schedule() plan without running CP-SAT;
+    in the default mode="cpsat" that plan is the solver's starting hint.
+    mode="lns" improves that plan by large-neighborhood search within
+    time_limit_s (see solve_lns), for instances too big for one CP-SAT solve.
+    on_incumbent, if given, is called with every improving plan found along the
+    way (list schedule, CP-SAT solutions, LNS improvements) as a dict with
+    source, objective, elapsed_s and trains (schedule_output() format).
+    solver_profile selects the CP-SAT settings of the main and LNS solves (a
+    SOLVER_PROFILES name or a dict, see resolve_solver_profile()). portfolio, a list of
+    profiles, instead runs one solve per profile in parallel processes and keeps
+    the best (CP-SAT mode only; incumbents are then not streamed).
+    use_cache=True returns a stored result when the same inputs were solved with
+    the same settings before (see result_cache_key); incremental runs depend on
+    the previous solve and are never cached.
+    quiet=True skips the explanations and the JSON dump to stdout (callers that
+    only use the returned dict, e.g. the API).
+    out["metrics"] reports the wall time of each phase (load_data, track_index,
+    segment_build, presolve, heuristic, lower_bound, model_build, solve, enrich; heuristic is the
+    list schedule that seeds the CP-SAT and LNS searches) and, for CP-SAT solves,
+    the model size and solver status, objective, bound and gap.
+    capture_path, if given, receives the CP-SAT model plus inputs as an instance
+    file (see capture_instance) when a single-model solve takes at least
+    capture_min_solve_s; out["capture"] then names the file.
+    symmetry_breaking=True orders interchangeable trains (same release,
+    priority, tracks and durations) in the CP-SAT model (see interchangeable_trains).
+    out["lower_bound"] reports objective_lower_bound() and the gap to it (CP-SAT
+    and heuristic modes). gap_limit (e.g. 0.01) ends a CP-SAT solve as soon as a
+    solution is within that relative gap of the bound, or skips the solve when
+    the list-schedule plan already is.
+    """
+    t_start = time.monotonic()
+    timer = PhaseTimer()
+    # validate the solver settings before any work is done
+    resolve_solver_profile(solver_profile)
+    for profile in portfolio or ():
+        resolve_solver_profile(profile)
+    if mode not in SOLVE_MODES:
+        raise ValueError(f"unknown mode {mode!r} (choose from {', '.join(SOLVE_MODES)})")
+    if decompose and decompose not in DECOMPOSE_MODES:
+        raise ValueError(f"unknown decompose mode {decompose!r} (choose from {', '.join(DECOMPOSE_MODES)})")
+    with timer.phase("load_data"):
+        inputs = fingerprint = None
+        if capture_path:
+            inputs = read_instance_inputs(data_root)
+        trains, stations, tracks, updates = load_data(data_root)
+        if capture_path:
+            fingerprint = frames_fingerprint(trains, stations, tracks, updates)
+    if limit_trains:
+        trains = trains.head(int(limit_trains)).copy()
+
+    settings = {
+        "time_limit_s": time_limit_s, "decompose": decompose, "rolling_window_min": rolling_window_min,
+        "rolling_commit_min": rolling_commit_min, "presolve": presolve, "time_windows": time_windows,
+        "mode": mode, "solver_profile": solver_profile, "portfolio": portfolio,
+        "symmetry_breaking": symmetry_breaking, "gap_limit": gap_limit,
+    }
+    cache_key = None
+    if use_cache and not incremental:
+        cache_key = result_cache_key(data_root, limit_trains, settings)
+        out, solution = cached_result(cache_key)
+        if out is not None:
+            if solution is not None:
+                restore_solution(solution_key(data_root, limit_trains), solution)
+            if on_incumbent is not None:
+                on_incumbent({"source": "cache", "objective": out["objective"],
+                              "elapsed_s": round(time.monotonic() - t_start, 3), "trains": out["trains"]})
+            out["cache"] = {"hit": True, "key": cache_key}
+            return _finish_output(out, trains, stations, tracks, updates, quiet, timer)
+
+    captured, solutions = [], []
+
+    def capture(model, metrics):
+        if capture_path and metrics["solver"].get("wall_time_s", 0.0) >= capture_min_solve_s:
+            captured.append(capture_instance(capture_path, model, data_root, inputs, fingerprint,
+                                             dict(settings, limit_trains=limit_trains), metrics))
+
+    out = _solve_schedule(
+        trains, stations, tracks, updates, data_root, limit_trains, t_start, time_limit_s=time_limit_s,
+        solver_hook=solver_hook, incremental=incremental, affected_depth=affected_depth, decompose=decompose,
+        rolling_window_min=rolling_window_min, rolling_commit_min=rolling_commit_min, presolve=presolve,
+        time_windows=time_windows, mode=mode, on_incumbent=on_incumbent, solver_profile=solver_profile,
+        portfolio=portfolio, timer=timer, on_model=capture if capture_path else None,
+        symmetry_breaking=symmetry_breaking, gap_limit=gap_limit, stop_event=stop_event,
+        on_solution=solutions.append)
+    if cache_key is not None:
+        out["cache"] = {"hit": False, "key": cache_key}
+        store_result(cache_key, data_root, out, solutions[-1] if solutions else None)
+    if captured:
+        out["capture"] = {"path": captured[-1]}
+    return _finish_output(out, trains, stations, tracks, updates, quiet, timer)
+
+
+def _solve_schedule(trains, stations, tracks, updates, data_root, limit_trains, t_start, time_limit_s,
+                    solver_hook, incremental, affected_depth, decompose, rolling_window_min, rolling_commit_min,
+                    presolve, time_windows, mode, on_incumbent, solver_profile, portfolio, timer=None,
+                    on_model=None, symmetry_breaking=True, gap_limit=None, stop_event=None, on_solution=None):
+    """
+    optimize() without the result cache: returns the raw output (minutes, no names/timestamps).
+    on_model, if given, is called with (model, metrics) after each single CP-SAT solve.
+    on_solution, if given, receives the remember_solution() entry of the final plan.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase("track_index"):
+        track_idx = build_track_index(tracks)
+    with timer.phase("segment_build"):
+        table = build_segment_table(trains.reset_index(drop=True), track_idx, updates)
+    horizon = compute_horizon(table)
+
+    published = []   # best objective handed to on_incumbent so far
+
+    def publish(starts, source):
+        if on_incumbent is None:
+            return
+        objective = weighted_objective(table, starts)
+        if published and objective >= published[-1]:
+            return
+        published.append(objective)
+        on_incumbent({
+            "source": source,
+            "objective": objective,
+            "elapsed_s": round(time.monotonic() - t_start, 3),
+            "trains": schedule_output(table, starts, "FEASIBLE", None, horizon)["trains"],
+        })
+
+    def publish_model_starts(source):
+        # model rows -> full-table starts (presolved trains keep their analytic plan)
+        def on_starts(model_starts):
+            starts = base_starts.copy()
+            starts[kept_rows] = model_starts
+            publish(starts, source)
+        return on_starts
+
+    run_key = solution_key(data_root, limit_trains)
+
+    def remember(starts):
+        solution = remember_solution(run_key, table, starts)
+        if on_solution is not None:
+            on_solution(solution)
+
+    if mode == "heuristic":
+        with timer.phase("solve"):
+            starts = list_schedule(table)
+        publish(starts, "list_schedule")
+        horizon = max(horizon, int((starts + table.duration).max(initial=0)))
+        remember(starts)
+        objective = weighted_objective(table, starts)
+        out = schedule_output(table, starts, "FEASIBLE", objective, horizon)
+        out["mode"] = "heuristic"
+        with timer.phase("lower_bound"):
+            out["lower_bound"] = lower_bound_report(objective_lower_bound(table), objective)
+        return out
+
+    # conflict-free trains are scheduled analytically and kept out of the model
+    kept = np.ones(table.n_trains, dtype=bool)
+    base_starts = np.full(len(table), -1, dtype=np.int64)
+    presolve_report = None
+    if presolve:
+        with timer.phase("presolve"):
+            free, base_starts, presolve_report = presolve_conflict_free(table)
+        kept = ~free
+    kept_rows = table.row_mask(kept)
+    model_table = table if kept.all() else table.subset(kept)
+
+    if rolling_window_min:
+        commit = rolling_commit_min or max(1, int(rolling_window_min) // 2)
+        with timer.phase("solve"):
+            status_name, sub_starts, roll_report = solve_rolling_horizon(
+                model_table, horizon, time_limit_s, window_min=rolling_window_min, commit_min=commit,
+                solver_hook=solver_hook, profile=solver_profile, symmetry_breaking=symmetry_breaking,
+                stop_event=stop_event)
+        starts = base_starts.copy()
+        starts[kept_rows] = sub_starts
+        horizon = max(horizon, int((starts + table.duration).max(initial=0)))
+        remember(starts)
+        out = schedule_output(table, starts, status_name, weighted_objective(table, starts), horizon)
+        out["rolling_horizon"] = roll_report
+        if presolve_report is not None:
+            out["presolve"] = presolve_report
+        return out
+
+    if mode == "lns":
+        with timer.phase("heuristic"):
+            initial = list_schedule(model_table)
+        publish_model_starts("list_schedule")(initial)
+        with timer.phase("solve"):
+            status_name, sub_starts, lns_report = solve_lns(model_table, horizon, time_limit_s, starts=initial,
+                                                            solver_hook=solver_hook,
+                                                            on_improve=publish_model_starts("lns"),
+                                                            profile=solver_profile, stop_event=stop_event)
+        starts = base_starts.copy()
+        starts[kept_rows] = sub_starts
+        horizon = max(horizon, int((starts + table.duration).max(initial=0)))
+        remember(starts)
+        out = schedule_output(table, starts, status_name, weighted_objective(table, starts), horizon)
+        out["lns"] = lns_report
+        if presolve_report is not None:
+            out["presolve"] = presolve_report
+        return out
+
+    if decompose:
+        with timer.phase("solve"):
+            status_name, sub_starts, dec_report = solve_decomposed(
+                model_table, horizon, time_limit_s, mode=decompose, track_idx=track_idx, stations_df=stations,
+                profile=solver_profile, solver_hook=solver_hook, stop_event=stop_event)
+        starts = objective = None
+        if sub_starts is not None:
+            starts = base_starts.copy()
+            starts[kept_rows] = sub_starts
+            objective = weighted_objective(table, starts)
+            remember(starts)
+        out = schedule_output(table, starts, status_name, objective, horizon)
+        out["decomposition"] = dec_report
+        if presolve_report is not None:
+            out["presolve"] = presolve_report
+        return out
+
+    fixed_starts = hint_starts = active = None
+    inc_report = None
+    if incremental:
+        plan = plan_incremental(table, last_solution(run_key), affected_depth)
+        if plan is None:
+            inc_report = {"fallback": "no comparable previous solution; full solve"}
+        else:
+            fixed_starts, hint_starts, active, inc_report = plan
+            horizon = max(horizon, int((hint_starts + table.duration).max(initial=0)))
+            fixed_starts, hint_starts, active = fixed_starts[kept_rows], hint_starts[kept_rows], active[kept]
+
+    # the list-scheduler plan warm-starts the search and bounds the time windows
+    with timer.phase("heuristic"):
+        incumbent = list_schedule(model_table, fixed_starts)
+    publish_model_starts("list_schedule")(incumbent)
+    if hint_starts is None:
+        hint_starts = incumbent
+    windows = window_report = None
+    model_stats = {}
+    if time_windows:
+        with timer.phase("presolve"):
+            windows, horizon, window_report = model_windows(model_table, horizon, incumbent)
+    portfolio_report = None
+    metrics = {}
+    bound = None
+
+    def solve_cpsat(fixed_starts, active, windows, plan):
+        """
+        (status name, model-row starts or None) of one CP-SAT solve or the best
+        portfolio member. plan, a feasible model-row plan, fixes the objective
+        share outside the model and is returned as is when already within gap_limit.
+        """
+        nonlocal portfolio_report, bound
+        with timer.phase("lower_bound"):
+            bound = objective_lower_bound(model_table, active)
+            full_plan = base_starts.copy()
+            full_plan[kept_rows] = plan
+            plan_objective = weighted_objective(model_table, plan, active)
+            bound["objective_offset"] = weighted_objective(table, full_plan) - plan_objective
+        if gap_limit is not None:
+            plan_total = plan_objective + bound["objective_offset"]
+            if plan_total <= 0 or (plan_objective - bound["lower_bound"]) / plan_total <= gap_limit:
+                bound["stopped_early"] = True
+                metrics["solver"] = {"status": "FEASIBLE", "skipped": "list schedule within gap_limit"}
+                return "FEASIBLE", plan
+        if portfolio:
+            with timer.phase("solve"):
+                status_name, model_starts, portfolio_report = solve_portfolio(
+                    model_table, horizon, time_limit_s, list(portfolio), fixed_starts, hint_starts, active, windows,
+                    symmetry_breaking=symmetry_breaking, solver_hook=solver_hook, stop_event=stop_event)
+            metrics["solver"] = {"status": status_name}
+            return status_name, model_starts
+        with timer.phase("model_build"):
+            model, seg_vars = build_model(model_table, horizon, fixed_starts, hint_starts, active,
+                                          windows=windows, stats=model_stats, symmetry_breaking=symmetry_breaking)
+        callback = None
+        if on_incumbent is not None or gap_limit is not None:
+            callback = IncumbentCallback(
+                seg_vars, publish_model_starts("cpsat") if on_incumbent is not None else None,
+                fallback=fixed_starts, lower_bound=bound["lower_bound"], gap_limit=gap_limit,
+                objective_offset=bound["objective_offset"])
+        with timer.phase("solve"):
+            solver, status = solve_model(model, time_limit_s, solver_hook, solution_callback=callback,
+                                         profile=solver_profile)
+        bound["stopped_early"] = callback is not None and callback.stopped
+        metrics["model"] = model_metrics(model, model_table, model_stats)
+        metrics["solver"] = solver_metrics(solver, status)
+        if on_model is not None:
+            on_model(model, copy.deepcopy(metrics))
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return solver.StatusName(status), None
+        return solver.StatusName(status), solution_starts(solver, seg_vars, fallback=fixed_starts)
+
+    status_name, model_starts = solve_cpsat(fixed_starts, active, windows, incumbent)
+    if active is not None and status_name in ("INFEASIBLE", "MODEL_INVALID"):
+        # fixed zone left no room for the affected trains; re-solve everything from the hint
+        inc_report["fallback"] = "affected-zone re-solve infeasible; full solve"
+        with timer.phase("heuristic"):
+            plan = list_schedule(model_table)
+        if time_windows:
+            with timer.phase("presolve"):
+                windows, horizon, window_report = model_windows(model_table, horizon, plan)
+        status_name, model_starts = solve_cpsat(None, None, windows, plan)
+
+    starts = objective = None
+    if model_starts is not None:
+        starts = base_starts.copy()
+        starts[kept_rows] = model_starts
+        objective = weighted_objective(table, starts)
+        remember(starts)
+
+    # the model leaves out presolved (and fixed) trains, whose share of the
+    # objective is constant: shift the model bound by it
+    solve = metrics["solver"]
+    solve["objective"] = objective
+    offset = bound.pop("objective_offset")
+    bound_report = lower_bound_report(bound, objective, offset, gap_limit, bound.pop("stopped_early", False))
+    model_objective, model_bound = solve.pop("model_objective", None), solve.pop("model_bound", None)
+    if objective is not None and model_bound is not None:
+        solve["best_bound"] = objective - model_objective + model_bound
+        solve["gap_pct"] = round(100.0 * (objective - solve["best_bound"]) / objective, 3) if objective else 0.0
+
+    out = schedule_output(table, starts, status_name, objective, horizon)
+    out["metrics"] = metrics
+    out["lower_bound"] = bound_report
+    if presolve_report is not None:
+        out["presolve"] = presolve_report
+    if window_report is not None:
+        window_report.update(model_stats)
+        out["time_windows"] = window_report
+    if inc_report is not None:
+        out["incremental"] = inc_report
+    if portfolio_report is not None:
+        out["portfolio"] = portfolio_report
+    return out
+
+
+def _finish_output(out, trains, stations, tracks, updates, quiet=False, timer=None):
     # enrich with station names + timestamps
-    out = enrich_with_timestamps(out, stations, base_now=pd.Timestamp.now(), updates_df=None)
+    timer = timer or PhaseTimer()
+    with timer.phase("enrich"):
+        out = enrich_with_timestamps(out, stations, base_now=pd.Timestamp.now(), updates_df=None)
+    metrics = out.setdefault("metrics", {})
+    metrics.setdefault("solver", {"status": out.get("status"), "objective": out.get("objective")})
+    # a cached result keeps the model/solver figures of its solve; phases are this run's
+    metrics["phases"] = timer.report()
+    if quiet:
+        return out
 
     # Enrich the schedule with explanations
     explanations = explain_schedule(out, trains, tracks, updates)
@@ -459,42 +2578,126 @@ def enrich_with_timestamps(out, stations_df, base_now=None, updates_df=None):
     Convert schedule minutes into ISO timestamps and add station names.
     - base_now: datetime object to anchor 'minute 0'.
     - updates_df: if given, will use train's actual_departure_time as base when possible.
+    All segments are enriched in one batch: station names come from a single
+    indexed lookup, per-train bases from an indexed join on train_id, and the
+    timestamps from datetime64 offsets.
     """
-    station_lookup = stations_df.set_index("id")["station_name"].to_dict()
-
-    for tid, tinfo in out["trains"].items():
-        sched = tinfo.get("schedule", [])
-        if not sched:
-            continue
+    train_ids = list(out["trains"])
+    counts = [len(out["trains"][tid].get("schedule", [])) for tid in train_ids]
+    segs = [seg for tid in train_ids for seg in out["trains"][tid].get("schedule", [])]
+    if not segs:
+        return out
+
+    names = stations_df.drop_duplicates("id", keep="last").set_index("id")["station_name"]
+    from_names = _lookup_names(names, [seg["from"] for seg in segs])
+    to_names = _lookup_names(names, [seg["to"] for seg in segs])
+
+    # pick base timestamp per train
+    default_base = pd.Timestamp(base_now or pd.Timestamp.now())
+    bases = [default_base] * len(train_ids)
+    if updates_df is not None:
+        departures = updates_df.drop_duplicates("train_id").set_index("train_id")["actual_departure_time"]
+        for k, pos in enumerate(departures.index.get_indexer(train_ids).tolist()):
+            if pos < 0:
+                continue
+            try:
+                ts = pd.to_datetime(departures.iloc[pos])
+            except Exception:
+                continue
+            if not pd.isna(ts):
+                bases[k] = ts
+
+    start_min = np.array([seg["start_min"] for seg in segs], dtype=np.int64)
+    end_min = np.array([seg["end_min"] for seg in segs], dtype=np.int64)
+    if any(b.tzinfo is not None for b in bases):
+        # tz-aware bases keep their UTC offsets via Timestamp arithmetic
+        seg_bases = [b for b, n in zip(bases, counts) for _ in range(n)]
+        start_times = [(b + timedelta(minutes=int(m))).isoformat() for b, m in zip(seg_bases, start_min.tolist())]
+        end_times = [(b + timedelta(minutes=int(m))).isoformat() for b, m in zip(seg_bases, end_min.tolist())]
+    else:
+        base_ns = np.repeat(np.array([b.value for b in bases], dtype=np.int64), counts)
+        start_times = _iso_timestamps(base_ns + start_min * 60_000_000_000)
+        end_times = _iso_timestamps(base_ns + end_min * 60_000_000_000)
 
-        # pick base timestamp
-        base_ts = None
-        if updates_df is not None:
-            row = updates_df[updates_df["train_id"] == tid]
-            if not row.empty:
-                val = row.iloc[0].get("actual_departure_time")
-                try:
-                    base_ts = pd.to_datetime(val)
-                except Exception:
-                    pass
-        if base_ts is None:
-            base_ts = base_now or pd.Timestamp.now()
-
-        for seg in sched:
-            seg["from_name"] = station_lookup.get(seg["from"], seg["from"])
-            seg["to_name"] = station_lookup.get(seg["to"], seg["to"])
-            seg["start_time"] = (base_ts + timedelta(minutes=seg["start_min"])).isoformat()
-            seg["end_time"] = (base_ts + timedelta(minutes=seg["end_min"])).isoformat()
+    for seg, from_name, to_name, start_time, end_time in zip(segs, from_names, to_names, start_times, end_times):
+        seg["from_name"] = from_name
+        seg["to_name"] = to_name
+        seg["start_time"] = start_time
+        seg["end_time"] = end_time
 
     return out
 
 
+def _lookup_names(names: pd.Series, codes: list) -> list:
+    """names[code] for each code, or the code itself when unknown."""
+    pos = names.index.get_indexer(codes)
+    values = names.to_numpy(dtype=object)
+    return [values[p] if p >= 0 else code for p, code in zip(pos.tolist(), codes)]
+
+
+def _iso_timestamps(ns: np.ndarray) -> list:
+    """Timestamp.isoformat() of tz-naive nanoseconds since the epoch, in a few NumPy passes."""
+    values = ns.astype("datetime64[ns]")
+    text = np.datetime_as_string(values, unit="us").astype(object)
+    whole_s = np.mod(ns, 1_000_000_000) == 0
+    if whole_s.any():
+        text[whole_s] = np.datetime_as_string(values[whole_s], unit="s")
+    sub_us = np.mod(ns, 1000) != 0
+    if sub_us.any():
+        text[sub_us] = np.datetime_as_string(values[sub_us], unit="ns")
+    return text.tolist()
+
+
+SEGMENT_COLUMNS = ("segment_index", "track_id", "from", "to", "from_name", "to_name",
+                   "start_min", "end_min", "duration_min", "start_time", "end_time")
+
+
+def columnar_schedule(out: dict) -> dict:
+    """
+    Copy of out with the nested per-train schedules as parallel arrays:
+    "trains" holds train_id / priority / release_delay_min per train and
+    "segments" one entry per segment in each SEGMENT_COLUMNS column, plus the
+    segment's train_id. Columns the plan lacks (names and times of a
+    not-yet-enriched incumbent) are left out.
+    """
+    trains = out.get("trains", {})
+    segs = [(tid, seg) for tid, tinfo in trains.items() for seg in tinfo.get("schedule", [])]
+    columns = [c for c in SEGMENT_COLUMNS if segs and c in segs[0][1]]
+
+    res = {k: v for k, v in out.items() if k != "trains"}
+    res["layout"] = "columnar"
+    res["trains"] = {
+        "train_id": list(trains),
+        "priority": [tinfo.get("priority") for tinfo in trains.values()],
+        "release_delay_min": [tinfo.get("release_delay_min") for tinfo in trains.values()],
+    }
+    res["segments"] = {"train_id": [tid for tid, _ in segs]}
+    for c in columns:
+        res["segments"][c] = [seg.get(c) for _, seg in segs]
+    return res
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--data-root", default="backend/datasets")
     ap.add_argument("--now", default=None, help="optional 'now' timestamp (unused in MVP)")
     ap.add_argument("--limit-trains", type=int, default=20)
     ap.add_argument("--time-limit-s", type=int, default=20)
+    ap.add_argument("--decompose", choices=DECOMPOSE_MODES, default=None,
+                    help="solve independent partitions in parallel instead of one model")
+    ap.add_argument("--rolling-window-min", type=int, default=None,
+                    help="schedule in sliding windows of this many minutes")
+    ap.add_argument("--rolling-commit-min", type=int, default=None)
+    ap.add_argument("--mode", choices=SOLVE_MODES, default="cpsat",
+                    help="heuristic: priority list schedule only, no CP-SAT; lns: large-neighborhood search")
+    ap.add_argument("--solver-profile", choices=sorted(SOLVER_PROFILES), default=None)
+    ap.add_argument("--portfolio", nargs="+", choices=sorted(SOLVER_PROFILES), default=None,
+                    help="solve once per profile in parallel processes and keep the best")
+    ap.add_argument("--capture", default=None, help="write the CP-SAT model and inputs to this instance file")
+    ap.add_argument("--no-symmetry-breaking", action="store_true",
+                    help="do not order interchangeable trains in the model")
+    ap.add_argument("--gap-limit", type=float, default=None,
+                    help="stop once within this relative gap of the lower bound (e.g. 0.01)")
     args = ap.parse_args()
 
     if args.now:
@@ -508,6 +2711,15 @@ def main():
         now_ts=args.now,
         limit_trains=args.limit_trains,
         time_limit_s=args.time_limit_s,
+        decompose=args.decompose,
+        rolling_window_min=args.rolling_window_min,
+        rolling_commit_min=args.rolling_commit_min,
+        mode=args.mode,
+        solver_profile=args.solver_profile,
+        portfolio=args.portfolio,
+        capture_path=args.capture,
+        symmetry_breaking=not args.no_symmetry_breaking,
+        gap_limit=args.gap_limit,
     )
 
 
@@ -1,7 +1,30 @@
 from django.db import models
+from django.db.models import Q
+
+
+class ScheduleRun(models.Model):
+    """One optimizer result; exactly one run is marked current and served to readers."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20)
+    objective = models.FloatField(null=True, blank=True)
+    horizon = models.IntegerField(null=True, blank=True)
+    params = models.JSONField(default=dict, blank=True)
+    segment_count = models.IntegerField(default=0)
+    is_current = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["is_current"], condition=Q(is_current=True),
+                                    name="single_current_schedule_run"),
+        ]
+
+    def __str__(self):
+        return f"Run {self.pk} ({self.status}, {self.segment_count} segments)"
 
 
 class ScheduleResult(models.Model):
+    run = models.ForeignKey(ScheduleRun, on_delete=models.CASCADE, related_name="segments", null=True, blank=True)
     train_id = models.CharField(max_length=20)
     track_id = models.CharField(max_length=20)
     from_station = models.CharField(max_length=20)
@@ -12,5 +35,15 @@ class ScheduleResult(models.Model):
     priority = models.IntegerField(default=3)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # every query is scoped to one run and ordered by start time
+        indexes = [
+            models.Index(fields=["run", "start_min"], name="sched_run_start_idx"),
+            models.Index(fields=["run", "train_id", "start_min"], name="sched_run_train_idx"),
+            models.Index(fields=["run", "track_id", "start_min"], name="sched_run_track_idx"),
+            models.Index(fields=["run", "from_station", "start_min"], name="sched_run_from_idx"),
+            models.Index(fields=["run", "to_station", "start_min"], name="sched_run_to_idx"),
+        ]
+
     def __str__(self):
         return f"{self.train_id} -> {self.track_id} ({self.start_min}-{self.end_min})"
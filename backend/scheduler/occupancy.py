@@ -0,0 +1,173 @@
+"""
+In-memory occupancy index of the current schedule run.
+
+Per track: the segments running on it; per station: the trains dwelling there
+between two segments. Each resource keeps its intervals as sorted NumPy
+arrays, so "who is on X at t" and "free windows on X" are a binary search plus
+the (few) matching intervals instead of a table scan.
+
+The index is rebuilt when a run is committed (save_schedule registers an
+on_commit hook); timelines of resources whose intervals did not change are
+carried over from the previous index without being rebuilt. Readers in other processes rebuild
+lazily when they notice the current run changed.
+"""
+import bisect
+import threading
+
+import numpy as np
+
+from .model import scheduler_optimization
+from .models import ScheduleResult, ScheduleRun
+
+
+class Timeline:
+    """Sorted intervals [start, end) on one resource; capacity-many may overlap."""
+
+    def __init__(self, starts, ends, train_ids, capacity=1):
+        # train id breaks ties so equal inputs give equal timelines whatever their order
+        order = sorted(range(len(starts)), key=lambda i: (starts[i], ends[i], train_ids[i]))
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self.train_ids = np.asarray(train_ids, dtype=object)[order]
+        self.capacity = max(1, int(capacity))
+        # sorted (start, end, train_id) rows: what OccupancyIndex compares to reuse a timeline
+        self.intervals = tuple(zip(self.starts.tolist(), self.ends.tolist(), self.train_ids.tolist()))
+        # max end over intervals[0..i]: bounds the backwards scan in occupants()
+        self.max_end = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+        self.full_starts, self.full_ends = self._saturated()
+
+    def same_as(self, intervals, capacity) -> bool:
+        """True if this timeline holds exactly the sorted (start, end, train_id) intervals at capacity."""
+        return self.capacity == max(1, int(capacity)) and self.intervals == intervals
+
+    def _saturated(self):
+        """Disjoint sorted spans where all capacity units are taken."""
+        times = np.concatenate([self.starts, self.ends])
+        deltas = np.concatenate([np.ones(len(self.starts), dtype=np.int64), -np.ones(len(self.ends), dtype=np.int64)])
+        order = np.lexsort((deltas, times))   # ends before starts at the same minute
+        load = np.cumsum(deltas[order])
+        times = times[order]
+        full_starts, full_ends, opened = [], [], None
+        for t, n in zip(times.tolist(), load.tolist()):
+            if opened is None and n >= self.capacity:
+                opened = t
+            elif opened is not None and n < self.capacity:
+                if t > opened:
+                    full_starts.append(opened)
+                    full_ends.append(t)
+                opened = None
+        return full_starts, full_ends
+
+    def occupants(self, t):
+        """[(train_id, start, end)] of the intervals covering minute t."""
+        found = []
+        i = int(np.searchsorted(self.starts, t, side="right")) - 1
+        while i >= 0 and self.max_end[i] > t:
+            if self.ends[i] > t:
+                found.append((self.train_ids[i], int(self.starts[i]), int(self.ends[i])))
+            i -= 1
+        found.reverse()
+        return found
+
+    def between(self, t1, t2):
+        """[(train_id, start, end)] of the intervals overlapping [t1, t2)."""
+        hi = int(np.searchsorted(self.starts, t2, side="left"))
+        lo = int(np.searchsorted(self.max_end[:hi], t1, side="right"))
+        return [(self.train_ids[i], int(self.starts[i]), int(self.ends[i]))
+                for i in range(lo, hi) if self.ends[i] > t1]
+
+    def free_windows(self, t1, t2):
+        """[(start, end)] sub-spans of [t1, t2) with at least one capacity unit free."""
+        windows, cursor = [], t1
+        j = bisect.bisect_right(self.full_ends, t1)
+        while j < len(self.full_starts) and self.full_starts[j] < t2:
+            if self.full_starts[j] > cursor:
+                windows.append((cursor, self.full_starts[j]))
+            cursor = max(cursor, self.full_ends[j])
+            j += 1
+        if cursor < t2:
+            windows.append((cursor, t2))
+        return windows
+
+
+class OccupancyIndex:
+    def __init__(self, run_id, segments, capacity_by_track=None, previous=None):
+        """
+        segments: iterable of (train_id, track_id, from_station, to_station, start_min, end_min).
+        previous: an older OccupancyIndex whose unchanged timelines are reused.
+        """
+        capacity_by_track = capacity_by_track or {}
+        by_track, by_train = {}, {}
+        for train_id, track_id, from_station, to_station, start, end in segments:
+            by_track.setdefault(track_id, []).append((start, end, train_id))
+            by_train.setdefault(train_id, []).append((start, end, from_station, to_station))
+
+        # a train dwells at a station from the end of one segment to the start of the next
+        by_station = {}
+        for train_id, segs in by_train.items():
+            segs.sort()
+            for (_, arrive, _, station), (depart, _, _, _) in zip(segs, segs[1:]):
+                if depart > arrive:
+                    by_station.setdefault(station, []).append((arrive, depart, train_id))
+
+        self.run_id = run_id
+        self.reused = 0
+        self.tracks = self._timelines(by_track, capacity_by_track, previous and previous.tracks)
+        self.stations = self._timelines(by_station, {}, previous and previous.stations)
+
+    def _timelines(self, intervals, capacity, previous):
+        timelines = {}
+        for resource, rows in intervals.items():
+            rows = tuple(sorted(rows))   # (start, end, train_id): the order a Timeline keeps
+            cap = capacity.get(resource, 1)
+            old = previous.get(resource) if previous else None
+            if old is not None and old.same_as(rows, cap):
+                timelines[resource] = old
+                self.reused += 1
+                continue
+            starts, ends, train_ids = zip(*rows)
+            timelines[resource] = Timeline(starts, ends, train_ids, cap)
+        return timelines
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def track_capacities(data_root):
+    try:
+        tracks = scheduler_optimization.load_data(data_root)[2]
+    except (FileNotFoundError, ValueError):
+        return {}
+    idx = scheduler_optimization.build_track_index(tracks)
+    return dict(zip(idx.track_id.tolist(), idx.capacity.tolist()))
+
+
+def refresh_from_result(run_id, res, data_root):
+    """Build the index for a just-committed run from its optimizer result."""
+    global _index
+    segments = [
+        (tid, seg["track_id"], seg["from"], seg["to"], seg["start_min"], seg["end_min"])
+        for tid, tinfo in res.get("trains", {}).items()
+        for seg in tinfo.get("schedule", [])
+    ]
+    with _index_lock:
+        _index = OccupancyIndex(run_id, segments, track_capacities(data_root), previous=_index)
+        return _index
+
+
+def current_index():
+    """Index of the current run, rebuilt from the DB if another process committed a newer run."""
+    global _index
+    run = ScheduleRun.objects.filter(is_current=True).values("pk", "params").first()
+    if run is None:
+        return None
+    with _index_lock:
+        if _index is not None and _index.run_id == run["pk"]:
+            return _index
+        segments = ScheduleResult.objects.filter(run_id=run["pk"]).values_list(
+            "train_id", "track_id", "from_station", "to_station", "start_min", "end_min")
+        data_root = (run["params"] or {}).get("data_root")
+        capacities = track_capacities(data_root) if data_root else {}
+        _index = OccupancyIndex(run["pk"], segments, capacities, previous=_index)
+        return _index
@@ -0,0 +1,264 @@
+import csv
+import os
+import time
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import ScheduleResult, ScheduleRun
+from .model import scheduler_optimization
+from . import metrics, occupancy
+
+
+def run_params(data):
+    """Normalize the optimizer inputs accepted by /api/scheduler/run/."""
+    return {
+        "data_root": data.get("data_root", os.path.join(settings.BASE_DIR, "datasets")),
+        "limit_trains": optional_int(data.get("limit_trains"), "limit_trains"),
+        "time_limit_s": number(data.get("time_limit_s", 20), "time_limit_s"),
+        "incremental": as_bool(data.get("incremental", False)),
+        "affected_depth": number(data.get("affected_depth", 1), "affected_depth"),
+        "decompose": choice(data, "decompose", (None,) + scheduler_optimization.DECOMPOSE_MODES),
+        "rolling_window_min": optional_int(data.get("rolling_window_min"), "rolling_window_min"),
+        "rolling_commit_min": optional_int(data.get("rolling_commit_min"), "rolling_commit_min"),
+        "presolve": as_bool(data.get("presolve", True)),
+        "time_windows": as_bool(data.get("time_windows", True)),
+        "mode": choice(data, "mode", scheduler_optimization.SOLVE_MODES, default="cpsat"),
+        "solver_profile": solver_profile(data.get("solver_profile") or None),
+        "portfolio": portfolio(data.get("portfolio") or None),
+        "use_cache": as_bool(data.get("use_cache", True)),
+        "capture": as_bool(data.get("capture", False)),
+        "symmetry_breaking": as_bool(data.get("symmetry_breaking", True)),
+        "gap_limit": optional_float(data.get("gap_limit", getattr(settings, "SCHEDULER_GAP_LIMIT", 0.01)),
+                                    "gap_limit"),
+    }
+
+
+def choice(data, name, allowed, default=None):
+    """data[name] (default if missing or empty), which must be one of allowed."""
+    value = data.get(name) or default
+    if value not in allowed:
+        raise ValidationError({name: f"must be one of {', '.join(str(a) for a in allowed if a is not None)}"})
+    return value
+
+
+def solver_profile(value, name="solver_profile"):
+    """value, if it names or describes CP-SAT settings (see resolve_solver_profile)."""
+    try:
+        scheduler_optimization.resolve_solver_profile(value)
+    except ValueError as e:
+        raise ValidationError({name: str(e)})
+    return value
+
+
+def portfolio(value):
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        raise ValidationError({"portfolio": "must be a list of solver profiles"})
+    return [solver_profile(profile, "portfolio") for profile in value]
+
+
+def number(value, name, cast=int):
+    """value as an int (or float), raising a field error for anything else."""
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "must be an integer" if cast is int else "must be a number"})
+
+
+def optional_int(value, name):
+    return number(value, name) if value not in (None, "") else None
+
+
+def optional_float(value, name):
+    return number(value, name, float) if value not in (None, "") else None
+
+
+def as_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def run_schedule(params, solver_hook=None):
+    """Optimize, save the schedule into the DB and export it to CSV."""
+    res = optimize_schedule(params, solver_hook=solver_hook)
+    persist_schedule(res, params)
+    return res
+
+
+def capture_options(params):
+    """
+    (capture_path, capture_min_solve_s) for optimize(). Instances are written
+    to SCHEDULER_CAPTURE_DIR only: every solve of a run with "capture": true,
+    otherwise solves slower than SCHEDULER_CAPTURE_MIN_SOLVE_S (if set).
+    """
+    directory = getattr(settings, "SCHEDULER_CAPTURE_DIR", None)
+    min_solve_s = 0.0 if params.get("capture") else getattr(settings, "SCHEDULER_CAPTURE_MIN_SOLVE_S", None)
+    if not directory or min_solve_s is None:
+        return None, 0.0
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{scheduler_optimization.INSTANCE_SUFFIX}"
+    return os.path.join(directory, name), min_solve_s
+
+
+def optimize_schedule(params, solver_hook=None, on_incumbent=None, stop_event=None):
+    capture_path, capture_min_solve_s = capture_options(params)
+    res = scheduler_optimization.optimize(
+        data_root=params["data_root"],
+        limit_trains=params["limit_trains"],
+        time_limit_s=params["time_limit_s"],
+        solver_hook=solver_hook,
+        incremental=params["incremental"],
+        affected_depth=params["affected_depth"],
+        decompose=params["decompose"],
+        rolling_window_min=params["rolling_window_min"],
+        rolling_commit_min=params["rolling_commit_min"],
+        presolve=params["presolve"],
+        time_windows=params["time_windows"],
+        mode=params["mode"],
+        on_incumbent=on_incumbent,
+        solver_profile=params["solver_profile"],
+        portfolio=params["portfolio"],
+        use_cache=params["use_cache"],
+        quiet=True,
+        capture_path=capture_path,
+        capture_min_solve_s=capture_min_solve_s,
+        symmetry_breaking=params["symmetry_breaking"],
+        gap_limit=params["gap_limit"],
+        stop_event=stop_event,
+    )
+    metrics.registry.record_run(res)
+    return res
+
+
+def persist_schedule(res, params=None):
+    """Save and export the result; the time of each step is added to res["metrics"]["phases"]."""
+    phases = {}
+    started = time.perf_counter()
+    save_schedule(res, params)
+    phases["db_persist"] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+    export_schedule_csv(res)
+    phases["csv_export"] = round(time.perf_counter() - started, 4)
+    res.setdefault("metrics", {}).setdefault("phases", {}).update(phases)
+    metrics.registry.record_phases(phases)
+
+
+def save_schedule(res, params=None):
+    """
+    Store the result as a new ScheduleRun and make it the current one.
+    Segments go in with bulk_create batches; the run only becomes current when
+    the whole transaction commits, so readers never see a partial schedule.
+    Runs beyond SCHEDULER_RUN_HISTORY (newest first) are deleted. After the
+    commit the in-memory occupancy index is rebuilt for the new run.
+    """
+    batch_size = getattr(settings, "SCHEDULER_SAVE_BATCH_SIZE", 1000)
+    keep_runs = max(1, getattr(settings, "SCHEDULER_RUN_HISTORY", 10))
+    with transaction.atomic():
+        run = ScheduleRun.objects.create(
+            status=res.get("status") or "",
+            objective=res.get("objective"),
+            horizon=res.get("horizon"),
+            params=params or {},
+        )
+        segments = (
+            ScheduleResult(
+                run=run,
+                train_id=tid,
+                track_id=seg["track_id"],
+                from_station=seg["from"],
+                to_station=seg["to"],
+                start_min=seg["start_min"],
+                end_min=seg["end_min"],
+                duration_min=seg["duration_min"],
+                priority=tinfo["priority"],
+            )
+            for tid, tinfo in res.get("trains", {}).items()
+            for seg in tinfo.get("schedule", [])
+        )
+        count = 0
+        while True:
+            batch = list(islice(segments, batch_size))
+            if not batch:
+                break
+            ScheduleResult.objects.bulk_create(batch, batch_size=batch_size)
+            count += len(batch)
+
+        swap_current_run(run, count)
+
+        stale = ScheduleRun.objects.order_by("-created_at", "-pk").values_list("pk", flat=True)[keep_runs:]
+        ScheduleRun.objects.filter(pk__in=list(stale)).delete()
+        # rows written before runs were versioned
+        ScheduleResult.objects.filter(run__isnull=True).delete()
+
+        data_root = (params or {}).get("data_root") or os.path.join(settings.BASE_DIR, "datasets")
+        transaction.on_commit(lambda: occupancy.refresh_from_result(run.pk, res, data_root))
+
+    res["run_id"] = run.pk
+    return run
+
+
+def swap_current_run(run, segment_count, attempts=3):
+    """
+    Make run the current one. The current run is locked first, so concurrent
+    saves swap one after the other; each clears the flag set by the one before.
+    With no current run there is nothing to lock: if another save sets one in
+    the meantime the unique constraint fails, and the swap is retried against it.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                list(ScheduleRun.objects.select_for_update().filter(is_current=True).values_list("pk", flat=True))
+                ScheduleRun.objects.filter(is_current=True).update(is_current=False)
+                ScheduleRun.objects.filter(pk=run.pk).update(is_current=True, segment_count=segment_count)
+            return
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+
+
+def export_schedule_csv(res):
+    # logic to write the same results to a CSV file
+    try:
+        output_path = os.path.join(settings.BASE_DIR, "datasets", "schedules", "schedule_output.csv")
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # Prepare data for CSV
+        rows = []
+        for train_id, train_info in res.get("trains", {}).items():
+            for segment in train_info.get("schedule", []):
+                row_data = {
+                    'train_id': train_id,
+                    'priority': train_info.get('priority'),
+                    'release_delay_min': train_info.get('release_delay_min'),
+                    'track_id': segment.get('track_id'),
+                    'from_station': segment.get('from'),
+                    'to_station': segment.get('to'),
+                    'from_name': segment.get('from_name'),
+                    'to_name': segment.get('to_name'),
+                    'start_min': segment.get('start_min'),
+                    'end_min': segment.get('end_min'),
+                    'duration_min': segment.get('duration_min'),
+                    'start_time': segment.get('start_time'),
+                    'end_time': segment.get('end_time'),
+                }
+                rows.append(row_data)
+
+        # Write to CSV file, overwriting it if it exists
+        if rows:
+            with open(output_path, 'w', newline='') as csvfile:
+                fieldnames = rows[0].keys()
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+                writer.writeheader()
+                writer.writerows(rows)
+
+            # Add a success message to the response
+            res['csv_export_status'] = f"Successfully wrote {len(rows)} segments to {output_path}"
+    except Exception as e:
+        # Add an error message to the response if CSV writing fails
+        res['csv_export_status'] = f"Error writing to CSV: {str(e)}"
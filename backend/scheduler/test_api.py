@@ -0,0 +1,115 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+
+from . import services
+from .models import ScheduleResult, ScheduleRun
+from .testing import api_client, schedule_result
+
+
+class RunParamsTests(SimpleTestCase):
+    def assert_rejected(self, field, *values):
+        for value in values:
+            with self.subTest(value=value), self.assertRaises(ValidationError) as ctx:
+                services.run_params({field: value})
+            self.assertIn(field, ctx.exception.detail)
+
+    def test_rejects_unknown_mode(self):
+        self.assert_rejected("mode", "fast", "CPSAT")
+        self.assertEqual(services.run_params({})["mode"], "cpsat")
+
+    def test_rejects_unknown_decompose_mode(self):
+        self.assert_rejected("decompose", "tiles")
+        self.assertIsNone(services.run_params({"decompose": ""})["decompose"])
+        self.assertEqual(services.run_params({"decompose": "division"})["decompose"], "division")
+
+    def test_rejects_unknown_solver_profiles(self):
+        self.assert_rejected("solver_profile", "turbo", 3)
+        # a portfolio is a list, even of one profile
+        self.assert_rejected("portfolio", "fast", ["default", "turbo"])
+        params = services.run_params({"solver_profile": "fast", "portfolio": ["single", "fixed"]})
+        self.assertEqual((params["solver_profile"], params["portfolio"]), ("fast", ["single", "fixed"]))
+
+    def test_rejects_non_numeric_fields(self):
+        self.assert_rejected("limit_trains", "abc", [5])
+        self.assert_rejected("time_limit_s", "soon", None)
+        self.assert_rejected("gap_limit", "tight")
+        params = services.run_params({"limit_trains": "12", "rolling_window_min": "", "gap_limit": None})
+        self.assertEqual((params["limit_trains"], params["rolling_window_min"], params["gap_limit"]), (12, None, None))
+
+
+class SchedulerApiTests(TestCase):
+    def setUp(self):
+        self.client = api_client()
+
+    def test_bad_run_params_are_a_400(self):
+        for url in ("/api/scheduler/run/", "/api/scheduler/jobs/"):
+            response = self.client.post(url, {"limit_trains": "abc"}, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"limit_trains": "must be an integer"})
+
+
+@override_settings(SCHEDULER_SAVE_BATCH_SIZE=3, SCHEDULER_RUN_HISTORY=2)
+class SaveScheduleTests(TestCase):
+    def test_each_save_is_a_new_current_run(self):
+        first = schedule_result(4)
+        run = services.save_schedule(first, {"limit_trains": 4})
+        self.assertEqual(first["run_id"], run.pk)
+        run.refresh_from_db()
+        self.assertEqual((run.is_current, run.segment_count, run.params), (True, 8, {"limit_trains": 4}))
+        self.assertEqual(ScheduleResult.objects.filter(run=run).count(), 8)
+
+        second = services.save_schedule(schedule_result(5))
+        self.assertEqual(ScheduleRun.objects.get(is_current=True).pk, second.pk)
+        # the previous version stays readable
+        self.assertEqual(ScheduleResult.objects.filter(run=run).count(), 8)
+
+    def test_old_runs_are_dropped(self):
+        ScheduleResult.objects.create(train_id="OLD", track_id="TRK001", from_station="STN001", to_station="STN002",
+                                      start_min=0, end_min=1, duration_min=1)
+        runs = [services.save_schedule(schedule_result(n)) for n in (1, 2, 3)]
+        self.assertEqual(sorted(ScheduleRun.objects.values_list("pk", flat=True)), [runs[1].pk, runs[2].pk])
+        self.assertEqual(ScheduleResult.objects.count(), 2 * (2 + 3))
+
+    def test_swap_keeps_one_current_run(self):
+        runs = [ScheduleRun.objects.create(status="OPTIMAL") for _ in range(3)]
+        for n, run in enumerate(runs):
+            services.swap_current_run(run, n)
+        current = ScheduleRun.objects.get(is_current=True)
+        self.assertEqual((current.pk, current.segment_count), (runs[-1].pk, 2))
+
+
+class ScheduleSegmentsApiTests(TestCase):
+    def setUp(self):
+        self.client = api_client()
+        self.old = services.save_schedule(schedule_result(2))
+        self.run = services.save_schedule(schedule_result(4))
+
+    def segments(self, **query):
+        response = self.client.get("/api/scheduler/segments/", query)
+        self.assertEqual(response.status_code, 200)
+        return [(s["train_id"], s["track_id"], s["start_min"]) for s in response.json()["results"]]
+
+    def test_filters_the_current_run(self):
+        self.assertEqual(len(self.segments()), 8)
+        self.assertEqual(self.segments(train="TRN0001"), [("TRN0001", "TRK001", 1), ("TRN0001", "TRK002", 6)])
+        self.assertEqual(self.segments(track="TRK002", end=7),
+                         [("TRN0000", "TRK002", 5), ("TRN0001", "TRK002", 6)])
+        # station matches either end; start/end keep the segments overlapping [start, end)
+        self.assertEqual(self.segments(station="STN003", start=9, end=10),
+                         [("TRN0001", "TRK002", 6), ("TRN0002", "TRK002", 7), ("TRN0003", "TRK002", 8)])
+        starts = [start for _, _, start in self.segments()]
+        self.assertEqual(starts, sorted(starts))
+
+    def test_older_runs_by_id(self):
+        self.assertEqual({tid for tid, _, _ in self.segments(run=self.old.pk)}, {"TRN0000", "TRN0001"})
+        self.assertEqual(self.segments(run=self.old.pk + self.run.pk), [])
+
+    def test_pages(self):
+        response = self.client.get("/api/scheduler/segments/", {"page_size": 3, "page": 3})
+        self.assertEqual((response.json()["count"], len(response.json()["results"])), (8, 2))
+
+    def test_rejects_non_integer_params(self):
+        for name in ("run", "start", "end"):
+            response = self.client.get("/api/scheduler/segments/", {name: "abc"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(name, response.json())
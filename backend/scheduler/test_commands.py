@@ -0,0 +1,157 @@
+import gzip
+import io
+import json
+import os
+
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from .management.commands import benchmark_scheduler
+from .management.commands.benchmark_solver_profiles import Command as BenchmarkCommand
+from .model import scheduler_optimization as so
+from .testing import DatasetTestCase
+
+
+class BenchmarkSolverProfilesTests(DatasetTestCase):
+    def benchmark(self, *args):
+        output = os.path.join(self.data_root, "bench.json")
+        call_command("benchmark_solver_profiles", "--data-root", self.data_root, "--limit-trains", "8",
+                     "--time-limit-s", "2", "--output", output, *args, stdout=io.StringIO())
+        with open(output) as f:
+            return json.load(f)
+
+    def test_output_names_the_dataset_version(self):
+        result = self.benchmark("--profiles", "single", "fixed")
+        fingerprint = so.dataset_fingerprint(self.data_root)
+        self.assertEqual(result["dataset"]["fingerprint"], fingerprint)
+        self.assertEqual({r["instance"] for r in result["runs"]},
+                         {f"{os.path.basename(self.data_root)}@{fingerprint[:12]}:8"})
+        self.assertEqual(sorted(r["profile"] for r in result["ranking"]), ["fixed", "single"])
+        # another version of the files is another instance
+        self.append_delay("TRN0003", 25)
+        again = self.benchmark("--profiles", "single")
+        self.assertNotEqual(again["runs"][0]["instance"], result["runs"][0]["instance"])
+
+    def test_rejects_unknown_profiles(self):
+        with self.assertRaises(CommandError):
+            self.benchmark("--profiles", "turbo")
+
+
+class RankTests(SimpleTestCase):
+    def test_ranks_within_each_instance_and_seed(self):
+        runs = [
+            {"instance": "a", "seed": 0, "profile": "p", "objective": 10.0, "wall_time_s": 2.0, "status": "OPTIMAL"},
+            {"instance": "a", "seed": 0, "profile": "q", "objective": 10.0, "wall_time_s": 1.0, "status": "OPTIMAL"},
+            {"instance": "b", "seed": 0, "profile": "p", "objective": 20.0, "wall_time_s": 1.0, "status": "FEASIBLE"},
+            {"instance": "b", "seed": 0, "profile": "q", "objective": None, "wall_time_s": 5.0, "status": "UNKNOWN"},
+        ]
+        ranking = BenchmarkCommand.rank(runs, ["p", "q"])
+        self.assertEqual([(r["profile"], r["mean_rank"], r["optimal"]) for r in ranking],
+                         [("p", 1.5, 1), ("q", 1.5, 1)])
+        self.assertEqual([r["mean_gap_pct"] for r in ranking], [0.0, 0.0])
+
+
+class SyntheticNetworkTests(DatasetTestCase):
+    def synthetic(self, scale, **sizes):
+        shape = benchmark_scheduler.dataset_shape(self.data_root)
+        shape.update(sizes)
+        root = os.path.join(self.data_root, f"synthetic_{scale}x")
+        return root, shape, benchmark_scheduler.write_synthetic_dataset(root, shape, scale)
+
+    def test_networks_scale_and_stay_connected(self):
+        for scale in (1, 3):
+            root, shape, sizes = self.synthetic(scale, stations=20, tracks=30, trains=15)
+            self.assertEqual((sizes["stations"], sizes["trains"]), (20 * scale, 15 * scale))
+            self.assertLessEqual(sizes["tracks"], 30 * scale)
+            trains, stations, tracks, updates = so.load_data(root)
+            self.assertEqual((len(stations), len(tracks), len(trains)),
+                             (sizes["stations"], sizes["tracks"], sizes["trains"]))
+            index = {sid: k for k, sid in enumerate(stations["id"])}
+            a = tracks["from_station_id"].map(index).to_numpy()
+            b = tracks["to_station_id"].map(index).to_numpy()
+            graph = csr_matrix((np.ones(len(a)), (a, b)), shape=(len(stations), len(stations)))
+            self.assertEqual(connected_components(graph, directed=False)[0], 1)
+            # every route stops at known stations only
+            table = so.build_segment_table(trains, so.build_track_index(tracks), updates)
+            self.assertEqual(table.n_trains, sizes["trains"])
+            self.assertEqual(table.unknown_stops, 0)
+
+    def test_run_phases(self):
+        root, _, _ = self.synthetic(1, stations=20, tracks=30, trains=15)
+        run = benchmark_scheduler.run_phases(root, 5)
+        self.assertIn(run["status"], ("OPTIMAL", "FEASIBLE"))
+        self.assertGreaterEqual(set(run["phases"]), {"load_data", "segment_build", "model_build", "solve", "enrich"})
+        self.assertGreater(run["model"]["variables"], 0)
+        self.assertLessEqual(run["lower_bound"], run["objective"])
+
+
+class BaselineComparisonTests(SimpleTestCase):
+    def run_of(self, solve_s, objective, status="OPTIMAL", load_s=0.05):
+        return {"scale": "1x", "status": status, "objective": objective,
+                "phases": {"load_data": {"wall_time_s": load_s}, "solve": {"wall_time_s": solve_s}}}
+
+    def compare(self, run, base):
+        command = benchmark_scheduler.Command(stdout=io.StringIO())
+        return command.compare([run], {"1x": base}, max_slowdown=1.5, max_gap_pct=1.0)
+
+    def test_flags_slowdowns_and_worse_objectives(self):
+        self.assertEqual(self.compare(self.run_of(1.4, 100.5), self.run_of(1.0, 100.0)), [])
+        failures = self.compare(self.run_of(2.0, 103.0), self.run_of(1.0, 100.0))
+        self.assertEqual(len(failures), 2)
+        self.assertTrue(failures[0].startswith("1x solve"))
+        self.assertIn("objective", failures[1])
+        self.assertEqual(len(self.compare(self.run_of(1.0, None, "UNKNOWN"), self.run_of(1.0, 100.0))), 1)
+
+    def test_skips_noisy_and_time_limited_phases(self):
+        # sub-MIN_COMPARED_S phases and solves that hit the limit in the baseline are not timed against it
+        run, base = self.run_of(9.0, 100.0, load_s=0.09), self.run_of(1.0, 100.0, "FEASIBLE", load_s=0.01)
+        self.assertEqual(self.compare(run, base), [])
+
+
+class CaptureReplayTests(DatasetTestCase):
+    def capture(self):
+        path = os.path.join(self.data_root, "captures", "run" + so.INSTANCE_SUFFIX)
+        changed = []
+
+        def on_incumbent(_):
+            # the files change while the run is solving; the capture keeps what it loaded
+            if not changed:
+                self.append_delay("TRN0003", 25)
+                changed.append(True)
+
+        out = so.optimize(self.data_root, limit_trains=10, time_limit_s=10, use_cache=False, quiet=True,
+                          capture_path=path, on_incumbent=on_incumbent)
+        self.assertEqual(out["capture"]["path"], path)
+        return out, path
+
+    def test_round_trip(self):
+        out, path = self.capture()
+        self.assertEqual(out["status"], "OPTIMAL")
+        instance = so.load_instance(path)
+        self.assertNotEqual(instance["fingerprint"], so.dataset_fingerprint(self.data_root))
+
+        solver, status = so.solve_model(so.instance_model(instance), 10)
+        self.assertEqual(solver.StatusName(status), "OPTIMAL")
+        self.assertEqual(solver.ObjectiveValue(), instance["result"]["solver"]["model_objective"])
+
+        output = os.path.join(self.data_root, "replay.json")
+        call_command("replay_instance", path, "--rerun", "--output", output, stdout=io.StringIO())
+        with open(output) as f:
+            rerun = json.load(f)["reruns"][0]
+        self.assertEqual((rerun["status"], rerun["objective"]), ("OPTIMAL", out["objective"]))
+
+    def test_replay_checks_the_inputs(self):
+        _, path = self.capture()
+        instance = so.load_instance(path)
+        instance["inputs"]["train_delay_data.csv"] += "TRN0001,STN001,STN002,2030-01-01 10:00:00,,90,,,,,,,,,\n"
+        with self.assertRaises(ValueError):
+            so.write_instance_inputs(instance, os.path.join(self.data_root, "replay"))
+        # captures without a fingerprint cannot be checked, so they are not replayed
+        del instance["fingerprint"]
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(instance, f)
+        with self.assertRaises(CommandError):
+            call_command("replay_instance", path, stdout=io.StringIO())
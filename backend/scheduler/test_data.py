@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from .model import scheduler_optimization as so
+from .testing import DatasetTestCase
+
+
+def tracks_frame(rows):
+    """tracks.csv frame from [(track_id, from, to, distance_km), ...] (120 km/h, capacity 1, free)."""
+    return pd.DataFrame([
+        {"track_id": t, "from_station_id": a, "to_station_id": b, "distance_km": d,
+         "max_speed_kmph": 120, "capacity": 1, "status": "free"}
+        for t, a, b, d in rows
+    ])
+
+
+# A - B - C - D in a line, a long A - D shortcut, and an island X - Y
+LINE = tracks_frame([("T1", "A", "B", 10), ("T2", "B", "C", 10), ("T3", "C", "D", 10),
+                     ("T4", "A", "D", 100), ("T5", "X", "Y", 5)])
+
+
+class LoadDataTests(DatasetTestCase):
+    def test_reloads_changed_files(self):
+        updates = so.load_data(self.data_root)[3]
+        self.assertNotIn("TRN0003", updates)
+        self.assertEqual(so.load_data(self.data_root)[3], updates)
+        self.append_delay("TRN0003", 25)
+        self.assertEqual(so.load_data(self.data_root)[3]["TRN0003"]["delay_minutes"], 25)
+
+    def test_keeps_one_snapshot_per_dataset(self):
+        so.load_data(self.data_root)
+        for minutes in (5, 10, 15):
+            self.append_delay("TRN0003", minutes)
+            so.load_data(self.data_root)
+        roots = [os.path.dirname(k[0][0]) for k in so._DATASET_CACHE]
+        self.assertEqual(roots.count(self.data_root), 1)
+
+    def test_latest_update_wins(self):
+        self.append_delay("TRN0003", 25)
+        # appended last but departed earlier: the older update must not replace the newer one
+        with open(os.path.join(self.data_root, "train_delay_data.csv"), "a") as f:
+            f.write("TRN0003,STN001,STN002,2029-01-01 10:00:00,2029-01-01 09:00:00,3,free,fog,Express,2,16,110,1,9,1\n")
+        update = so.load_data(self.data_root, use_cache=False)[3]["TRN0003"]
+        self.assertEqual((update["delay_minutes"], update["weather_impact"]), (25, "clear"))
+
+    def test_frames_are_copies(self):
+        trains = so.load_data(self.data_root)[0]
+        trains["extra"] = 1
+        self.assertNotIn("extra", so.load_data(self.data_root)[0].columns)
+
+
+def trains_frame(routes, max_speed=(130, 90, 0)):
+    return pd.DataFrame([
+        {"train_id": f"TR{i}", "priority_level": 1 + i % 4, "scheduled_route": route,
+         "max_speed_kmph": max_speed[i % len(max_speed)]}
+        for i, route in enumerate(routes)
+    ])
+
+
+class TrackIndexTests(SimpleTestCase):
+    def test_pairs_resolve_in_both_directions(self):
+        idx = so.TrackIndex(LINE)
+        a, b = idx.intern(["A", "B", "C", "Q"]), idx.intern(["B", "A", "A", "A"])
+        self.assertEqual(a[-1], -1)
+        rows = idx.lookup_pairs(a, b)
+        self.assertEqual(rows.tolist(), [0, 0, -1, -1])
+        self.assertEqual(idx.route_rows(["D", "C", "B", "A", "D"]).tolist(), [2, 1, 0, 3])
+        self.assertEqual(len(idx.route_rows(["A"])), 0)
+
+    def test_later_duplicate_pair_wins(self):
+        idx = so.TrackIndex(tracks_frame([("T1", "A", "B", 10), ("T2", "B", "A", 12)]))
+        self.assertEqual(idx.route_rows(["A", "B"]).tolist(), [1])
+        self.assertEqual(idx.track_id[1], "T2")
+
+    def test_index_is_cached_by_content(self):
+        self.assertIs(so.build_track_index(LINE), so.build_track_index(LINE.copy()))
+        edited = LINE.copy()
+        edited.loc[0, "capacity"] = 2
+        self.assertIsNot(so.build_track_index(edited), so.build_track_index(LINE))
+
+
+class SegmentTableTests(SimpleTestCase):
+    def test_batch_durations_match_segment_minutes(self):
+        idx = so.TrackIndex(LINE)
+        trains = trains_frame(["A,B,C,D", "D,C,B", "X,Y", "A"])
+        updates = {"TR0": {"delay_minutes": 7, "weather_impact": "Fog", "track_status": "maintenance"},
+                   "TR1": {"delay_minutes": 0, "weather_impact": None, "track_status": "occupied"}}
+        table = so.build_segment_table(trains, idx, updates)
+        self.assertEqual(np.diff(table.offsets).tolist(), [3, 2, 1, 0])
+        self.assertEqual(table.release.tolist(), [7, 0, 0, 0])
+        self.assertEqual(table.track_id.tolist(), ["T1", "T2", "T3", "T3", "T2", "T5"])
+        for i, tid in enumerate(table.train_ids):
+            upd = updates.get(tid, {})
+            vmax = trains.loc[i, "max_speed_kmph"] or 100
+            for row in range(*table.offsets[i:i + 2]):
+                r = table.track_row[row]
+                expected = so.segment_minutes(idx.distance_km[r], idx.max_speed_kmph[r], vmax,
+                                              upd.get("weather_impact", "clear"), upd.get("track_status", "free"))
+                self.assertEqual(table.duration[row], expected)
+
+
+class RouteCompletionTests(SimpleTestCase):
+    def table(self, *routes):
+        return so.build_segment_table(trains_frame(routes), so.TrackIndex(LINE), {})
+
+    def stations(self, table, i):
+        sl = table.train_slice(i)
+        return [table.from_station[sl][0]] + table.to_station[sl].tolist() if sl.stop > sl.start else []
+
+    def test_missing_hops_follow_the_shortest_path(self):
+        table = self.table("A,C", "D,B", "D,A")
+        self.assertEqual(self.stations(table, 0), ["A", "B", "C"])
+        self.assertEqual(self.stations(table, 1), ["D", "C", "B"])
+        # a direct track is kept even where a path through other stations is shorter
+        self.assertEqual(self.stations(table, 2), ["D", "A"])
+        self.assertEqual((table.expanded_hops, table.unreachable_hops, table.unknown_stops), (2, 0, 0))
+        paths = so.TrackIndex(LINE).paths
+        self.assertEqual(paths.path_stations(0, 0), [])
+
+    def test_unknown_stations_are_bridged(self):
+        table = self.table("A,C,Q,D", "Q,B,C", "A,X")
+        self.assertEqual(self.stations(table, 0), ["A", "B", "C", "D"])
+        self.assertEqual(self.stations(table, 1), ["B", "C"])
+        self.assertEqual(self.stations(table, 2), [])
+        self.assertEqual((table.expanded_hops, table.unreachable_hops, table.unknown_stops), (1, 1, 2))
+        out = so.schedule_output(table, np.zeros(len(table), dtype=np.int64), "FEASIBLE", 0, 100)
+        self.assertEqual(out["route_completion"]["unknown_stops"], 2)
@@ -0,0 +1,157 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import jobs
+from .testing import api_client
+
+
+class JobQueueTests(SimpleTestCase):
+    """The solve itself is replaced by a stand-in that runs until the test releases it."""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.persisted = []
+        self.queue = jobs.SchedulerJobQueue(max_workers=1)
+        self.addCleanup(self.queue.executor.shutdown)
+        self.addCleanup(self.release.set)
+        patches = [
+            mock.patch.object(jobs.services, "optimize_schedule", side_effect=self.fake_optimize),
+            mock.patch.object(jobs.services, "persist_schedule", side_effect=self.fake_persist),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def fake_optimize(self, params, solver_hook=None, on_incumbent=None, stop_event=None):
+        self.started.release()
+        on_incumbent({"source": "list_schedule", "objective": 10.0, "elapsed_s": 0.0, "trains": {}})
+        while not self.release.wait(0.01):
+            if stop_event.is_set():
+                break
+        return {"status": "FEASIBLE", "objective": 10.0, "params": params}
+
+    def fake_persist(self, res, params):
+        self.persisted.append(res)
+
+    def params(self, **extra):
+        return dict({"data_root": "/nonexistent", "limit_trains": 5}, **extra)
+
+    def wait(self, job):
+        job.future.result(timeout=5)
+
+    def test_identical_active_submissions_coalesce(self):
+        first, created = self.queue.submit(self.params())
+        self.assertTrue(created)
+        self.assertTrue(self.started.acquire(timeout=5))
+        again, created = self.queue.submit(self.params())
+        self.assertIs(again, first)
+        self.assertFalse(created)
+        other, created = self.queue.submit(self.params(limit_trains=6))
+        self.assertTrue(created)
+
+        self.release.set()
+        self.wait(first)
+        self.wait(other)
+        self.assertEqual((first.status, other.status), (jobs.SUCCEEDED, jobs.SUCCEEDED))
+        self.assertEqual(len(self.persisted), 2)
+        # a finished job is not reused
+        self.assertTrue(self.queue.submit(self.params())[1])
+
+    def test_cancel_queued_job_never_runs(self):
+        running, _ = self.queue.submit(self.params())
+        self.assertTrue(self.started.acquire(timeout=5))
+        queued, _ = self.queue.submit(self.params(limit_trains=6))
+        self.assertEqual(queued.status, jobs.QUEUED)
+        self.queue.cancel(queued.id)
+        self.assertEqual(queued.status, jobs.CANCELLED)
+        self.assertTrue(queued.incumbents.closed)
+
+        self.release.set()
+        self.wait(running)
+        self.assertEqual(jobs.services.optimize_schedule.call_count, 1)
+        # the slot is free again for the same inputs
+        self.assertTrue(self.queue.submit(self.params(limit_trains=6))[1])
+
+    def test_cancel_running_job_stops_and_skips_saving(self):
+        job, _ = self.queue.submit(self.params())
+        self.assertTrue(self.started.acquire(timeout=5))
+        self.assertEqual(job.status, jobs.RUNNING)
+        self.queue.cancel(job.id)
+        self.assertTrue(job.stop_event.is_set())
+        self.wait(job)
+        self.assertEqual(job.status, jobs.CANCELLED)
+        self.assertEqual(job.result["status"], "FEASIBLE")
+        self.assertEqual(self.persisted, [])
+        self.assertEqual(job.to_dict()["incumbent"]["objective"], 10.0)
+
+    def test_unknown_job(self):
+        self.assertIsNone(self.queue.cancel("missing"))
+        self.assertIsNone(self.queue.get("missing"))
+
+
+class IncumbentStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = jobs.SchedulerJobQueue(max_workers=1)
+        self.addCleanup(self.queue.executor.shutdown)
+        patcher = mock.patch.object(jobs, "get_queue", return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = api_client()
+
+    def add_job(self):
+        job = jobs.SchedulerJob({"limit_trains": 5}, "key")
+        self.queue.jobs[job.id] = job
+        return job
+
+    def stream(self, job_id):
+        response = self.client.get(f"/api/scheduler/jobs/{job_id}/stream/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        events = []
+        for block in body.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    def test_streams_incumbents_then_done(self):
+        job = self.add_job()
+        for n, objective in enumerate((30.0, 20.0)):
+            job.incumbents.publish({"source": "cpsat", "objective": objective, "elapsed_s": n, "trains": {}})
+        job.status = jobs.SUCCEEDED
+        job.incumbents.close()
+        events = self.stream(job.id)
+        self.assertEqual([e for e, _ in events], ["incumbent", "incumbent", "done"])
+        self.assertEqual([(d["seq"], d["objective"]) for _, d in events[:2]], [(0, 30.0), (1, 20.0)])
+        done = events[-1][1]
+        self.assertEqual((done["status"], done["incumbent"]["objective"], done["incumbent"]["solutions"]),
+                         (jobs.SUCCEEDED, 20.0, 2))
+
+    def test_reader_waits_for_the_next_plan(self):
+        job = self.add_job()
+        received = []
+
+        def read():
+            received.extend(self.stream(job.id))
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        job.incumbents.publish({"source": "list_schedule", "objective": 9.0, "elapsed_s": 0, "trains": {}})
+        job.incumbents.close()
+        reader.join(5)
+        self.assertEqual([e for e, _ in received], ["incumbent", "done"])
+
+    def test_slow_readers_skip_superseded_plans(self):
+        channel = jobs.IncumbentChannel(max_events=2)
+        for objective in (50, 40, 30, 20):
+            channel.publish({"objective": objective})
+        events, closed = channel.wait(0, timeout=0)
+        self.assertEqual([(e["seq"], e["objective"]) for e in events], [(2, 30), (3, 20)])
+        self.assertFalse(closed)
+        self.assertEqual(channel.wait(4, timeout=0), ([], False))
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get("/api/scheduler/jobs/missing/stream/").status_code, 404)
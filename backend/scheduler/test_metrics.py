@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from . import metrics
+from .model import scheduler_optimization as so
+from .testing import DatasetTestCase, api_client
+
+
+class PhaseMetricsTests(DatasetTestCase):
+    def phases(self, **run):
+        out = so.optimize(self.data_root, limit_trains=20, time_limit_s=5, use_cache=False, quiet=True, **run)
+        return out, list(out["metrics"]["phases"])
+
+    def test_list_schedule_has_its_own_phase(self):
+        out, phases = self.phases()
+        self.assertEqual(phases, ["load_data", "track_index", "segment_build", "presolve", "heuristic", "lower_bound",
+                                  "model_build", "solve", "enrich"])
+        self.assertGreater(out["metrics"]["model"]["variables"], 0)
+        self.assertEqual(out["metrics"]["solver"]["status"], out["status"])
+        self.assertIn("heuristic", self.phases(mode="lns")[1])
+        # in heuristic mode the list schedule is the solve
+        self.assertNotIn("heuristic", self.phases(mode="heuristic")[1])
+
+
+class RunMetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = metrics.RunMetrics()
+
+    def test_aggregates_runs(self):
+        self.registry.record_run({"status": "OPTIMAL", "metrics": {"phases": {"solve": 0.2, "enrich": 0.001},
+                                                                   "solver": {"gap_pct": 0.0}}})
+        self.registry.record_run({"status": "FEASIBLE", "cache": {"hit": True}, "metrics": {"phases": {"solve": 7}}})
+        self.registry.record_phases({"db_persist": 0.03})
+        snap = self.registry.snapshot()
+        self.assertEqual((snap["runs"], snap["runs_by_status"], snap["cache_hits"]),
+                         (2, {"OPTIMAL": 1, "FEASIBLE": 1}, 1))
+        self.assertEqual(list(snap["phase_seconds"]), ["db_persist", "enrich", "solve"])
+        solve = snap["phase_seconds"]["solve"]
+        self.assertEqual((solve["count"], solve["sum"]), (2, 7.2))
+        counts = {b["le"]: b["count"] for b in solve["buckets"]}
+        self.assertEqual((counts[0.1], counts[0.25], counts[5], counts[10], counts["+Inf"]), (0, 1, 1, 2, 2))
+        self.assertEqual(snap["gap_pct"]["count"], 1)
+
+    def test_prometheus_text(self):
+        self.registry.record_run({"status": "OPTIMAL", "metrics": {"phases": {"solve": 0.2}, "solver": {"gap_pct": 3}}})
+        lines = metrics.prometheus_text(self.registry.snapshot()).splitlines()
+        self.assertIn('scheduler_runs_total{status="OPTIMAL"} 1', lines)
+        self.assertIn('scheduler_phase_seconds_bucket{phase="solve",le="0.25"} 1', lines)
+        self.assertIn('scheduler_phase_seconds_count{phase="solve"} 1', lines)
+        self.assertIn('scheduler_gap_percent_bucket{le="2"} 0', lines)
+        self.assertIn("scheduler_gap_percent_sum 3.0", lines)
+
+    def test_endpoint(self):
+        self.registry.record_run({"status": "OPTIMAL", "metrics": {"phases": {"solve": 0.2}}})
+        client = api_client()
+        with mock.patch.object(metrics, "registry", self.registry):
+            self.assertEqual(client.get("/api/scheduler/metrics/").json()["runs"], 1)
+            response = client.get("/api/scheduler/metrics/", {"format": "prometheus"})
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"scheduler_runs_total", response.content)
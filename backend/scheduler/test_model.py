@@ -0,0 +1,138 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from .model import scheduler_optimization as so
+from .testing import ScheduleAssertions, optimum, random_table, random_trains, segment_table
+
+
+class ListScheduleTests(ScheduleAssertions, SimpleTestCase):
+    def test_plans_are_feasible(self):
+        for seed in range(8):
+            table = random_table(seed)
+            self.assert_feasible(table, so.list_schedule(table))
+
+    def test_fixed_rows_keep_capacity(self):
+        # booked in row order, a and c shared a unit and e=16 put three trains on the track
+        table = segment_table([(3, 0, [("K", 10, 2)]), (3, 0, [("K", 10, 2)]), (3, 0, [("K", 10, 2)]),
+                               (3, 0, [("K", 12, 2)]), (3, 16, [("K", 3, 2)])])
+        fixed = np.array([0, 20, 15, 5, -1])
+        starts = so.list_schedule(table, fixed)
+        self.assertEqual(starts[:4].tolist(), fixed[:4].tolist())
+        self.assertEqual(starts[4], 17)
+        self.assert_feasible(table, starts)
+
+    def test_fixed_rows_on_random_tables(self):
+        for seed in range(20):
+            table = random_table(seed, n_trains=12, capacity={"K1": 2, "K2": 3, "K3": 1})
+            full = so.list_schedule(table)
+            keep = np.random.default_rng(seed).random(table.n_trains) < 0.5
+            fixed = np.where(table.row_mask(keep), full, -1)
+            starts = so.list_schedule(table, fixed, order=np.arange(table.n_trains)[::-1])
+            self.assertTrue((starts[fixed >= 0] == fixed[fixed >= 0]).all())
+            self.assert_feasible(table, starts)
+
+
+class PresolveTests(ScheduleAssertions, SimpleTestCase):
+    def test_presolve_keeps_optimum(self):
+        for seed in range(8):
+            table = random_table(seed)
+            best, _ = optimum(table)
+            free, starts, report = so.presolve_conflict_free(table)
+            self.assertTrue(free[-1], "the private-track train is conflict free")
+            self.assertEqual(report["conflict_free_trains"], int(free.sum()))
+            rows = table.row_mask(~free)
+            sub = table.subset(~free)
+            _, sub_starts = optimum(sub)
+            starts[rows] = sub_starts
+            self.assert_feasible(table, starts)
+            self.assertEqual(so.weighted_objective(table, starts), best)
+
+    def test_shared_tracks_within_capacity_are_conflict_free(self):
+        table = segment_table([(1, 3, [("K3", 4, 2), ("K1", 2, 1)]), (2, 0, [("K3", 5, 2)]),
+                               (3, 1, [("K1", 6, 1)])])
+        free, starts, report = so.presolve_conflict_free(table)
+        self.assertEqual(free.tolist(), [False, True, False])
+        self.assertEqual(starts.tolist(), [-1, -1, 0, -1])
+        self.assertEqual((report["conflict_free_trains"], report["model_trains"]), (1, 2))
+        self.assertEqual(report["redundant_track_constraints"], 1)
+
+
+class TimeWindowTests(ScheduleAssertions, SimpleTestCase):
+    def test_time_windows_keep_optimum(self):
+        for seed in range(8):
+            table = random_table(seed)
+            best, best_starts = optimum(table)
+            incumbent = so.list_schedule(table)
+            (est, lct), horizon, report = so.model_windows(table, so.compute_horizon(table), incumbent)
+            self.assertEqual(report["upper_bound"], so.weighted_objective(table, incumbent))
+            # every optimal plan lies inside the windows derived from the incumbent
+            self.assertTrue((best_starts >= est).all())
+            self.assertTrue((best_starts + table.duration <= lct).all())
+            pruned, starts = optimum(table, horizon=horizon, windows=(est, lct), hint_starts=incumbent)
+            self.assert_feasible(table, starts)
+            self.assertEqual(pruned, best)
+
+    def test_windows_without_incumbent_use_the_horizon(self):
+        table = segment_table([(1, 3, [("K1", 4, 1), ("K2", 3, 1)]), (2, 0, [("K1", 5, 1)])])
+        (est, lct), horizon, report = so.model_windows(table, 50)
+        self.assertIsNone(report["upper_bound"])
+        self.assertEqual(est.tolist(), [3, 7, 0])
+        self.assertEqual(lct.tolist(), [47, 50, 50])
+
+    def test_sweep_clusters_split_disjoint_windows(self):
+        est, lct = np.array([0, 2, 10, 12, 30]), np.array([5, 11, 14, 20, 40])
+        clusters = so.sweep_clusters(est, lct)
+        self.assertEqual(sorted(sorted(c.tolist()) for c in clusters), [[0, 1, 2, 3], [4]])
+
+
+class SymmetryBreakingTests(ScheduleAssertions, SimpleTestCase):
+    def test_symmetry_breaking_keeps_optimum(self):
+        route = [("K1", 4, 1), ("K2", 3, 1)]
+        table = segment_table([(1, 0, route), (1, 0, route), (1, 0, route),
+                               (2, 1, [("K2", 5, 1)]), (3, 2, [("K1", 2, 1), ("K2", 2, 1)])])
+        groups = so.interchangeable_trains(table)
+        self.assertEqual([g.tolist() for g in groups], [[0, 1, 2]])
+        best, _ = optimum(table)
+        stats = {}
+        ordered, starts = optimum(table, symmetry_breaking=True, stats=stats,
+                                  hint_starts=so.list_schedule(table))
+        self.assert_feasible(table, starts)
+        self.assertEqual(ordered, best)
+        self.assertEqual(stats["symmetry_constraints"], 2)
+        first = starts[table.offsets[:3]]
+        self.assertTrue((np.diff(first) >= 0).all())
+
+    def test_symmetry_breaking_skips_fixed_trains(self):
+        route = [("K1", 4, 1)]
+        table = segment_table([(1, 0, route), (1, 0, route), (1, 0, route)])
+        fixed = np.array([8, -1, -1])
+        self.assertEqual([g.tolist() for g in so.interchangeable_trains(table, fixed)], [[1, 2]])
+
+    def test_duplicated_trains_keep_optimum(self):
+        for seed in range(6):
+            trains = random_trains(seed)
+            table = segment_table(trains + trains[:3])
+            self.assertGreaterEqual(len(so.interchangeable_trains(table)), 1)
+            best, _ = optimum(table)
+            ordered, starts = optimum(table, symmetry_breaking=True)
+            self.assert_feasible(table, starts)
+            self.assertEqual(ordered, best)
+
+
+class LowerBoundTests(ScheduleAssertions, SimpleTestCase):
+    def test_lower_bound_below_optimum(self):
+        for seed in range(8):
+            table = random_table(seed)
+            best, _ = optimum(table)
+            bound = so.objective_lower_bound(table)
+            self.assertLessEqual(bound["critical_path"], bound["lower_bound"])
+            self.assertLessEqual(bound["lower_bound"], best)
+            self.assertLessEqual(best, so.weighted_objective(table, so.list_schedule(table)))
+
+    def test_lower_bound_counts_track_load(self):
+        # three unit-priority trains queued on one single-capacity track
+        table = segment_table([(3, 0, [("K1", 5, 1)])] * 3)
+        bound = so.objective_lower_bound(table)
+        best, _ = optimum(table)
+        self.assertEqual(bound["bound_tracks"], 1)
+        self.assertEqual(bound["lower_bound"], best)
@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase, TestCase
+
+from . import services
+from .occupancy import OccupancyIndex
+from .testing import api_client, schedule_result
+
+
+class OccupancyIndexTests(SimpleTestCase):
+    segments = [
+        ("A", "K1", "S1", "S2", 0, 10), ("B", "K1", "S1", "S2", 5, 12), ("C", "K1", "S1", "S2", 20, 30),
+        ("A", "K2", "S2", "S3", 15, 25), ("B", "K2", "S2", "S3", 12, 14), ("D", "K1", "S1", "S2", 8, 22),
+    ]
+
+    def naive_between(self, track, t1, t2):
+        return sorted((tid, s, e) for tid, k, _, _, s, e in self.segments if k == track and s < t2 and e > t1)
+
+    def test_queries_match_a_scan(self):
+        index = OccupancyIndex(1, self.segments, {"K1": 2})
+        k1 = index.tracks["K1"]
+        for t in range(-1, 32):
+            self.assertEqual(sorted(k1.occupants(t)), self.naive_between("K1", t, t + 1))
+            for t2 in range(t + 1, 33, 4):
+                self.assertEqual(sorted(k1.between(t, t2)), self.naive_between("K1", t, t2))
+                load = [len(self.naive_between("K1", m, m + 1)) for m in range(t, t2)]
+                free = [m for w in k1.free_windows(t, t2) for m in range(*w)]
+                self.assertEqual(free, [m for m, n in zip(range(t, t2), load) if n < 2])
+        # A dwells at S2 between its K1 and K2 segments
+        self.assertEqual(index.stations["S2"].occupants(12), [("A", 10, 15)])
+
+    def test_unchanged_timelines_are_reused(self):
+        old = OccupancyIndex(1, self.segments, {"K1": 2})
+        moved = [s if s[0] != "B" or s[1] != "K2" else ("B", "K2", "S2", "S3", 30, 32) for s in self.segments]
+        new = OccupancyIndex(2, list(reversed(moved)), {"K1": 2}, previous=old)
+        self.assertIs(new.tracks["K1"], old.tracks["K1"])
+        self.assertIsNot(new.tracks["K2"], old.tracks["K2"])
+        self.assertEqual(new.tracks["K2"].occupants(31), [("B", 30, 32)])
+        # same intervals at another capacity are rebuilt
+        self.assertIsNot(OccupancyIndex(3, self.segments, {"K1": 1}, previous=old).tracks["K1"], old.tracks["K1"])
+
+
+class OccupancyApiTests(TestCase):
+    def setUp(self):
+        self.client = api_client()
+        # TRNi runs on TRK001 during [i, i + 5), then on TRK002
+        self.run = services.save_schedule(schedule_result(4))
+
+    def get(self, url, **query):
+        response = self.client.get(f"/api/scheduler/occupancy/{url}", query)
+        return response.status_code, response.json()
+
+    def test_track_at_a_minute_and_over_a_range(self):
+        status, body = self.get("tracks/TRK001/", t=4)
+        self.assertEqual((status, body["run_id"], body["capacity"]), (200, self.run.pk, 1))
+        self.assertEqual([o["train_id"] for o in body["occupants"]], ["TRN0000", "TRN0001", "TRN0002", "TRN0003"])
+        _, body = self.get("tracks/TRK001/", **{"from": 6, "to": 8})
+        self.assertEqual([(o["train_id"], o["start_min"]) for o in body["segments"]],
+                         [("TRN0002", 2), ("TRN0003", 3)])
+
+    def test_free_windows(self):
+        _, body = self.get("tracks/TRK002/free/", **{"from": 0, "to": 20})
+        self.assertEqual(body["free_windows"], [{"start_min": 0, "end_min": 5}, {"start_min": 12, "end_min": 20}])
+        # a track no train uses is free throughout
+        _, body = self.get("tracks/TRK999/free/", **{"from": 0, "to": 20})
+        self.assertEqual(body["free_windows"], [{"start_min": 0, "end_min": 20}])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.get("tracks/TRK999/", t=4)[0], 404)
+        self.assertEqual(self.get("tracks/TRK001/", t="soon"), (400, {"t": "must be an integer minute"}))
+        self.assertEqual(self.get("stations/STN002/"), (400, {"t": "required"}))
+        self.assertEqual(self.get("stations/STN999/", t=4)[1]["occupants"], [])
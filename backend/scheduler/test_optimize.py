@@ -0,0 +1,116 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from .model import scheduler_optimization as so
+from .testing import DatasetTestCase, segment_table
+
+
+class IncrementalTests(DatasetTestCase):
+    def test_unaffected_trains_keep_their_plan(self):
+        run = dict(limit_trains=20, time_limit_s=5, use_cache=False, quiet=True)
+        first = so.optimize(self.data_root, **run)
+        self.append_delay("TRN0003", 40)
+        second = so.optimize(self.data_root, incremental=True, **run)
+        report = second["incremental"]
+        self.assertEqual(report["changed_trains"], ["TRN0003"])
+        self.assertEqual(report["affected_trains"] + report["fixed_trains"], 20)
+        self.assertGreater(report["fixed_trains"], 0)
+
+        trains, _, tracks, updates = so.load_data(self.data_root)
+        table = so.build_segment_table(trains.head(20), so.build_track_index(tracks), updates)
+        active = so.affected_trains(table, np.array(table.train_ids) == "TRN0003")
+        for tid, is_active in zip(table.train_ids, active):
+            if not is_active:
+                self.assertEqual(self.plan(second, tid), self.plan(first, tid))
+
+    def test_plan_incremental_fixes_trains_away_from_the_change(self):
+        table = segment_table([(1, 0, [("K1", 4, 1)]), (2, 0, [("K1", 3, 1), ("K2", 2, 1)]),
+                               (3, 0, [("K2", 5, 1)]), (3, 0, [("K3", 5, 1)])])
+        key = ("incremental-test", None)
+        so.remember_solution(key, table, so.list_schedule(table))
+        prev = so.last_solution(key)
+        table.release[0] = 9
+        fixed, hints, active, report = so.plan_incremental(table, prev, depth=1)
+        self.assertEqual(report["changed_trains"], ["T0"])
+        self.assertEqual(active.tolist(), [True, True, False, False])
+        self.assertEqual((fixed[:3] >= 0).tolist(), [False, False, False])
+        self.assertTrue((fixed[3:] == prev["starts"][3:]).all())
+        self.assertEqual(so.plan_incremental(table, prev, depth=2)[2].tolist(), [True, True, True, False])
+        # a different train set cannot be warm-started
+        self.assertIsNone(so.plan_incremental(table.subset(np.array([True, True, True, False])), prev))
+
+    def test_last_solutions_are_bounded(self):
+        table = segment_table([(1, 0, [("K1", 4, 1)])])
+        starts = np.zeros(1, dtype=np.int64)
+        keys = [so.solution_key(f"/data/{n}") for n in range(so._LAST_SOLUTIONS_MAX + 3)]
+        so.remember_solution(keys[0], table, starts)
+        for key in keys[1:]:
+            # the first key stays in use, so the ones after it are evicted instead
+            self.assertIsNotNone(so.last_solution(keys[0]))
+            so.remember_solution(key, table, starts)
+        self.assertLessEqual(len(so._LAST_SOLUTIONS), so._LAST_SOLUTIONS_MAX)
+        self.assertIsNotNone(so.last_solution(keys[0]))
+        self.assertIsNotNone(so.last_solution(keys[-1]))
+        self.assertIsNone(so.last_solution(keys[1]))
+
+
+class ResultCacheTests(DatasetTestCase):
+    def test_result_cache_hit_and_invalidation(self):
+        run = dict(limit_trains=15, mode="heuristic", quiet=True)
+        first = so.optimize(self.data_root, **run)
+        self.assertFalse(first["cache"]["hit"])
+        second = so.optimize(self.data_root, **run)
+        self.assertTrue(second["cache"]["hit"])
+        self.assertEqual(second["objective"], first["objective"])
+        for tid in first["trains"]:
+            self.assertEqual(self.plan(second, tid), self.plan(first, tid))
+        # other settings are a different entry
+        self.assertFalse(so.optimize(self.data_root, limit_trains=10, mode="heuristic", quiet=True)["cache"]["hit"])
+        self.append_delay("TRN0003", 25)
+        third = so.optimize(self.data_root, **run)
+        self.assertFalse(third["cache"]["hit"])
+        self.assertNotEqual(third["objective"], first["objective"])
+
+    def test_cache_hit_warm_starts_the_next_incremental_run(self):
+        run = dict(limit_trains=20, time_limit_s=5, quiet=True)
+        first = so.optimize(self.data_root, **run)
+        # another run on the same trains replaces the last solution ...
+        other = so.optimize(self.data_root, limit_trains=20, mode="heuristic", use_cache=False, quiet=True)
+        self.assertNotEqual(other["objective"], first["objective"])
+        # ... until the cache hit puts the cached plan back
+        self.assertTrue(so.optimize(self.data_root, **run)["cache"]["hit"])
+        prev = so.last_solution(so.solution_key(self.data_root, 20))
+        for i, tid in enumerate(prev["train_ids"]):
+            starts = prev["starts"][prev["offsets"][i]:prev["offsets"][i + 1]]
+            self.assertEqual(starts.tolist(), [start for _, start, _ in self.plan(first, tid)])
+        self.append_delay("TRN0003", 40)
+        second = so.optimize(self.data_root, incremental=True, **run)
+        self.assertEqual(second["incremental"]["changed_trains"], ["TRN0003"])
+        self.assertGreater(second["incremental"]["fixed_trains"], 0)
+        trains, _, tracks, updates = so.load_data(self.data_root)
+        table = so.build_segment_table(trains.head(20), so.build_track_index(tracks), updates)
+        active = so.affected_trains(table, np.array(table.train_ids) == "TRN0003")
+        for tid in np.array(table.train_ids)[~active]:
+            self.assertEqual(self.plan(second, tid), self.plan(first, tid))
+
+
+class GapLimitTests(DatasetTestCase):
+    def run_with(self, gap_limit):
+        return so.optimize(self.data_root, limit_trains=30, time_limit_s=20, use_cache=False, quiet=True,
+                           gap_limit=gap_limit)
+
+    def test_list_schedule_within_the_gap_skips_the_solve(self):
+        out = self.run_with(1.0)
+        self.assertTrue(out["lower_bound"]["stopped_early"])
+        self.assertIn("skipped", out["metrics"]["solver"])
+        self.assertNotIn("model_build", out["metrics"]["phases"])
+        heuristic = so.optimize(self.data_root, limit_trains=30, mode="heuristic", use_cache=False, quiet=True)
+        self.assertEqual(out["objective"], heuristic["objective"])
+
+    def test_solve_stops_within_the_gap(self):
+        out = self.run_with(0.05)
+        report = out["lower_bound"]
+        self.assertTrue(report["stopped_early"])
+        self.assertLessEqual(report["gap_pct"], 5.0)
+        self.assertLessEqual(report["lower_bound"], out["objective"])
+        self.assertLess(out["metrics"]["solver"]["wall_time_s"], 20)
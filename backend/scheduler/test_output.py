@@ -0,0 +1,137 @@
+import copy
+import random
+from datetime import timedelta
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from . import jobs
+from .model import scheduler_optimization as so
+from .testing import api_client
+
+
+def per_row_enrichment(out, stations_df, base_now=None, updates_df=None):
+    """enrich_with_timestamps() as it was before it was vectorized: the reference it must agree with."""
+    station_lookup = stations_df.set_index("id")["station_name"].to_dict()
+    for tid, tinfo in out["trains"].items():
+        sched = tinfo.get("schedule", [])
+        if not sched:
+            continue
+        base_ts = None
+        if updates_df is not None:
+            row = updates_df[updates_df["train_id"] == tid]
+            if not row.empty:
+                val = row.iloc[0].get("actual_departure_time")
+                try:
+                    base_ts = pd.to_datetime(val)
+                except Exception:
+                    pass
+        if base_ts is None:
+            base_ts = base_now or pd.Timestamp.now()
+        for seg in sched:
+            seg["from_name"] = station_lookup.get(seg["from"], seg["from"])
+            seg["to_name"] = station_lookup.get(seg["to"], seg["to"])
+            seg["start_time"] = (base_ts + timedelta(minutes=seg["start_min"])).isoformat()
+            seg["end_time"] = (base_ts + timedelta(minutes=seg["end_min"])).isoformat()
+    return out
+
+
+def random_output(seed, n_trains=30):
+    """optimize()-shaped output over stations S0..S9 (S9 has no name), some trains without segments."""
+    rng = random.Random(seed)
+    trains = {}
+    for i in range(n_trains):
+        t, schedule = rng.randint(0, 600), []
+        for k in range(rng.choice([0, 1, 3, 5])):
+            d = rng.randint(1, 90)
+            schedule.append({"segment_index": k, "track_id": f"K{k}", "from": f"S{rng.randint(0, 9)}",
+                             "to": f"S{rng.randint(0, 9)}", "start_min": t, "end_min": t + d, "duration_min": d})
+            t += d + rng.randint(0, 5)
+        trains[f"TRN{i:04d}"] = {"priority": rng.randint(1, 4), "release_delay_min": 0, "schedule": schedule}
+    return {"status": "FEASIBLE", "trains": trains}
+
+
+STATIONS = pd.DataFrame({"id": [f"S{i}" for i in range(9)] + ["S0"],
+                         "station_name": [f"Station {i}" for i in range(9)] + ["Renamed 0"]})
+
+
+class EnrichmentTests(SimpleTestCase):
+    def assert_same_enrichment(self, out, **kwargs):
+        expected = per_row_enrichment(copy.deepcopy(out), STATIONS, **kwargs)
+        self.assertEqual(so.enrich_with_timestamps(copy.deepcopy(out), STATIONS, **kwargs), expected)
+
+    def test_matches_the_per_row_version(self):
+        bases = [pd.Timestamp("2030-01-01 06:00"), pd.Timestamp("2030-03-31 23:59:30.250"),
+                 pd.Timestamp("2030-01-01 06:00:00.000000001")]
+        for seed, base in enumerate(bases):
+            with self.subTest(base=base):
+                self.assert_same_enrichment(random_output(seed), base_now=base)
+
+    def test_matches_with_departure_updates(self):
+        out = random_output(7)
+        ids = list(out["trains"])
+        updates = pd.DataFrame({
+            # repeated trains use their first row; unparseable times fall back to base_now
+            "train_id": [ids[0], ids[1], ids[1], ids[2], ids[3], "TRN9999"],
+            "actual_departure_time": ["2030-01-02 08:15:00", "2030-01-02 09:00:00", "2030-01-02 10:00:00",
+                                      "not a time", "2030-01-02 07:00:00.5", "2030-01-02 08:00:00"],
+        })
+        self.assert_same_enrichment(out, base_now=pd.Timestamp("2030-01-01 06:00"), updates_df=updates)
+        aware = updates.assign(actual_departure_time=updates["actual_departure_time"].where(
+            updates.index != 0, "2030-01-02 08:15:00+05:30"))
+        self.assert_same_enrichment(out, base_now=pd.Timestamp("2030-01-01 06:00"), updates_df=aware)
+
+    def test_missing_departure_uses_base_now(self):
+        # the per-row version printed "NaT" for every segment of such a train
+        out = {"trains": {"TRN0000": {"schedule": [{"from": "S1", "to": "S9", "start_min": 5, "end_min": 9}]}}}
+        updates = pd.DataFrame({"train_id": ["TRN0000"], "actual_departure_time": [None]})
+        seg = so.enrich_with_timestamps(out, STATIONS, pd.Timestamp("2030-01-01 06:00"), updates)[
+            "trains"]["TRN0000"]["schedule"][0]
+        self.assertEqual((seg["from_name"], seg["to_name"]), ("Station 1", "S9"))
+        self.assertEqual((seg["start_time"], seg["end_time"]), ("2030-01-01T06:05:00", "2030-01-01T06:09:00"))
+
+
+def nested_schedule(res):
+    """Inverse of columnar_schedule(), for the round trip."""
+    segments, columns = res["segments"], [c for c in res["segments"] if c != "train_id"]
+    out = {k: v for k, v in res.items() if k not in ("layout", "trains", "segments")}
+    out["trains"] = {tid: {"priority": p, "release_delay_min": d, "schedule": []}
+                     for tid, p, d in zip(*res["trains"].values())}
+    for k, tid in enumerate(segments["train_id"]):
+        out["trains"][tid]["schedule"].append({c: segments[c][k] for c in columns})
+    return out
+
+
+class ColumnarScheduleTests(SimpleTestCase):
+    def test_round_trip(self):
+        out = so.enrich_with_timestamps(random_output(2), STATIONS, pd.Timestamp("2030-01-01 06:00"))
+        res = so.columnar_schedule(out)
+        self.assertEqual(res["layout"], "columnar")
+        self.assertEqual(list(res["segments"]), ["train_id", *so.SEGMENT_COLUMNS])
+        lengths = {len(column) for column in res["segments"].values()}
+        self.assertEqual(lengths, {sum(len(t["schedule"]) for t in out["trains"].values())})
+        self.assertEqual(nested_schedule(res), out)
+        self.assertIn("schedule", next(iter(out["trains"].values())), "out is left as it was")
+
+    def test_plans_keep_only_their_columns(self):
+        res = so.columnar_schedule(random_output(4))
+        self.assertNotIn("start_time", res["segments"])
+        self.assertEqual(nested_schedule(res), random_output(4))
+        empty = so.columnar_schedule({"status": "INFEASIBLE", "trains": {}})
+        self.assertEqual(empty["segments"], {"train_id": []})
+
+    def test_job_result_layout(self):
+        queue = jobs.SchedulerJobQueue(max_workers=1)
+        self.addCleanup(queue.executor.shutdown)
+        job = jobs.SchedulerJob({}, "key")
+        job.status, job.result = jobs.SUCCEEDED, random_output(5)
+        queue.jobs[job.id] = job
+        client = api_client()
+        url = f"/api/scheduler/jobs/{job.id}/result/"
+        with mock.patch.object(jobs, "get_queue", return_value=queue):
+            self.assertEqual(client.get(url).json(), job.result)
+            self.assertEqual(client.get(url, {"layout": "columnar"}).json(), so.columnar_schedule(job.result))
+            response = client.get(url, {"layout": "csv"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("layout", response.json())
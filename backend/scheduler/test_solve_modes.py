@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from .model import scheduler_optimization as so
+from .testing import ScheduleAssertions, optimum, random_table, random_trains, segment_table
+
+
+def dataset_table(limit_trains):
+    """(table, track index, stations) for the first trains of the bundled dataset."""
+    trains, stations, tracks, updates = so.load_data(os.path.join(settings.BASE_DIR, "datasets"))
+    idx = so.build_track_index(tracks)
+    return so.build_segment_table(trains.head(limit_trains).reset_index(drop=True), idx, updates), idx, stations
+
+
+class ScheduleViolationTests(ScheduleAssertions, SimpleTestCase):
+    def test_counts_each_kind(self):
+        table = segment_table([(1, 5, [("K1", 4, 1), ("K2", 3, 1)]), (2, 0, [("K1", 4, 1)]),
+                               (3, 0, [("K2", 2, 2)])])
+        ok = np.array([5, 9, 0, 12])
+        self.assert_feasible(table, ok)
+        self.assertTrue(so.is_feasible(table, ok))
+        cases = {
+            "before_release": [4, 9, 0, 12],
+            "overlapping_predecessor": [5, 8, 0, 12],
+            "over_capacity": [5, 9, 3, 12],
+            "unscheduled": [5, 9, -1, 12],
+        }
+        for kind, starts in cases.items():
+            violations = so.schedule_violations(table, np.array(starts))
+            self.assertGreater(violations[kind], 0, kind)
+            self.assertFalse(so.is_feasible(table, np.array(starts)))
+        # back to back on a track is not an overlap; capacity is the smallest over the track's rows
+        self.assertTrue(so.is_feasible(table, np.array([5, 9, 9, 12])))
+        self.assertEqual(so.schedule_violations(table, np.array([5, 9, 0, 9]))["over_capacity"], 1)
+
+    def test_agrees_with_a_minute_scan(self):
+        rng = np.random.default_rng(0)
+        for seed in range(20):
+            table = random_table(seed, capacity={"K1": 2, "K2": 1, "K3": 3})
+            starts = so.list_schedule(table)
+            self.assertTrue(so.is_feasible(table, starts))
+            jitter = starts + rng.integers(-3, 4, size=len(starts))
+            with self.subTest(seed=seed):
+                try:
+                    self.assert_feasible(table, jitter)
+                except AssertionError:
+                    self.assertFalse(so.is_feasible(table, jitter))
+                else:
+                    self.assertTrue(so.is_feasible(table, jitter))
+
+
+class DecompositionTests(ScheduleAssertions, SimpleTestCase):
+    def test_subproblem_never_returns_an_infeasible_incumbent(self):
+        # the fixed trains already overload K1, so no plan (and no list schedule) is feasible
+        table = segment_table([(1, 0, [("K1", 5, 1)]), (1, 0, [("K1", 5, 1)]), (2, 0, [("K1", 3, 1)])])
+        fixed = np.array([0, 2, -1])
+        active = np.array([False, False, True])
+        past = time.time() - 1
+        self.assertEqual(so._solve_subproblem((table, 300, fixed, active, past, 1.0, "default")), ("UNKNOWN", None))
+        status, starts = so._solve_subproblem((table, 300, fixed, active, time.time() + 5, 1.0, "default"))
+        self.assertEqual((status, starts), ("INFEASIBLE", None))
+
+    def test_stopped_subproblem_keeps_a_feasible_incumbent(self):
+        table = random_table(3)
+        stop = threading.Event()
+        stop.set()
+        job = (table, so.compute_horizon(table), np.full(len(table), -1), None, time.time() + 5, 1.0, "default")
+        status, starts = so._solve_subproblem(job, stop_event=stop)
+        self.assertEqual(status, "FEASIBLE")
+        self.assertEqual(starts.tolist(), so.list_schedule(table).tolist())
+
+    def test_components_are_solved_exactly(self):
+        for seed in range(4):
+            # two random instances on disjoint tracks: two or more components
+            table = segment_table(random_trains(seed) + random_trains(seed, capacity={"L1": 1, "L2": 2},
+                                                                      private_track=False))
+            status, starts, report = so.solve_decomposed(table, so.compute_horizon(table), 20, max_processes=1)
+            self.assertGreaterEqual(report["components"], 2)
+            self.assert_feasible(table, starts)
+            self.assertEqual(so.weighted_objective(table, starts), optimum(table)[0])
+
+    def test_division_never_loses_to_the_list_schedule(self):
+        table, idx, stations = dataset_table(60)
+        plan = so.list_schedule(table)
+        status, starts, report = so.solve_decomposed(table, so.compute_horizon(table), 2, "division", idx, stations,
+                                                     max_processes=1)
+        self.assertIn(status, ("OPTIMAL", "FEASIBLE"))
+        self.assert_feasible(table, starts)
+        self.assertLessEqual(so.weighted_objective(table, starts), so.weighted_objective(table, plan))
+        if report["kept_list_schedule"]:
+            self.assertEqual(starts.tolist(), plan.tolist())
+
+    def test_stopped_decomposition_returns_a_feasible_plan(self):
+        table, idx, stations = dataset_table(40)
+        stop = threading.Event()
+        stop.set()
+        for mode in so.DECOMPOSE_MODES:
+            status, starts, report = so.solve_decomposed(table, so.compute_horizon(table), 5, mode, idx, stations,
+                                                         max_processes=1, stop_event=stop)
+            self.assertTrue(report["stopped"])
+            self.assertEqual(status, "FEASIBLE")
+            self.assert_feasible(table, starts)
+
+    def test_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            so.solve_decomposed(random_table(0), 300, 1, mode="tiles")
+
+
+class PortfolioTests(ScheduleAssertions, SimpleTestCase):
+    def test_keeps_the_best_member(self):
+        table = random_table(4, n_trains=10)
+        status, starts, report = so.solve_portfolio(table, so.compute_horizon(table), 10, ["single", "fixed"],
+                                                    max_processes=1)
+        self.assertEqual([m["profile"] for m in report["members"]], ["single", "fixed"])
+        self.assertEqual(status, "OPTIMAL")
+        self.assertIn(report["best"], ("single", "fixed"))
+        self.assert_feasible(table, starts)
+        self.assertEqual(so.weighted_objective(table, starts), optimum(table)[0])
+
+
+class RollingHorizonTests(ScheduleAssertions, SimpleTestCase):
+    capacity = {"K1": 2, "K2": 2, "K3": 3, "K4": 1}
+
+    def table(self, seed):
+        return random_table(seed, n_trains=25, capacity=self.capacity, max_release=60, max_duration=20, max_route=4)
+
+    def test_windows_never_overload_a_track(self):
+        for seed in range(12):
+            table = self.table(seed)
+            status, starts, report = so.solve_rolling_horizon(table, so.compute_horizon(table), 5, window_min=30,
+                                                              commit_min=15, window_time_s=0.1)
+            with self.subTest(seed=seed):
+                self.assertEqual(report["uncommitted_segments"], 0)
+                self.assert_feasible(table, starts)
+                self.assertLessEqual(so.weighted_objective(table, starts),
+                                     so.weighted_objective(table, so.list_schedule(table)))
+
+    def test_stop_returns_the_list_schedule(self):
+        table = self.table(1)
+        stop = threading.Event()
+        stop.set()
+        status, starts, report = so.solve_rolling_horizon(table, so.compute_horizon(table), 5, window_min=30,
+                                                          commit_min=15, stop_event=stop)
+        self.assertEqual(report["windows"], 0)
+        self.assertEqual(report["uncommitted_segments"], len(table))
+        self.assertEqual(starts.tolist(), so.list_schedule(table).tolist())
+
+
+class LnsTests(ScheduleAssertions, SimpleTestCase):
+    def test_improvements_are_feasible_and_decreasing(self):
+        table = random_table(5, n_trains=14, capacity={"K1": 1, "K2": 2, "K3": 1, "K4": 1}, max_release=10)
+        improvements = []
+        status, starts, report = so.solve_lns(table, so.compute_horizon(table), 3, sub_time_s=0.3,
+                                              neighborhood_size=4, on_improve=improvements.append)
+        objectives = [so.weighted_objective(table, s) for s in improvements]
+        self.assertEqual(objectives, sorted(set(objectives), reverse=True))
+        for plan in improvements:
+            self.assert_feasible(table, plan)
+        self.assert_feasible(table, starts)
+        self.assertLessEqual(so.weighted_objective(table, starts), report["initial_objective"])
+        self.assertEqual(report["initial_objective"], so.weighted_objective(table, so.list_schedule(table)))
+        self.assertGreater(report["iterations"], 0)
+
+    def test_whole_table_neighborhood_reaches_the_optimum(self):
+        for seed in range(4):
+            table = random_table(seed)
+            status, starts, _ = so.solve_lns(table, so.compute_horizon(table), 20, sub_time_s=10,
+                                             neighborhood_size=table.n_trains)
+            self.assertEqual(status, "OPTIMAL")
+            self.assertEqual(so.weighted_objective(table, starts), optimum(table)[0])
+
+    def test_stop_keeps_the_starting_plan(self):
+        table = random_table(2)
+        stop = threading.Event()
+        stop.set()
+        status, starts, report = so.solve_lns(table, so.compute_horizon(table), 5, stop_event=stop)
+        self.assertEqual((report["iterations"], report["stopped"]), (0, True))
+        self.assertEqual(starts.tolist(), so.list_schedule(table).tolist())
@@ -0,0 +1,137 @@
+"""
+Shared fixtures of the scheduler tests: small hand-made segment tables, a
+reference CP-SAT optimum and a naive feasibility check.
+"""
+import os
+import random
+import shutil
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from ortools.sat.python import cp_model
+from rest_framework.test import APIClient
+
+from .model import scheduler_optimization as so
+
+
+def segment_table(trains):
+    """SegmentTable from [(priority, release, [(track_id, duration, capacity), ...]), ...]."""
+    offsets, rows = [0], []
+    for _, _, route in trains:
+        rows.extend(route)
+        offsets.append(len(rows))
+    tracks = sorted({r[0] for r in rows})
+    return so.SegmentTable(
+        train_ids=[f"T{i}" for i in range(len(trains))],
+        priority=[p for p, _, _ in trains],
+        release=[r for _, r, _ in trains],
+        offsets=offsets,
+        track_row=[tracks.index(r[0]) for r in rows],
+        track_id=[r[0] for r in rows],
+        from_station=["A"] * len(rows),
+        to_station=["B"] * len(rows),
+        duration=[r[1] for r in rows],
+        capacity=[r[2] for r in rows],
+    )
+
+
+def random_trains(seed, n_trains=6, capacity=None, max_release=6, max_duration=6, max_route=3,
+                  private_track=True):
+    """
+    segment_table() input: random routes over the tracks of `capacity`
+    (default K1..K3), plus one train on a private track.
+    """
+    rng = random.Random(seed)
+    capacity = capacity or {"K1": 1, "K2": 1, "K3": 2}
+    trains = []
+    for _ in range(n_trains):
+        route = rng.sample(sorted(capacity), rng.randint(1, min(max_route, len(capacity))))
+        trains.append((rng.randint(1, 4), rng.randint(0, max_release),
+                       [(t, rng.randint(1, max_duration), capacity[t]) for t in route]))
+    if private_track:
+        trains.append((2, rng.randint(0, max_release), [("P1", rng.randint(1, 6), 1)]))
+    return trains
+
+
+def random_table(seed, **kwargs):
+    return segment_table(random_trains(seed, **kwargs))
+
+
+def optimum(table, **kwargs):
+    """Objective and starts of a CP-SAT solve proven optimal (no pruning unless kwargs add it)."""
+    kwargs.setdefault("symmetry_breaking", False)
+    model, seg_vars = so.build_model(table, kwargs.pop("horizon", so.compute_horizon(table)), **kwargs)
+    solver, status = so.solve_model(model, 30)
+    assert status == cp_model.OPTIMAL, solver.StatusName(status)
+    starts = so.solution_starts(solver, seg_vars)
+    return so.weighted_objective(table, starts), starts
+
+
+def schedule_result(n_trains, status="OPTIMAL"):
+    """optimize()-shaped output: n_trains trains of two segments each."""
+    trains = {
+        f"TRN{i:04d}": {"priority": 1 + i % 3, "schedule": [
+            {"track_id": "TRK001", "from": "STN001", "to": "STN002", "start_min": i, "end_min": i + 5,
+             "duration_min": 5},
+            {"track_id": "TRK002", "from": "STN002", "to": "STN003", "start_min": i + 5, "end_min": i + 9,
+             "duration_min": 4},
+        ]}
+        for i in range(n_trains)
+    }
+    return {"status": status, "objective": float(n_trains), "horizon": n_trains + 9, "trains": trains}
+
+
+def api_client():
+    """APIClient logged in as a (never saved) section controller."""
+    client = APIClient()
+    client.force_authenticate(get_user_model()(govt_id="planner", name="Planner", role="section_controller"))
+    return client
+
+
+class ScheduleAssertions:
+    """Mixin for TestCases checking plans minute by minute, independently of the optimizer."""
+
+    def assert_feasible(self, table, starts):
+        starts = np.asarray(starts)
+        ends = starts + table.duration
+        for i in range(table.n_trains):
+            sl = table.train_slice(i)
+            if sl.stop > sl.start:
+                self.assertGreaterEqual(starts[sl.start], table.release[i], f"{table.train_ids[i]} before release")
+                self.assertTrue((starts[sl][1:] >= ends[sl][:-1]).all(), f"{table.train_ids[i]} out of order")
+        for track in set(table.track_id.tolist()):
+            rows = np.flatnonzero(table.track_id == track)
+            cap = int(table.capacity[rows].min())
+            for t in np.unique(starts[rows]):
+                load = int(((starts[rows] <= t) & (ends[rows] > t)).sum())
+                self.assertLessEqual(load, cap, f"{track} over capacity at {t}")
+
+
+class DatasetTestCase(SimpleTestCase):
+    """Optimizer runs against a private copy of the bundled datasets."""
+
+    def setUp(self):
+        self.data_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_root)
+        for name in ("trains.csv", "stations.csv", "tracks.csv", "train_delay_data.csv"):
+            shutil.copy(os.path.join(settings.BASE_DIR, "datasets", name), self.data_root)
+        so.clear_data_cache()
+        so.clear_result_cache()
+        self.addCleanup(so.clear_data_cache)
+        self.addCleanup(so.clear_result_cache)
+
+    @staticmethod
+    def plan(out, train_id):
+        return [(seg["track_id"], seg["start_min"], seg["end_min"]) for seg in out["trains"][train_id]["schedule"]]
+
+    def append_delay(self, train_id, minutes):
+        path = os.path.join(self.data_root, "train_delay_data.csv")
+        with open(path, "a") as f:
+            f.write(f"{train_id},STN001,STN002,2030-01-01 10:00:00,2030-01-01 09:00:00,"
+                    f"{minutes},free,clear,Express,2,16,110,1,9,1\n")
+        # a rewrite within the same mtime tick must still change the signature
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
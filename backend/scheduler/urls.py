@@ -1,6 +1,32 @@
-from django.urls import path
-from .views import run_scheduler
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from .views import (
+    ScheduleResultViewSet,
+    run_scheduler,
+    submit_scheduler_job,
+    scheduler_job_status,
+    scheduler_job_result,
+    stream_scheduler_job,
+    cancel_scheduler_job,
+    track_occupancy,
+    track_free_windows,
+    station_occupancy,
+    scheduler_metrics,
+)
+
+router = DefaultRouter()
+router.register(r"segments", ScheduleResultViewSet, basename="schedule-segment")
 
 urlpatterns = [
+    path("", include(router.urls)),
     path("run/", run_scheduler, name="run_scheduler"),
+    path("jobs/", submit_scheduler_job, name="scheduler_job_submit"),
+    path("jobs/<str:job_id>/", scheduler_job_status, name="scheduler_job_status"),
+    path("jobs/<str:job_id>/result/", scheduler_job_result, name="scheduler_job_result"),
+    path("jobs/<str:job_id>/cancel/", cancel_scheduler_job, name="scheduler_job_cancel"),
+    path("jobs/<str:job_id>/stream/", stream_scheduler_job, name="scheduler_job_stream"),
+    path("occupancy/tracks/<str:track_id>/", track_occupancy, name="track_occupancy"),
+    path("occupancy/tracks/<str:track_id>/free/", track_free_windows, name="track_free_windows"),
+    path("occupancy/stations/<str:station_id>/", station_occupancy, name="station_occupancy"),
+    path("metrics/", scheduler_metrics, name="scheduler_metrics"),
 ]
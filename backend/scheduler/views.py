@@ -1,91 +1,360 @@
-from django.conf import settings
-from rest_framework import viewsets
-from rest_framework.decorators import api_view
+import json
+import logging
+
+from django.db import connection
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework import status, viewsets
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BaseRenderer
 from rest_framework.response import Response
 from .models import ScheduleResult
 from .serializers import ScheduleResultSerializer
 from .model import scheduler_optimization
-import os
-import csv
+from . import jobs, metrics, occupancy, services
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+LAYOUTS = ("nested", "columnar")
+
+
+def dumps_json(data):
+    """Compact UTF-8 JSON bytes; uses orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONRenderer(BaseRenderer):
+    """application/json through dumps_json, for the large schedule payloads."""
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps_json(data)
+
+
+def _layout(value):
+    layout = value or "nested"
+    if layout not in LAYOUTS:
+        raise ValidationError({"layout": f"must be one of {', '.join(LAYOUTS)}"})
+    return layout
+
+
+def _with_layout(res, layout):
+    return scheduler_optimization.columnar_schedule(res) if layout == "columnar" else res
+
+
+class QueryBudgetMixin:
+    """
+    Counts the SQL queries a request runs; more than query_budget is logged
+    as a warning. The count is returned in the X-Query-Count header.
+    """
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        executed = []
+
+        def count_query(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = super().dispatch(request, *args, **kwargs)
+        response["X-Query-Count"] = str(len(executed))
+        if self.query_budget is not None and len(executed) > self.query_budget:
+            logger.warning("%s %s ran %d queries (budget %d)", request.method, request.path,
+                           len(executed), self.query_budget)
+        return response
 
 
-class ScheduleResultViewSet(viewsets.ModelViewSet):
+class ScheduleSegmentPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class ScheduleResultViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Segments of the current schedule run (or of ?run=<id>), ordered by start.
+    Filters: train, track, station (from or to), and a minute range
+    start/end returning the segments that overlap [start, end).
+    """
     queryset = ScheduleResult.objects.all()
     serializer_class = ScheduleResultSerializer
+    pagination_class = ScheduleSegmentPagination
+    # auth + page count + page rows
+    query_budget = 3
+
+    def get_queryset(self):
+        params = self.request.query_params
+        run_id = params.get("run")
+        if run_id:
+            try:
+                run_id = int(run_id)
+            except ValueError:
+                raise ValidationError({"run": "must be an integer id"})
+            queryset = self.queryset.filter(run_id=run_id)
+        else:
+            queryset = self.queryset.filter(run__is_current=True)
+
+        train = params.get("train")
+        if train:
+            queryset = queryset.filter(train_id=train)
+
+        track = params.get("track")
+        if track:
+            queryset = queryset.filter(track_id=track)
+
+        station = params.get("station")
+        if station:
+            queryset = queryset.filter(Q(from_station=station) | Q(to_station=station))
+
+        start = self._minute_param("start")
+        if start is not None:
+            queryset = queryset.filter(end_min__gt=start)
+        end = self._minute_param("end")
+        if end is not None:
+            queryset = queryset.filter(start_min__lt=end)
+
+        return queryset.order_by("start_min", "id")
+
+    def _minute_param(self, name):
+        value = self.request.query_params.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: "must be an integer minute"})
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients negotiate text/event-stream; non-stream responses (errors) go out as one JSON event."""
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return _sse_event("error", data).encode()
+
+
+class PrometheusRenderer(BaseRenderer):
+    """?format=prometheus on the metrics endpoint: Prometheus text exposition."""
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if "phase_seconds" not in (data or {}):
+            # errors (e.g. authentication) as a comment line
+            return f"# {dumps_json(data).decode()}\n"
+        return metrics.prometheus_text(data)
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {dumps_json(data).decode()}\n\n"
+
+
+def _minute(request, name):
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        raise ValidationError({name: "required"})
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "must be an integer minute"})
+
+
+def _occupants(rows):
+    return [{"train_id": tid, "start_min": start, "end_min": end} for tid, start, end in rows]
+
+
+@api_view(["GET"])
+def track_occupancy(request, track_id):
+    """
+    Trains on a track in the current run: ?t=<minute> for the ones occupying
+    it at that minute, or ?from=&to= for every segment overlapping the range.
+    """
+    index = occupancy.current_index()
+    timeline = index.tracks.get(track_id) if index else None
+    if timeline is None:
+        return Response({"error": "No schedule for this track"}, status=status.HTTP_404_NOT_FOUND)
+    body = {"run_id": index.run_id, "track_id": track_id, "capacity": timeline.capacity}
+    if "t" in request.query_params:
+        t = _minute(request, "t")
+        body.update({"t": t, "occupants": _occupants(timeline.occupants(t))})
+    else:
+        t1, t2 = _minute(request, "from"), _minute(request, "to")
+        body.update({"from": t1, "to": t2, "segments": _occupants(timeline.between(t1, t2))})
+    return Response(body)
+
+
+@api_view(["GET"])
+def track_free_windows(request, track_id):
+    """Spans of [from, to) in which the track has at least one free capacity unit."""
+    index = occupancy.current_index()
+    if index is None:
+        return Response({"error": "No current schedule run"}, status=status.HTTP_404_NOT_FOUND)
+    t1, t2 = _minute(request, "from"), _minute(request, "to")
+    timeline = index.tracks.get(track_id)
+    windows = [(t1, t2)] if timeline is None else timeline.free_windows(t1, t2)
+    return Response({
+        "run_id": index.run_id,
+        "track_id": track_id,
+        "from": t1,
+        "to": t2,
+        "free_windows": [{"start_min": a, "end_min": b} for a, b in windows],
+    })
+
+
+@api_view(["GET"])
+def station_occupancy(request, station_id):
+    """Trains dwelling at a station at ?t=<minute> in the current run."""
+    index = occupancy.current_index()
+    if index is None:
+        return Response({"error": "No current schedule run"}, status=status.HTTP_404_NOT_FOUND)
+    t = _minute(request, "t")
+    timeline = index.stations.get(station_id)
+    return Response({
+        "run_id": index.run_id,
+        "station_id": station_id,
+        "t": t,
+        "occupants": _occupants(timeline.occupants(t)) if timeline else [],
+    })
 
 
 @api_view(["POST"])
+@renderer_classes([FastJSONRenderer])
 def run_scheduler(request):
     """
     Run optimization and save schedule results into DB.
     Expected body: {"limit_trains": 10, "time_limit_s": 20 }
+    With "incremental": true only trains near changed delays are re-solved,
+    warm-started from the previous run (see optimize()).
+    "decompose": "components" | "division" splits the solve into parallel partitions.
+    "rolling_window_min" / "rolling_commit_min" schedule in sliding time windows.
+    "mode": "heuristic" returns the priority list schedule at once, without CP-SAT;
+    "mode": "lns" improves it by large-neighborhood search for big instances.
+    "solver_profile": a profile name ("default", "fast", "lp", ...) or a dict of
+    CP-SAT settings; "portfolio": a list of profiles solved in parallel, best kept.
+    Results are cached per input data and settings; "use_cache": false forces a re-solve.
+    "layout": "columnar" returns the schedule as parallel arrays (see
+    columnar_schedule()) instead of nested per-train segment lists.
+    With "async": true the run is queued instead and a job id is returned
+    (same response as POST /api/scheduler/jobs/).
     """
-    data_root = request.data.get("data_root", os.path.join(settings.BASE_DIR, "datasets"))
-    limit_trains = request.data.get("limit_trains")
-    time_limit_s = int(request.data.get("time_limit_s", 20))
-
-    res = scheduler_optimization.optimize(
-        data_root=data_root,
-        limit_trains=limit_trains,
-        time_limit_s=time_limit_s,
-    )
-
-    # clear previous results
-    ScheduleResult.objects.all().delete() 
-
-    # save new schedule
-    for tid, tinfo in res.get("trains", {}).items():
-        for seg in tinfo.get("schedule", []):
-            ScheduleResult.objects.create(
-                train_id=tid,
-                track_id=seg["track_id"],
-                from_station=seg["from"],
-                to_station=seg["to"],
-                start_min=seg["start_min"],
-                end_min=seg["end_min"],
-                duration_min=seg["duration_min"],
-                priority=tinfo["priority"],
-            )
-
-    # logic to write the same results to a CSV file
-    try:
-        output_path = os.path.join(settings.BASE_DIR, "datasets", "schedules", "schedule_output.csv")
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # Prepare data for CSV
-        rows = []
-        for train_id, train_info in res.get("trains", {}).items():
-            for segment in train_info.get("schedule", []):
-                row_data = {
-                    'train_id': train_id,
-                    'priority': train_info.get('priority'),
-                    'release_delay_min': train_info.get('release_delay_min'),
-                    'track_id': segment.get('track_id'),
-                    'from_station': segment.get('from'),
-                    'to_station': segment.get('to'),
-                    'from_name': segment.get('from_name'),
-                    'to_name': segment.get('to_name'),
-                    'start_min': segment.get('start_min'),
-                    'end_min': segment.get('end_min'),
-                    'duration_min': segment.get('duration_min'),
-                    'start_time': segment.get('start_time'),
-                    'end_time': segment.get('end_time'),
-                }
-                rows.append(row_data)
-
-        # Write to CSV file, overwriting it if it exists
-        if rows:
-            with open(output_path, 'w', newline='') as csvfile:
-                fieldnames = rows[0].keys()
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                writer.writerows(rows)
-            
-            # Add a success message to the response
-            res['csv_export_status'] = f"Successfully wrote {len(rows)} segments to {output_path}"
-    except Exception as e:
-        # Add an error message to the response if CSV writing fails
-        res['csv_export_status'] = f"Error writing to CSV: {str(e)}"
-
-    return Response(res)
+    if services.as_bool(request.data.get("async", False)):
+        return _submit_job(request.data)
+
+    layout = _layout(request.data.get("layout"))
+    params = services.run_params(request.data)
+    res = services.run_schedule(params)
+    return Response(_with_layout(res, layout))
+
+
+@api_view(["POST"])
+def submit_scheduler_job(request):
+    """
+    Queue an optimization run and return immediately.
+    Identical inputs submitted while a run is queued/running reuse that job.
+    """
+    return _submit_job(request.data)
+
+
+def _submit_job(data):
+    job, created = jobs.get_queue().submit(services.run_params(data))
+    body = job.to_dict()
+    body["coalesced"] = not created
+    return Response(body, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@renderer_classes([FastJSONRenderer])
+def scheduler_job_status(request, job_id):
+    """
+    Job state plus the best plan found so far ("incumbent") while the solver runs.
+    ?layout=columnar returns the incumbent's schedule as parallel arrays.
+    """
+    layout = _layout(request.query_params.get("layout"))
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    body = job.to_dict(with_schedule=True)
+    if body["incumbent"] is not None:
+        body["incumbent"] = _with_layout(body["incumbent"], layout)
+    return Response(body)
+
+
+@api_view(["GET"])
+@renderer_classes([EventStreamRenderer])
+def stream_scheduler_job(request, job_id):
+    """
+    Server-sent events for a job: one "incumbent" event per improving plan
+    (source, objective, elapsed_s, trains), then a "done" event with the final
+    job status. Comment lines are sent as keep-alives while the solver searches.
+    """
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    def events():
+        after = 0
+        while True:
+            batch, closed = job.incumbents.wait(after, timeout=15)
+            for event in batch:
+                after = event["seq"] + 1
+                yield _sse_event("incumbent", event)
+            if closed and not batch:
+                yield _sse_event("done", job.to_dict())
+                return
+            if not batch:
+                yield ": keep-alive\n\n"
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+@renderer_classes([FastJSONRenderer])
+def scheduler_job_result(request, job_id):
+    """The finished job's result; ?layout=columnar as for /run/."""
+    layout = _layout(request.query_params.get("layout"))
+    job = jobs.get_queue().get(job_id)
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    if job.status in jobs.ACTIVE_STATES:
+        return Response(job.to_dict(), status=status.HTTP_202_ACCEPTED)
+    if job.result is None:
+        return Response(job.to_dict(), status=status.HTTP_409_CONFLICT)
+    return Response(_with_layout(job.result, layout))
+
+
+@api_view(["POST"])
+def cancel_scheduler_job(request, job_id):
+    job = jobs.get_queue().cancel(job_id)
+    if job is None:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job.to_dict())
+
+
+@api_view(["GET"])
+@renderer_classes([FastJSONRenderer, PrometheusRenderer])
+def scheduler_metrics(request):
+    """
+    Aggregates of the optimizer runs served by this process: runs per status,
+    cache hits, a wall-time histogram per phase (load_data ... db_persist,
+    csv_export) and a histogram of the objective-to-bound gap.
+    """
+    return Response(metrics.registry.snapshot())